@@ -74,6 +74,7 @@ def main():
 
     datastore_path = None
     do_cleanup = False
+    do_pack_snapshots = False
     host = os.environ.get("LISTEN_HOST", "0.0.0.0").strip()
     port = int(os.environ.get('PORT', 5000))
     ssl_mode = False
@@ -87,9 +88,9 @@ def main():
         datastore_path = os.path.join(os.getcwd(), "../datastore")
 
     try:
-        opts, args = getopt.getopt(sys.argv[1:], "6Ccsd:h:p:l:", "port")
+        opts, args = getopt.getopt(sys.argv[1:], "6CcPsd:h:p:l:", "port")
     except getopt.GetoptError:
-        print('backend.py -s SSL enable -h [host] -p [port] -d [datastore path] -l [debug level - TRACE, DEBUG(default), INFO, SUCCESS, WARNING, ERROR, CRITICAL]')
+        print('backend.py -s SSL enable -h [host] -p [port] -d [datastore path] -l [debug level - TRACE, DEBUG(default), INFO, SUCCESS, WARNING, ERROR, CRITICAL] -P pack snapshots into segment files')
         sys.exit(2)
 
     create_datastore_dir = False
@@ -120,6 +121,10 @@ def main():
         if opt == '-c':
             do_cleanup = True
 
+        # Move existing snapshot files into the packed segment format (see model/snapshot_segments.py)
+        if opt == '-P':
+            do_pack_snapshots = True
+
         # Create the datadir if it doesnt exist
         if opt == '-C':
             create_datastore_dir = True
@@ -179,6 +184,10 @@ def main():
         logger.critical(str(e))
         return
 
+    # Before the app starts so that nothing is writing snapshots while they are moved
+    if do_pack_snapshots:
+        datastore.pack_snapshots_to_segments()
+
     app = changedetection_app(app_config, datastore)
 
     # Get the SocketIO instance from the Flask app (created in flask_app.py)
@@ -0,0 +1,84 @@
+"""
+Adaptive recheck intervals, opt-in with "Adapt the recheck time to how often each page changes" in the settings
+
+After each successful check the recheck time of the watch is worked out again from how often it has been changing,
+so pages that haven't changed in months are looked at less and less often and pages that change all the time more often,
+always between the minimum and maximum set in the settings. Only for watches that use the default recheck time,
+a watch with its own recheck time is always checked at exactly that time.
+
+Two things are used to estimate how often the page changes
+
+- The history timestamps (a snapshot is only saved on a change), the typical time between the recent changes, or how
+  long it has been quiet since the last change if that is longer.
+- How many of the recent checks found a change (previous_md5 differed), kept as a moving average in
+  'recheck_change_ratio'. When most checks find a change the page is probably changing faster than we look at it.
+
+The page is then checked about twice as often as it's expected to change, the interval can shrink as fast as needed
+but only grows to at most double each time.
+"""
+
+# How much the latest check counts in the moving average of checks that found a change
+CHANGE_RATIO_WEIGHT = 0.2
+# How many of the newest history entries to learn from
+HISTORY_WINDOW = 10
+
+
+def settings(datastore):
+    """(enabled, minimum seconds, maximum seconds)"""
+    requests_settings = datastore.data['settings']['requests']
+    minimum = int(requests_settings.get('adaptive_recheck_min_minutes') or 5) * 60
+    maximum = int(requests_settings.get('adaptive_recheck_max_minutes') or 10080) * 60
+    return bool(requests_settings.get('adaptive_recheck')), minimum, max(minimum, maximum)
+
+
+def update_change_ratio(previous, changed):
+    if previous is None:
+        return 1.0 if changed else 0.0
+    return previous * (1 - CHANGE_RATIO_WEIGHT) + (CHANGE_RATIO_WEIGHT if changed else 0.0)
+
+
+def estimate_interval(change_timestamps, change_ratio, current_seconds, minimum_seconds, maximum_seconds, now):
+    """
+    :param change_timestamps: Sorted history timestamps of the watch
+    :param change_ratio: Moving average of checks that found a change, None when not known yet
+    :param current_seconds: The recheck time that was used for the recent checks
+    :return: Seconds until the next check
+    """
+    rates = []
+
+    recent = change_timestamps[-(HISTORY_WINDOW + 1):]
+    if len(recent) >= 3:
+        gaps = sorted(b - a for a, b in zip(recent, recent[1:]))
+        typical_gap = gaps[len(gaps) // 2]
+        quiet_for = now - recent[-1]
+        rates.append(1.0 / max(typical_gap, quiet_for, 1))
+
+    if change_ratio is not None and current_seconds:
+        rates.append(change_ratio / current_seconds)
+
+    if not rates:
+        return max(minimum_seconds, min(current_seconds, maximum_seconds))
+
+    rate = max(rates)
+    interval = maximum_seconds if rate <= 0 else 1.0 / (2 * rate)
+    if current_seconds:
+        interval = min(interval, current_seconds * 2)
+
+    return int(max(minimum_seconds, min(interval, maximum_seconds)))
+
+
+def update_for_check(datastore, watch, changed_detected, now):
+    """Fields to update on the watch after a successful check"""
+    enabled, minimum_seconds, maximum_seconds = settings(datastore)
+    change_ratio = update_change_ratio(watch.get('recheck_change_ratio'), changed_detected)
+    current_seconds = watch.get('recheck_adaptive_seconds') or datastore.threshold_seconds
+
+    return {
+        'recheck_change_ratio': round(change_ratio, 4),
+        'recheck_adaptive_seconds': estimate_interval(change_timestamps=watch.history_keys_sorted,
+                                                      change_ratio=change_ratio,
+                                                      current_seconds=current_seconds,
+                                                      minimum_seconds=minimum_seconds,
+                                                      maximum_seconds=maximum_seconds,
+                                                      now=now)
+    }
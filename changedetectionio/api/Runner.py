@@ -0,0 +1,56 @@
+from changedetectionio.remote_runners import lease_manager
+from flask_restful import abort, Resource
+
+from flask import request
+from . import auth, validate_openapi_request
+
+# Most checks one runner can lease at once
+MAX_LEASE_LIMIT = 100
+
+
+class RunnerLease(Resource):
+    def __init__(self, **kwargs):
+        # datastore is a black box dependency
+        self.datastore = kwargs['datastore']
+        self.update_q = kwargs['update_q']
+
+    # curl -X POST http://localhost:5000/api/v1/runner/lease -H "x-api-key: ..." -H "Content-Type: application/json" -d '{"runner": "runner-1", "limit": 5}'
+    @auth.check_token_required
+    @validate_openapi_request('leaseRunnerJobs')
+    def post(self):
+        """Lease waiting checks to a remote runner, see remote_runners.py"""
+        if not lease_manager.enabled:
+            abort(404, message='Remote runners are not enabled, start with REMOTE_RUNNERS=true')
+
+        json_data = request.get_json() or {}
+        runner = str(json_data.get('runner') or request.remote_addr)[:100]
+        limit = max(1, min(int(json_data.get('limit') or 1), MAX_LEASE_LIMIT))
+
+        jobs = lease_manager.lease(self.update_q, self.datastore, runner=runner, limit=limit)
+        return {'lease_seconds': lease_manager.lease_seconds, 'jobs': jobs}, 200
+
+
+class RunnerResult(Resource):
+    def __init__(self, **kwargs):
+        # datastore is a black box dependency
+        self.datastore = kwargs['datastore']
+        self.update_q = kwargs['update_q']
+
+    @auth.check_token_required
+    @validate_openapi_request('postRunnerResult')
+    def post(self, lease_id):
+        """The result of a leased check, queued to be saved by the local workers"""
+        if not lease_manager.enabled:
+            abort(404, message='Remote runners are not enabled, start with REMOTE_RUNNERS=true')
+
+        result = request.get_json() or {}
+        leased_uuid = lease_manager.leased_uuid(lease_id)
+        if not leased_uuid:
+            abort(409, message=f'Lease {lease_id} expired or is unknown')
+        if result.get('uuid') != leased_uuid:
+            abort(400, message=f'Lease {lease_id} is not for watch {result.get("uuid")}')
+
+        if not lease_manager.complete(self.update_q, lease_id, result):
+            abort(409, message=f'Lease {lease_id} expired or is unknown')
+
+        return "OK", 200
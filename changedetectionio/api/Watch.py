@@ -71,15 +71,19 @@ class Watch(Resource):
             return "OK", 200
         if request.args.get('paused', '') == 'paused':
             self.datastore.data['watching'].get(uuid).pause()
+            self.datastore.mark_watch_dirty(uuid)
             return "OK", 200
         elif request.args.get('paused', '') == 'unpaused':
             self.datastore.data['watching'].get(uuid).unpause()
+            self.datastore.mark_watch_dirty(uuid)
             return "OK", 200
         if request.args.get('muted', '') == 'muted':
             self.datastore.data['watching'].get(uuid).mute()
+            self.datastore.mark_watch_dirty(uuid)
             return "OK", 200
         elif request.args.get('muted', '') == 'unmuted':
             self.datastore.data['watching'].get(uuid).unmute()
+            self.datastore.mark_watch_dirty(uuid)
             return "OK", 200
 
         # Return without history, get that via another API call
@@ -122,6 +126,7 @@ class Watch(Resource):
             return validation_error, 400
 
         watch.update(request.json)
+        self.datastore.mark_watch_dirty(uuid)
 
         return "OK", 200
 
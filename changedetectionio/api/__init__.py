@@ -79,4 +79,5 @@ from .Tags import Tags, Tag
 from .Import import Import
 from .SystemInfo import SystemInfo
 from .Notifications import Notifications
+from .Runner import RunnerLease, RunnerResult
 
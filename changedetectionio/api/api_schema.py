@@ -112,10 +112,16 @@ def build_watch_json_schema(d):
                                                    }
 
     # Stuff that shouldn't be available but is just state-storage
-    for v in ['previous_md5', 'last_error', 'has_ldjson_price_data', 'previous_md5_before_filters', 'uuid']:
+    for v in ['previous_md5', 'last_error', 'has_ldjson_price_data', 'previous_md5_before_filters', 'uuid',
+              'http_etag', 'http_last_modified', 'http_validators_revision', 'processing_revision',
+              'recheck_adaptive_seconds', 'recheck_change_ratio']:
         del schema['properties'][v]
 
     schema['properties']['webdriver_delay']['anyOf'].append({'type': 'integer'})
+    schema['properties']['max_download_mb']['anyOf'].append({'type': 'integer', 'minimum': 1})
+
+    from changedetectionio.content_fetchers.resource_blocking import PROFILES
+    schema['properties']['block_resources']['anyOf'].append({"type": "string", "enum": list(PROFILES.keys())})
 
     schema['properties']['time_between_check'] = build_time_between_check_json_schema()
 
@@ -23,3 +23,20 @@ def check_token(f):
         return f(*args, **kwargs)
 
     return decorated
+
+
+def check_token_required(f):
+    """Same as check_token() but the key is always needed, even when access without one is allowed in the settings"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        datastore = args[0].datastore
+
+        config_api_token = datastore.data['settings']['application'].get('api_access_token')
+        if not config_api_token or request.headers.get('x-api-key') != config_api_token:
+            return make_response(
+                jsonify("Invalid access - API key invalid."), 403
+            )
+
+        return f(*args, **kwargs)
+
+    return decorated
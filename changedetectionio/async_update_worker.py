@@ -1,8 +1,15 @@
 from .processors.exceptions import ProcessorException
 import changedetectionio.content_fetchers.exceptions as content_fetchers_exceptions
 from changedetectionio.processors.text_json_diff.processor import FilterNotFoundInResponse
+from changedetectionio import adaptive_recheck
+from changedetectionio import conditional_requests
 from changedetectionio import html_tools
+from changedetectionio import queuedWatchMetaData
 from changedetectionio.flask_app import watch_check_update
+from changedetectionio.host_limiter import host_limiter, host_for_url, limits_for_watch
+from changedetectionio.proxy_pool import proxy_pool, candidates_for_proxy, is_proxy_failure
+from changedetectionio.processing_pool import processing_pool
+from changedetectionio.remote_runners import RemoteResult
 
 import asyncio
 import importlib
@@ -12,6 +19,27 @@ import time
 
 from loguru import logger
 
+# Keep a reference so the pending re-queues are not garbage collected
+_deferred_requeue_tasks = set()
+
+
+def _requeue_later(q, queued_item_data, wait):
+    """Put the item back in the queue after `wait` seconds, without holding up the worker"""
+    uuid = queued_item_data.item.get('uuid')
+    host_limiter.defer(uuid, time.time() + wait)
+
+    async def requeue():
+        try:
+            await asyncio.sleep(wait)
+            await q.async_put(queued_item_data)
+        finally:
+            host_limiter.undefer(uuid)
+
+    task = asyncio.create_task(requeue())
+    _deferred_requeue_tasks.add(task)
+    task.add_done_callback(_deferred_requeue_tasks.discard)
+
+
 # Async version of update_worker
 # Processes jobs from AsyncSignalPriorityQueue instead of threaded queue
 
@@ -33,10 +61,17 @@ async def async_update_worker(worker_id, q, notification_q, app, datastore):
     
     logger.info(f"Starting async worker {worker_id}")
     
+    from changedetectionio import worker_handler
+
     while not app.config.exit.is_set():
         update_handler = None
         watch = None
 
+        # Fewer workers are needed (see worker_autoscaler.py), only ever stops between checks
+        if worker_handler.take_retire_request():
+            logger.info(f"Worker {worker_id} retiring, not needed at the moment")
+            break
+
         try:
             # Use native janus async interface - no threads needed!
             queued_item_data = await asyncio.wait_for(q.async_get(), timeout=1.0)
@@ -59,11 +94,46 @@ async def async_update_worker(worker_id, q, notification_q, app, datastore):
             continue
         
         uuid = queued_item_data.item.get('uuid')
+        # Already fetched and processed by a remote runner, only needs saving, see remote_runners.py
+        remote_result = queued_item_data.item.get('remote_result')
+
+        # Per-host politeness, when the host is busy put it back for later and carry on with the next one
+        limited_host = None
+        limits_watch = datastore.data['watching'].get(uuid) if not remote_result else None
+        if limits_watch and limits_watch.get('url'):
+            per_minute, max_in_flight = limits_for_watch(datastore, limits_watch)
+            if per_minute or max_in_flight:
+                host = host_for_url(limits_watch.get('url'))
+                wait = host_limiter.try_acquire(host, per_minute=per_minute, max_in_flight=max_in_flight, uuid=uuid)
+                if wait:
+                    logger.debug(f"Worker {worker_id} host '{host}' is busy, {uuid} goes back in the queue in {wait:.1f}s")
+                    _requeue_later(q, queued_item_data, wait)
+                    continue
+                limited_host = host
+
+        # Pick the proxy (or pool member) now, when they're all busy put it back for when one is free, see proxy_pool.py
+        pool_proxy = None
+        if limits_watch:
+            proxy_list = datastore.proxy_list
+            candidates = candidates_for_proxy(proxy_list, datastore.get_preferred_proxy_for_watch(uuid=uuid))
+            if candidates:
+                pool_proxy, wait = proxy_pool.acquire(proxy_list, candidates)
+                if not pool_proxy:
+                    if limited_host:
+                        # Nothing went to the host, doesn't count against its requests per minute
+                        host_limiter.release(limited_host, unused=True)
+                    logger.debug(f"Worker {worker_id} no proxy free for {uuid}, back in the queue in {wait:.1f}s")
+                    _requeue_later(q, queued_item_data, wait)
+                    continue
+
         fetch_start_time = round(time.time())
+        if remote_result:
+            # When the runner started fetching
+            fetch_start_time = round(time.time() - (remote_result.get('fetch_seconds') or 0))
         
         # Mark this UUID as being processed
-        from changedetectionio import worker_handler
         worker_handler.set_uuid_processing(uuid, processing=True)
+        worker_handler.set_worker_busy(True)
         
         try:
             if uuid in list(datastore.data['watching'].keys()) and datastore.data['watching'][uuid].get('url'):
@@ -94,14 +164,41 @@ async def async_update_worker(worker_id, q, notification_q, app, datastore):
                         print(f"Processor module '{processor}' not found.")
                         raise e
 
-                    update_handler = processor_module.perform_site_check(datastore=datastore,
-                                                                         watch_uuid=uuid)
+                    if remote_result:
+                        update_handler = RemoteResult(datastore=datastore, watch_uuid=uuid, result=remote_result)
+                    else:
+                        update_handler = processor_module.perform_site_check(datastore=datastore,
+                                                                             watch_uuid=uuid)
 
                     # All fetchers are now async, so call directly
-                    await update_handler.call_browser()
-
-                    # Run change detection (this is synchronous)
-                    changed_detected, update_obj, contents = update_handler.run_changedetection(watch=watch)
+                    proxy_fetch_start = time.time()
+                    try:
+                        await update_handler.call_browser(preferred_proxy_id=pool_proxy)
+                    except Exception as e:
+                        if pool_proxy:
+                            proxy_pool.release(pool_proxy, ok=not is_proxy_failure(e))
+                            pool_proxy = None
+                        raise
+                    if pool_proxy:
+                        proxy_pool.release(pool_proxy, ok=True, latency=time.time() - proxy_fetch_start)
+                        pool_proxy = None
+
+                    # Done with the host, the rest is local
+                    if limited_host:
+                        host_limiter.release(limited_host)
+                        limited_host = None
+
+                    if update_handler.fetcher.not_modified:
+                        # "304 Not Modified", nothing to process or save, see conditional_requests.py
+                        logger.debug(f"UUID: {uuid} - Not modified since the last check")
+                        changed_detected, update_obj, contents = False, {}, None
+                    elif update_handler.content_is_unchanged(watch):
+                        # Byte for byte the same content and settings as the last check, processing it again would only find no change
+                        logger.debug(f"UUID: {uuid} - Content is the same as the last check, skipped processing")
+                        changed_detected, update_obj, contents = False, {}, None
+                    else:
+                        # Run change detection, in the processing pool when enabled so the event loop isn't blocked
+                        changed_detected, update_obj, contents = await processing_pool.run_changedetection(update_handler, watch, datastore)
 
                 except PermissionError as e:
                     logger.critical(f"File permission error updating file, watch: {uuid}")
@@ -254,7 +351,13 @@ async def async_update_worker(worker_id, q, notification_q, app, datastore):
                     datastore.update_watch(uuid=uuid, update_obj={'last_error': err_text,
                                                                 'last_check_status': e.status_code})
                     process_changedetection_results = False
-                    
+
+                except content_fetchers_exceptions.ReplyTooLarge as e:
+                    err_text = f"Reply is bigger than the {e.max_bytes // (1024 * 1024)} MB download limit, not checked - the limit can be changed in the settings or for this watch"
+                    datastore.update_watch(uuid=uuid, update_obj={'last_error': err_text,
+                                                                'last_check_status': e.status_code})
+                    process_changedetection_results = False
+
                 except content_fetchers_exceptions.ScreenshotUnavailable as e:
                     err_text = "Screenshot unavailable, page did not render fully in the expected time or page was too long - try increasing 'Wait seconds before extracting text'"
                     datastore.update_watch(uuid=uuid, update_obj={'last_error': err_text,
@@ -298,7 +401,9 @@ async def async_update_worker(worker_id, q, notification_q, app, datastore):
                     if not datastore.data['watching'].get(uuid):
                         continue
 
-                    update_obj['content-type'] = update_handler.fetcher.get_all_headers().get('content-type', '').lower()
+                    if not update_handler.fetcher.not_modified:
+                        update_obj['content-type'] = update_handler.fetcher.get_all_headers().get('content-type', '').lower()
+                    update_obj.update(conditional_requests.update_for_check(watch, datastore, update_handler.fetcher))
 
                     if not watch.get('ignore_status_codes'):
                         update_obj['consecutive_filter_failures'] = 0
@@ -349,16 +454,25 @@ async def async_update_worker(worker_id, q, notification_q, app, datastore):
                         logger.critical(str(e))
                         datastore.update_watch(uuid=uuid, update_obj={'last_error': str(e)})
 
+                # Learn how often the page changes for the next recheck time, see adaptive_recheck.py
+                if process_changedetection_results and watch.get('time_between_check_use_default') and adaptive_recheck.settings(datastore)[0]:
+                    try:
+                        datastore.update_watch(uuid=uuid, update_obj=adaptive_recheck.update_for_check(datastore, watch, changed_detected, now=time.time()))
+                    except Exception as e:
+                        logger.warning(f"UUID: {uuid} Exception when working out the adaptive recheck time - {str(e)}")
+
                 # Always record attempt count
                 count = watch.get('check_count', 0) + 1
 
                 # Always record page title (used in notifications, and can change even when the content is the same)
-                try:
-                    page_title = html_tools.extract_title(data=update_handler.fetcher.content)
-                    logger.debug(f"UUID: {uuid} Page <title> is '{page_title}'")
-                    datastore.update_watch(uuid=uuid, update_obj={'page_title': page_title})
-                except Exception as e:
-                    logger.warning(f"UUID: {uuid} Exception when extracting <title> - {str(e)}")
+                # (unless the page was not modified, then there's no content and the title is the same)
+                if not update_handler.fetcher.not_modified:
+                    try:
+                        page_title = html_tools.extract_title(data=update_handler.fetcher.content)
+                        logger.debug(f"UUID: {uuid} Page <title> is '{page_title}'")
+                        datastore.update_watch(uuid=uuid, update_obj={'page_title': page_title})
+                    except Exception as e:
+                        logger.warning(f"UUID: {uuid} Exception when extracting <title> - {str(e)}")
 
                 # Record server header
                 try:
@@ -392,10 +506,20 @@ async def async_update_worker(worker_id, q, notification_q, app, datastore):
         
         finally:
             # Always cleanup - this runs whether there was an exception or not
+            worker_handler.set_worker_busy(False)
+            if limited_host:
+                host_limiter.release(limited_host)
+            if pool_proxy:
+                proxy_pool.release(pool_proxy)
+
             if uuid:
                 try:
                     # Mark UUID as no longer being processed
                     worker_handler.set_uuid_processing(uuid, processing=False)
+
+                    # A recheck was asked for while the remote result was waiting, see queue_handlers.py _merge_payloads()
+                    if remote_result and queued_item_data.item.get('recheck'):
+                        await q.async_put(queuedWatchMetaData.PrioritizedItem(priority=1, item={'uuid': uuid}))
                     
                     # Send completion signal
                     if watch:
@@ -89,8 +89,10 @@ def construct_blueprint(datastore: ChangeDetectionStore):
             flash("Maximum number of backups reached, please remove some", "error")
             return redirect(url_for('backups.index'))
 
-        # Be sure we're written fresh
+        # Be sure we're written fresh, always in the url-watches.json format so it can be restored on any backend
         datastore.sync_to_json()
+        if datastore.backend.name != 'json':
+            datastore.export_json(os.path.join(datastore.datastore_path, "url-watches.json"))
         zip_thread = threading.Thread(target=create_backup, args=(datastore.datastore_path, datastore.data.get("watching")))
         zip_thread.start()
         backup_threads.append(zip_thread)
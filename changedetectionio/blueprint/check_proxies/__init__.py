@@ -115,6 +115,9 @@ def construct_blueprint(datastore: ChangeDetectionStore):
             checks_in_progress[uuid] = {}
 
         for k, v in datastore.proxy_list.items():
+            # Pools are checked by checking each of their members
+            if v.get('members'):
+                continue
             if not checks_in_progress[uuid].get(k):
                 checks_in_progress[uuid][k] = long_task(uuid=uuid, preferred_proxy=k)
 
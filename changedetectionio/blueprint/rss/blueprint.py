@@ -63,8 +63,11 @@ def construct_blueprint(datastore: ChangeDetectionStore):
         # Sort by last_changed and add the uuid which is usually the key..
         sorted_watches = []
 
-        # @todo needs a .itemsWithTag() or something - then we can use that in Jinaj2 and throw this away
-        for uuid, watch in datastore.data['watching'].items():
+        candidate_uuids = datastore.get_watch_uuids_with_tag(limit_tag) if limit_tag else list(datastore.data['watching'].keys())
+        for uuid in candidate_uuids:
+            watch = datastore.data['watching'].get(uuid)
+            if not watch:
+                continue
             # @todo tag notification_muted skip also (improve Watch model)
             if datastore.data['settings']['application'].get('rss_hide_muted_watches') and watch.get('notification_muted'):
                 continue
@@ -1,5 +1,6 @@
 from wtforms import (
     Form,
+    IntegerField,
     StringField,
     SubmitField,
     validators,
@@ -11,6 +12,16 @@ from changedetectionio.processors.restock_diff.forms import processor_settings_f
 class group_restock_settings_form(restock_settings_form):
     overrides_watch = BooleanField('Activate for individual watches in this tag/group?', default=False)
 
+    host_requests_per_minute = IntegerField('Maximum requests per minute to the same host',
+                                            render_kw={"style": "width: 5em;"},
+                                            validators=[validators.Optional(), validators.NumberRange(min=0, message="Should be zero or more")])
+    queue_weight = IntegerField('Share of the workers when the queue is busy',
+                                render_kw={"style": "width: 5em;"},
+                                validators=[validators.Optional(), validators.NumberRange(min=1, max=100, message="Should be between 1 and 100")])
+    host_max_in_flight = IntegerField('Maximum requests at the same time to the same host',
+                                      render_kw={"style": "width: 5em;"},
+                                      validators=[validators.Optional(), validators.NumberRange(min=0, message="Should be zero or more")])
+
 class SingleTag(Form):
 
     name = StringField('Tag name', [validators.InputRequired()], render_kw={"placeholder": "Name"})
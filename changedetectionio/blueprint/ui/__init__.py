@@ -104,6 +104,8 @@ def _handle_operations(op, uuids, datastore, worker_handler, update_q, queuedWat
 
     if uuids:
         for uuid in uuids:
+            if op != 'delete':
+                datastore.mark_watch_dirty(uuid)
             watch_check_update.send(watch_uuid=uuid)
 
 def construct_blueprint(datastore: ChangeDetectionStore, update_q, worker_handler, queuedWatchMetaData, watch_check_update):
@@ -228,6 +230,7 @@ def construct_blueprint(datastore: ChangeDetectionStore, update_q, worker_handle
         else:
             # Recheck all, including muted
             # Get most overdue first
+            items = []
             for k in sorted(datastore.data['watching'].items(), key=lambda item: item[1].get('last_checked', 0)):
                 watch_uuid = k[0]
                 watch = k[1]
@@ -239,8 +242,11 @@ def construct_blueprint(datastore: ChangeDetectionStore, update_q, worker_handle
                         if tag != None and tag not in watch['tags']:
                             continue
 
-                        worker_handler.queue_item_async_safe(update_q, queuedWatchMetaData.PrioritizedItem(priority=1, item={'uuid': watch_uuid}))
-                        i += 1
+                        items.append(queuedWatchMetaData.PrioritizedItem(priority=1, item={'uuid': watch_uuid}))
+
+            # All at once, any that are already queued are just moved to the front
+            update_q.put_many(items)
+            i = len(items)
 
         if i == 1:
             flash("Queued 1 watch for rechecking.")
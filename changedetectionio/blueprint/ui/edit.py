@@ -9,6 +9,7 @@ from jinja2 import Environment, FileSystemLoader
 from changedetectionio.store import ChangeDetectionStore
 from changedetectionio.auth_decorator import login_optionally_required
 from changedetectionio.time_handler import is_within_schedule
+from changedetectionio import adaptive_recheck
 from changedetectionio import worker_handler
 
 def construct_blueprint(datastore: ChangeDetectionStore, update_q, queuedWatchMetaData):
@@ -47,6 +48,7 @@ def construct_blueprint(datastore: ChangeDetectionStore, update_q, queuedWatchMe
             for p in processors.available_processors():
                 if p[0] == switch_processor:
                     datastore.data['watching'][uuid]['processor'] = switch_processor
+                    datastore.mark_watch_dirty(uuid)
                     flash(f"Switched to mode - {p[1]}.")
                     datastore.clear_watch_history(uuid)
                     redirect(url_for('ui_edit.edit_page', uuid=uuid))
@@ -137,6 +139,10 @@ def construct_blueprint(datastore: ChangeDetectionStore, update_q, queuedWatchMe
             if datastore.proxy_list is not None and form.data['proxy'] == '':
                 extra_update_obj['proxy'] = None
 
+            # Use the global setting
+            if form.data.get('block_resources') == '':
+                extra_update_obj['block_resources'] = None
+
             # Unsetting all filter_text methods should make it go back to default
             # This particularly affects tests running
             if 'filter_text_added' in form.data and not form.data.get('filter_text_added') \
@@ -168,6 +174,7 @@ def construct_blueprint(datastore: ChangeDetectionStore, update_q, queuedWatchMe
             # Recast it if need be to right data Watch handler
             watch_class = processors.get_custom_watch_obj_for_processor(form.data.get('processor'))
             datastore.data['watching'][uuid] = watch_class(datastore_path=datastore.datastore_path, default=datastore.data['watching'][uuid])
+            datastore.mark_watch_dirty(uuid)
             flash("Updated watch - unpaused!" if request.args.get('unpause_on_save') else "Updated watch.")
 
             # Re #286 - We wait for syncing new data to disk in another thread every 60 seconds
@@ -237,7 +244,13 @@ def construct_blueprint(datastore: ChangeDetectionStore, update_q, queuedWatchMe
             # Import the global plugin system
             from changedetectionio.pluggy_interface import collect_ui_edit_stats_extras
             
+            # Only when it's actually used, see adaptive_recheck.py
+            adaptive_recheck_seconds = None
+            if adaptive_recheck.settings(datastore)[0] and watch.get('time_between_check_use_default'):
+                adaptive_recheck_seconds = watch.get('recheck_adaptive_seconds')
+
             template_args = {
+                'adaptive_recheck_seconds': adaptive_recheck_seconds,
                 'available_processors': processors.available_processors(),
                 'available_timezones': sorted(available_timezones()),
                 'browser_steps_config': browser_step_ui_config,
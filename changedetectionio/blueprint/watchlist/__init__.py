@@ -38,7 +38,7 @@ def construct_blueprint(datastore: ChangeDetectionStore, update_q, queuedWatchMe
             elif op == 'mute':
                 datastore.data['watching'][uuid].toggle_mute()
 
-            datastore.needs_write = True
+            datastore.mark_watch_dirty(uuid)
             return redirect(url_for('watchlist.index', tag = active_tag_uuid))
 
         # Sort by last_changed and add the uuid which is usually the key..
@@ -47,7 +47,19 @@ def construct_blueprint(datastore: ChangeDetectionStore, update_q, queuedWatchMe
         unread_only = request.args.get('unread') == "1"
         errored_count = 0
         search_q = request.args.get('q').strip().lower() if request.args.get('q') else False
-        for uuid, watch in datastore.data['watching'].items():
+
+        # Only look at the watches that can match, the checks below still apply
+        if with_errors:
+            candidate_uuids = datastore.get_errored_watch_uuids()
+        elif active_tag_uuid:
+            candidate_uuids = datastore.get_watch_uuids_with_tag(active_tag_uuid)
+        else:
+            candidate_uuids = list(datastore.data['watching'].keys())
+
+        for uuid in candidate_uuids:
+            watch = datastore.data['watching'].get(uuid)
+            if not watch:
+                continue
             if with_errors and not watch.get('last_error'):
                 continue
 
@@ -90,7 +102,7 @@ def construct_blueprint(datastore: ChangeDetectionStore, update_q, queuedWatchMe
             hosted_sticky=os.getenv("SALTED_PASS", False) == False,
             now_time_server=round(time.time()),
             pagination=pagination,
-            queued_uuids=[q_uuid.item['uuid'] for q_uuid in update_q.queue],
+            queued_uuids=update_q.get_queued_uuids(),
             search_q=request.args.get('q', '').strip(),
             sort_attribute=request.args.get('sort') if request.args.get('sort') else request.cookies.get('sort'),
             sort_order=request.args.get('order') if request.args.get('order') else request.cookies.get('order'),
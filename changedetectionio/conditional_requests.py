@@ -0,0 +1,79 @@
+"""
+HTTP conditional requests for the "requests" fetcher, when the page is unchanged the server only has to say so.
+
+After a successful check the ETag and Last-Modified reply headers are kept with the watch, the next check sends them
+back as If-None-Match / If-Modified-Since. A "304 Not Modified" reply is then a check without a change, the filters,
+text extraction and snapshot saving are skipped entirely ('conditional_hits' counts how often that happened).
+
+The validators are only sent when nothing that changes how the content is processed (filters, ignore text, the
+watch's tags, the global settings..) has changed since they were stored, see processors.processing_config_revision().
+They are not sent for POST etc, when the watch sets its own If-None-Match / If-Modified-Since header, or when there's
+no snapshot yet.
+
+On by default, HTTP_CONDITIONAL_REQUESTS=false never sends them.
+"""
+
+from changedetectionio.processors import processing_config_revision
+from changedetectionio.strtobool import strtobool
+import os
+
+VALIDATOR_HEADERS = ('If-None-Match', 'If-Modified-Since')
+
+# Since startup
+counters = {'sent': 0, 'not_modified': 0}
+
+
+def enabled():
+    return strtobool(os.getenv('HTTP_CONDITIONAL_REQUESTS', 'True'))
+
+
+def request_headers(watch, datastore, fetch_backend, headers, request_method=None, request_body=None):
+    """The If-None-Match / If-Modified-Since headers to add to this check, if any"""
+    if not enabled() or fetch_backend != 'html_requests':
+        return {}
+    if (request_method or 'GET').upper() != 'GET' or request_body:
+        return {}
+    if not watch.get('http_etag') and not watch.get('http_last_modified'):
+        return {}
+    # Set by the user, they know what they're doing
+    if any(h in headers for h in VALIDATOR_HEADERS):
+        return {}
+    # Nothing to compare a 304 with
+    if not watch.get('previous_md5') or not watch.history_n:
+        return {}
+    if watch.get('http_validators_revision') != processing_config_revision(watch, datastore):
+        return {}
+
+    conditional = {}
+    if watch.get('http_etag'):
+        conditional['If-None-Match'] = watch.get('http_etag')
+    if watch.get('http_last_modified'):
+        conditional['If-Modified-Since'] = watch.get('http_last_modified')
+    counters['sent'] += 1
+    return conditional
+
+
+def update_for_check(watch, datastore, fetcher):
+    """What to save with the watch after a successful check"""
+    if fetcher.not_modified:
+        counters['not_modified'] += 1
+        return {'conditional_hits': watch.get('conditional_hits', 0) + 1}
+
+    headers = fetcher.get_all_headers() if fetcher.headers else {}
+    etag = headers.get('etag')
+    last_modified = headers.get('last-modified')
+    if enabled() and fetcher.status_code == 200 and (etag or last_modified):
+        return {'http_etag': etag,
+                'http_last_modified': last_modified,
+                'http_validators_revision': processing_config_revision(watch, datastore)}
+
+    return {'http_etag': None, 'http_last_modified': None, 'http_validators_revision': None}
+
+
+def stats():
+    return {
+        'enabled': enabled(),
+        'sent': counters['sent'],
+        'not_modified': counters['not_modified'],
+        'hit_ratio': round(counters['not_modified'] / counters['sent'], 3) if counters['sent'] else 0.0,
+    }
@@ -40,6 +40,8 @@ def manage_user_agent(headers, current_ua=''):
 
 
 class Fetcher():
+    # Resource blocking profile for browser fetchers, see resource_blocking.py
+    block_resources = None
     browser_connection_is_custom = None
     browser_connection_url = None
     browser_steps = None
@@ -51,6 +53,10 @@ class Fetcher():
     favicon_blob = None
     instock_data = None
     instock_data_js = ""
+    # Bigger replies are not downloaded (requests fetcher), 0 is no limit
+    max_download_bytes = 0
+    # Server replied "304 Not Modified" to the conditional request, there's no content, see conditional_requests.py
+    not_modified = False
     status_code = None
     webdriver_js_execute_code = None
     xpath_data = None
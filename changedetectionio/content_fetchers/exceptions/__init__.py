@@ -74,6 +74,15 @@ class EmptyReply(Exception):
         return
 
 
+class ReplyTooLarge(Exception):
+    def __init__(self, status_code, url, max_bytes):
+        # Set this so we can use it in other parts of the app
+        self.status_code = status_code
+        self.url = url
+        self.max_bytes = max_bytes
+        return
+
+
 class ScreenshotUnavailable(Exception):
     def __init__(self, status_code, url, page_html=None):
         # Set this so we can use it in other parts of the app
@@ -8,6 +8,8 @@ from changedetectionio.content_fetchers import SCREENSHOT_MAX_HEIGHT_DEFAULT, vi
     SCREENSHOT_SIZE_STITCH_THRESHOLD, SCREENSHOT_MAX_TOTAL_HEIGHT, XPATH_ELEMENT_JS, INSTOCK_DATA_JS, FAVICON_FETCHER_JS
 from changedetectionio.content_fetchers.base import Fetcher, manage_user_agent
 from changedetectionio.content_fetchers.exceptions import PageUnloadable, Non200ErrorCodeReceived, EmptyReply, ScreenshotUnavailable
+from changedetectionio.content_fetchers.playwright_pool import playwright_pool
+from changedetectionio.content_fetchers.resource_blocking import resource_blocker
 
 async def capture_full_page_async(page):
     import os
@@ -87,6 +89,7 @@ class fetcher(Fetcher):
     # In the ENV vars, is prefixed with "playwright_proxy_", so it is for example "playwright_proxy_server"
     playwright_proxy_settings_mappings = ['bypass', 'server', 'username', 'password']
 
+    page = None
     proxy = None
 
     def __init__(self, proxy_override=None, custom_browser_connection_url=None):
@@ -155,19 +158,15 @@ class fetcher(Fetcher):
                   url=None,
                   ):
 
-        from playwright.async_api import async_playwright
         import playwright._impl._errors
         import time
         self.delete_browser_steps_screenshots()
         response = None
 
-        async with async_playwright() as p:
-            browser_type = getattr(p, self.browser_type)
-
-            # Seemed to cause a connection Exception even tho I can see it connect
-            # self.browser = browser_type.connect(self.command_executor, timeout=timeout*1000)
-            # 60,000 connection timeout only
-            browser = await browser_type.connect_over_cdp(self.browser_connection_url, timeout=60000)
+        # Connections are kept between checks when enabled, see playwright_pool.py
+        async with playwright_pool.browser(browser_type=self.browser_type,
+                                           connection_url=self.browser_connection_url,
+                                           proxy=self.proxy) as browser:
 
             # SOCKS5 with authentication is not supported (yet)
             # https://github.com/microsoft/playwright/issues/10567
@@ -184,137 +183,134 @@ class fetcher(Fetcher):
                 user_agent=manage_user_agent(headers=request_headers),
             )
 
-            self.page = await context.new_page()
+            try:
+                if self.block_resources:
+                    profile = self.block_resources
 
-            # Listen for all console events and handle errors
-            self.page.on("console", lambda msg: logger.debug(f"Playwright console: Watch URL: {url} {msg.type}: {msg.text} {msg.args}"))
+                    async def block_resources(route):
+                        if resource_blocker.check(profile, route.request.resource_type, route.request.url):
+                            await route.abort()
+                        else:
+                            await route.continue_()
 
-            # Re-use as much code from browser steps as possible so its the same
-            from changedetectionio.blueprint.browser_steps.browser_steps import steppable_browser_interface
-            browsersteps_interface = steppable_browser_interface(start_url=url)
-            browsersteps_interface.page = self.page
+                    await context.route("**/*", block_resources)
 
-            response = await browsersteps_interface.action_goto_url(value=url)
+                self.page = await context.new_page()
 
-            if response is None:
-                await context.close()
-                await browser.close()
-                logger.debug("Content Fetcher > Response object from the browser communication was none")
-                raise EmptyReply(url=url, status_code=None)
+                # Listen for all console events and handle errors
+                self.page.on("console", lambda msg: logger.debug(f"Playwright console: Watch URL: {url} {msg.type}: {msg.text} {msg.args}"))
 
-            # In async_playwright, all_headers() returns a coroutine
-            try:
-                self.headers = await response.all_headers()
-            except TypeError:
-                # Fallback for sync version
-                self.headers = response.all_headers()
+                # Re-use as much code from browser steps as possible so its the same
+                from changedetectionio.blueprint.browser_steps.browser_steps import steppable_browser_interface
+                browsersteps_interface = steppable_browser_interface(start_url=url)
+                browsersteps_interface.page = self.page
 
-            try:
-                if self.webdriver_js_execute_code is not None and len(self.webdriver_js_execute_code):
-                    await browsersteps_interface.action_execute_js(value=self.webdriver_js_execute_code, selector=None)
-            except playwright._impl._errors.TimeoutError as e:
-                await context.close()
-                await browser.close()
-                # This can be ok, we will try to grab what we could retrieve
-                pass
-            except Exception as e:
-                logger.debug(f"Content Fetcher > Other exception when executing custom JS code {str(e)}")
-                await context.close()
-                await browser.close()
-                raise PageUnloadable(url=url, status_code=None, message=str(e))
-
-            extra_wait = int(os.getenv("WEBDRIVER_DELAY_BEFORE_CONTENT_READY", 5)) + self.render_extract_delay
-            await self.page.wait_for_timeout(extra_wait * 1000)
+                response = await browsersteps_interface.action_goto_url(value=url)
 
-            try:
-                self.status_code = response.status
-            except Exception as e:
-                # https://github.com/sneaker-dev/changedetection.io/discussions/2122#discussioncomment-8241962
-                logger.critical(f"Response from the browser/Playwright did not have a status_code! Response follows.")
-                logger.critical(response)
-                await context.close()
-                await browser.close()
-                raise PageUnloadable(url=url, status_code=None, message=str(e))
-
-            if fetch_favicon:
-                try:
-                    self.favicon_blob = await self.page.evaluate(FAVICON_FETCHER_JS)
-                    await self.page.request_gc()
-                except Exception as e:
-                    logger.error(f"Error fetching FavIcon info {str(e)}, continuing.")
-
-            if self.status_code != 200 and not ignore_status_codes:
-                screenshot = await capture_full_page_async(self.page)
-                raise Non200ErrorCodeReceived(url=url, status_code=self.status_code, screenshot=screenshot)
-
-            if not empty_pages_are_a_change and len((await self.page.content()).strip()) == 0:
-                logger.debug("Content Fetcher > Content was empty, empty_pages_are_a_change = False")
-                await context.close()
-                await browser.close()
-                raise EmptyReply(url=url, status_code=response.status)
-
-            # Run Browser Steps here
-            if self.browser_steps_get_valid_steps():
-                await self.iterate_browser_steps(start_url=url)
-
-            await self.page.wait_for_timeout(extra_wait * 1000)
-
-            now = time.time()
-            # So we can find an element on the page where its selector was entered manually (maybe not xPath etc)
-            if current_include_filters is not None:
-                await self.page.evaluate("var include_filters={}".format(json.dumps(current_include_filters)))
-            else:
-                await self.page.evaluate("var include_filters=''")
-            await self.page.request_gc()
-
-            # request_gc before and after evaluate to free up memory
-            # @todo browsersteps etc
-            MAX_TOTAL_HEIGHT = int(os.getenv("SCREENSHOT_MAX_HEIGHT", SCREENSHOT_MAX_HEIGHT_DEFAULT))
-            self.xpath_data = await self.page.evaluate(XPATH_ELEMENT_JS, {
-                "visualselector_xpath_selectors": visualselector_xpath_selectors,
-                "max_height": MAX_TOTAL_HEIGHT
-            })
-            await self.page.request_gc()
-
-            self.instock_data = await self.page.evaluate(INSTOCK_DATA_JS)
-            await self.page.request_gc()
-
-            self.content = await self.page.content()
-            await self.page.request_gc()
-            logger.debug(f"Scrape xPath element data in browser done in {time.time() - now:.2f}s")
-
-
-            # Bug 3 in Playwright screenshot handling
-            # Some bug where it gives the wrong screenshot size, but making a request with the clip set first seems to solve it
-            # JPEG is better here because the screenshots can be very very large
-
-            # Screenshots also travel via the ws:// (websocket) meaning that the binary data is base64 encoded
-            # which will significantly increase the IO size between the server and client, it's recommended to use the lowest
-            # acceptable screenshot quality here
-            try:
-                # The actual screenshot - this always base64 and needs decoding! horrible! huge CPU usage
-                self.screenshot = await capture_full_page_async(page=self.page)
+                if response is None:
+                    logger.debug("Content Fetcher > Response object from the browser communication was none")
+                    raise EmptyReply(url=url, status_code=None)
 
-            except Exception as e:
-                # It's likely the screenshot was too long/big and something crashed
-                raise ScreenshotUnavailable(url=url, status_code=self.status_code)
-            finally:
-                # Request garbage collection one more time before closing
+                # In async_playwright, all_headers() returns a coroutine
                 try:
-                    await self.page.request_gc()
-                except:
-                    pass
-                
-                # Clean up resources properly
+                    self.headers = await response.all_headers()
+                except TypeError:
+                    # Fallback for sync version
+                    self.headers = response.all_headers()
+
                 try:
-                    await self.page.request_gc()
-                except:
+                    if self.webdriver_js_execute_code is not None and len(self.webdriver_js_execute_code):
+                        await browsersteps_interface.action_execute_js(value=self.webdriver_js_execute_code, selector=None)
+                except playwright._impl._errors.TimeoutError as e:
+                    # This can be ok, we will try to grab what we could retrieve
                     pass
+                except Exception as e:
+                    logger.debug(f"Content Fetcher > Other exception when executing custom JS code {str(e)}")
+                    raise PageUnloadable(url=url, status_code=None, message=str(e))
+
+                extra_wait = int(os.getenv("WEBDRIVER_DELAY_BEFORE_CONTENT_READY", 5)) + self.render_extract_delay
+                await self.page.wait_for_timeout(extra_wait * 1000)
 
                 try:
-                    await self.page.close()
-                except:
-                    pass
+                    self.status_code = response.status
+                except Exception as e:
+                    # https://github.com/sneaker-dev/changedetection.io/discussions/2122#discussioncomment-8241962
+                    logger.critical(f"Response from the browser/Playwright did not have a status_code! Response follows.")
+                    logger.critical(response)
+                    raise PageUnloadable(url=url, status_code=None, message=str(e))
+
+                if fetch_favicon:
+                    try:
+                        self.favicon_blob = await self.page.evaluate(FAVICON_FETCHER_JS)
+                        await self.page.request_gc()
+                    except Exception as e:
+                        logger.error(f"Error fetching FavIcon info {str(e)}, continuing.")
+
+                if self.status_code != 200 and not ignore_status_codes:
+                    screenshot = await capture_full_page_async(self.page)
+                    raise Non200ErrorCodeReceived(url=url, status_code=self.status_code, screenshot=screenshot)
+
+                if not empty_pages_are_a_change and len((await self.page.content()).strip()) == 0:
+                    logger.debug("Content Fetcher > Content was empty, empty_pages_are_a_change = False")
+                    raise EmptyReply(url=url, status_code=response.status)
+
+                # Run Browser Steps here
+                if self.browser_steps_get_valid_steps():
+                    await self.iterate_browser_steps(start_url=url)
+
+                await self.page.wait_for_timeout(extra_wait * 1000)
+
+                now = time.time()
+                # So we can find an element on the page where its selector was entered manually (maybe not xPath etc)
+                if current_include_filters is not None:
+                    await self.page.evaluate("var include_filters={}".format(json.dumps(current_include_filters)))
+                else:
+                    await self.page.evaluate("var include_filters=''")
+                await self.page.request_gc()
+
+                # request_gc before and after evaluate to free up memory
+                # @todo browsersteps etc
+                MAX_TOTAL_HEIGHT = int(os.getenv("SCREENSHOT_MAX_HEIGHT", SCREENSHOT_MAX_HEIGHT_DEFAULT))
+                self.xpath_data = await self.page.evaluate(XPATH_ELEMENT_JS, {
+                    "visualselector_xpath_selectors": visualselector_xpath_selectors,
+                    "max_height": MAX_TOTAL_HEIGHT
+                })
+                await self.page.request_gc()
+
+                self.instock_data = await self.page.evaluate(INSTOCK_DATA_JS)
+                await self.page.request_gc()
+
+                self.content = await self.page.content()
+                await self.page.request_gc()
+                logger.debug(f"Scrape xPath element data in browser done in {time.time() - now:.2f}s")
+
+
+                # Bug 3 in Playwright screenshot handling
+                # Some bug where it gives the wrong screenshot size, but making a request with the clip set first seems to solve it
+                # JPEG is better here because the screenshots can be very very large
+
+                # Screenshots also travel via the ws:// (websocket) meaning that the binary data is base64 encoded
+                # which will significantly increase the IO size between the server and client, it's recommended to use the lowest
+                # acceptable screenshot quality here
+                try:
+                    # The actual screenshot - this always base64 and needs decoding! horrible! huge CPU usage
+                    self.screenshot = await capture_full_page_async(page=self.page)
+
+                except Exception as e:
+                    # It's likely the screenshot was too long/big and something crashed
+                    raise ScreenshotUnavailable(url=url, status_code=self.status_code)
+            finally:
+                # Clean up resources properly, the browser connection itself is closed (or kept) by the pool
+                if self.page:
+                    try:
+                        await self.page.request_gc()
+                    except:
+                        pass
+
+                    try:
+                        await self.page.close()
+                    except:
+                        pass
                 self.page = None
 
                 try:
@@ -322,12 +318,3 @@ class fetcher(Fetcher):
                 except:
                     pass
                 context = None
-
-                try:
-                    await browser.close()
-                except:
-                    pass
-                browser = None
-
-
-
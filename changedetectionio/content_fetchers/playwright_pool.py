@@ -0,0 +1,205 @@
+"""
+Long lived browser connections for the Playwright fetcher, so every check doesn't pay for the CDP handshake and the
+browser starting up.
+
+One connection (connect_over_cdp()) per browser endpoint and proxy, every check still gets its own new browser
+context (cookies, storage, cache) which is closed afterwards, only the connection is shared. A connection is replaced
+after PLAYWRIGHT_POOL_MAX_USES checks (default 50), when it errored or disconnected, or when it wasn't used for
+PLAYWRIGHT_POOL_IDLE_SECONDS (default 120).
+
+Enabled with PLAYWRIGHT_POOL=true, off it's a new connection for every check like before.
+
+PLAYWRIGHT_MAX_PAGES (default 0, no limit) is how many pages can be open in the browser(s) at the same time, no matter
+how many workers there are (FETCH_WORKERS, or the autoscaler maximum), checks wait for a free page.
+"""
+
+from changedetectionio.strtobool import strtobool
+from contextlib import asynccontextmanager
+from loguru import logger
+import asyncio
+import os
+import time
+
+# connect_over_cdp() timeout
+CONNECT_TIMEOUT_MS = 60000
+
+
+class _Connection:
+
+    def __init__(self, key, browser, now):
+        self.key = key
+        self.browser = browser
+        self.created = now
+        self.last_used = now
+        self.in_use = 0
+        self.uses = 0
+
+
+class PlaywrightPool:
+
+    def __init__(self):
+        self.enabled = strtobool(os.getenv('PLAYWRIGHT_POOL', 'False'))
+        self.max_uses = int(os.getenv('PLAYWRIGHT_POOL_MAX_USES', 50))
+        self.idle_seconds = int(os.getenv('PLAYWRIGHT_POOL_IDLE_SECONDS', 120))
+        self.max_pages = int(os.getenv('PLAYWRIGHT_MAX_PAGES', 0))
+
+        # Playwright objects belong to the event loop they were made in
+        self._loop = None
+        self._playwright = None
+        self._connections = {}
+        self._retiring = []
+        self._pages = None
+        self._connect_lock = None
+
+        self.pages_in_use = 0
+        self.waiting = 0
+        self.wait_seconds_total = 0.0
+        self.pages_opened = 0
+        self.connects = 0
+        self.connect_seconds_total = 0.0
+        self.reused = 0
+        self.recycled = 0
+        self.errors = 0
+
+    def _check_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Anything from another loop can't be used (or closed) from here anymore
+            self._loop = loop
+            self._playwright = None
+            self._connections = {}
+            self._retiring = []
+            self._pages = asyncio.Semaphore(self.max_pages) if self.max_pages > 0 else None
+            self._connect_lock = asyncio.Lock()
+
+    async def _start_playwright(self):
+        from playwright.async_api import async_playwright
+        return await async_playwright().start()
+
+    async def _connect(self, browser_type, connection_url):
+        if self._playwright is None:
+            self._playwright = await self._start_playwright()
+        return await getattr(self._playwright, browser_type).connect_over_cdp(connection_url, timeout=CONNECT_TIMEOUT_MS)
+
+    async def _close_browser(self, browser):
+        try:
+            await browser.close()
+        except Exception as e:
+            logger.debug(f"Closing the browser connection failed - {str(e)}")
+
+    async def _get_connection(self, key, browser_type, connection_url, now):
+        async with self._connect_lock:
+            connection = self._connections.get(key)
+            if connection and not connection.browser.is_connected():
+                logger.debug(f"Browser connection to {connection_url} was lost, connecting again")
+                self._retire(connection)
+                connection = None
+
+            if connection:
+                self.reused += 1
+                return connection
+
+            start = time.monotonic()
+            browser = await self._connect(browser_type, connection_url)
+            self.connects += 1
+            self.connect_seconds_total += time.monotonic() - start
+            connection = self._connections[key] = _Connection(key, browser, now)
+            return connection
+
+    def _retire(self, connection):
+        """No new pages on this connection, closed when the last one is done"""
+        if self._connections.get(connection.key) is connection:
+            del self._connections[connection.key]
+            self._retiring.append(connection)
+            self.recycled += 1
+
+    async def _sweep(self, now):
+        for connection in list(self._connections.values()):
+            if not connection.in_use and now - connection.last_used > self.idle_seconds:
+                logger.debug(f"Closing idle browser connection to {connection.key[1]}")
+                self._retire(connection)
+
+        for connection in [c for c in self._retiring if not c.in_use]:
+            self._retiring.remove(connection)
+            await self._close_browser(connection.browser)
+
+    @asynccontextmanager
+    async def browser(self, browser_type, connection_url, proxy=None):
+        """A connected browser to make a new context in, the context has to be closed again by the caller"""
+        self._check_loop()
+
+        if self._pages:
+            start = time.monotonic()
+            self.waiting += 1
+            try:
+                await self._pages.acquire()
+            finally:
+                self.waiting -= 1
+                self.wait_seconds_total += time.monotonic() - start
+        self.pages_in_use += 1
+        self.pages_opened += 1
+
+        try:
+            if not self.enabled:
+                from playwright.async_api import async_playwright
+                async with async_playwright() as p:
+                    browser = await getattr(p, browser_type).connect_over_cdp(connection_url, timeout=CONNECT_TIMEOUT_MS)
+                    try:
+                        yield browser
+                    finally:
+                        await self._close_browser(browser)
+                return
+
+            now = time.time()
+            await self._sweep(now)
+            key = (browser_type, connection_url, (proxy or {}).get('server'))
+            connection = await self._get_connection(key, browser_type, connection_url, now)
+            connection.in_use += 1
+            try:
+                yield connection.browser
+            except Exception as e:
+                # Our own exceptions are about the page (non 200 reply, empty page..), anything else could be the browser
+                if not type(e).__module__.startswith('changedetectionio.') or not connection.browser.is_connected():
+                    logger.warning(f"Replacing the browser connection to {connection_url} after {type(e).__name__}: {str(e)}")
+                    self.errors += 1
+                    self._retire(connection)
+                raise
+            finally:
+                connection.in_use -= 1
+                connection.uses += 1
+                connection.last_used = time.time()
+                if connection.uses >= self.max_uses:
+                    self._retire(connection)
+                await self._sweep(connection.last_used)
+        finally:
+            self.pages_in_use -= 1
+            if self._pages:
+                self._pages.release()
+
+    async def close(self):
+        for connection in list(self._connections.values()) + self._retiring:
+            await self._close_browser(connection.browser)
+        self._connections = {}
+        self._retiring = []
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'connections': len(self._connections),
+            'closing_connections': len(self._retiring),
+            'max_pages': self.max_pages,
+            'pages_in_use': self.pages_in_use,
+            'waiting_for_page': self.waiting,
+            'wait_seconds_avg': round(self.wait_seconds_total / self.pages_opened, 3) if self.pages_opened else 0.0,
+            'connects': self.connects,
+            'connect_seconds_avg': round(self.connect_seconds_total / self.connects, 3) if self.connects else 0.0,
+            'reused': self.reused,
+            'recycled': self.recycled,
+            'errors': self.errors,
+        }
+
+
+playwright_pool = PlaywrightPool()
@@ -12,6 +12,7 @@ from changedetectionio.content_fetchers import SCREENSHOT_MAX_HEIGHT_DEFAULT, vi
 from changedetectionio.content_fetchers.base import Fetcher, manage_user_agent
 from changedetectionio.content_fetchers.exceptions import PageUnloadable, Non200ErrorCodeReceived, EmptyReply, BrowserFetchTimedOut, \
     BrowserConnectError
+from changedetectionio.content_fetchers.resource_blocking import resource_blocker
 
 
 # Bug 3 in Playwright screenshot handling
@@ -234,6 +235,18 @@ class fetcher(Fetcher):
             # https://cri.dev/posts/2020-03-30-How-to-solve-Puppeteer-Chrome-Error-ERR_INVALID_ARGUMENT/
             await self.page.authenticate(self.proxy)
 
+        if self.block_resources:
+            profile = self.block_resources
+
+            async def block_resources(request):
+                if resource_blocker.check(profile, request.resourceType, request.url):
+                    await request.abort()
+                else:
+                    await request.continue_()
+
+            await self.page.setRequestInterception(True)
+            self.page.on('request', lambda request: asyncio.ensure_future(block_resources(request)))
+
         # Re-use as much code from browser steps as possible so its the same
         # from changedetectionio.blueprint.browser_steps.browser_steps import steppable_browser_interface
 
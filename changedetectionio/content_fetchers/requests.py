@@ -3,8 +3,12 @@ import hashlib
 import os
 import asyncio
 from changedetectionio import strtobool
-from changedetectionio.content_fetchers.exceptions import BrowserStepsInUnsupportedFetcher, EmptyReply, Non200ErrorCodeReceived
+from changedetectionio.content_fetchers.exceptions import BrowserStepsInUnsupportedFetcher, EmptyReply, Non200ErrorCodeReceived, ReplyTooLarge
 from changedetectionio.content_fetchers.base import Fetcher
+from changedetectionio.content_fetchers.requests_pool import requests_pool
+
+# Bytes read from the reply at a time
+CHUNK_SIZE = 64 * 1024
 
 
 # "html_requests" is listed as the default fetcher in store.py!
@@ -51,58 +55,111 @@ class fetcher(Fetcher):
 
         session = requests.Session()
 
+        # Connections are kept for the next check, see requests_pool.py
+        pool_key = None
+        if requests_pool.enabled:
+            pool_key = requests_pool.acquire(session, proxies=proxies, verify=False)
 
         if strtobool(os.getenv('ALLOW_FILE_URI', 'false')) and url.startswith('file://'):
             from requests_file import FileAdapter
             session.mount('file://', FileAdapter())
         try:
-            r = session.request(method=request_method,
-                                data=request_body.encode('utf-8') if type(request_body) is str else request_body,
-                                url=url,
-                                headers=request_headers,
-                                timeout=timeout,
-                                proxies=proxies,
-                                verify=False)
-        except Exception as e:
-            msg = str(e)
-            if proxies and 'SOCKSHTTPSConnectionPool' in msg:
-                msg = f"Proxy connection failed? {msg}"
-            raise Exception(msg) from e
+            try:
+                # Streamed, so a huge reply can be stopped before it's all in memory
+                r = session.request(method=request_method,
+                                    data=request_body.encode('utf-8') if type(request_body) is str else request_body,
+                                    url=url,
+                                    headers=request_headers,
+                                    timeout=timeout,
+                                    proxies=proxies,
+                                    stream=True,
+                                    verify=False)
+            except Exception as e:
+                msg = str(e)
+                if proxies and 'SOCKSHTTPSConnectionPool' in msg:
+                    msg = f"Proxy connection failed? {msg}"
+                raise Exception(msg) from e
+
+            try:
+                content, md5 = self._read_body(r, url=url)
+            finally:
+                r.close()
+        finally:
+            if pool_key:
+                requests_pool.release(pool_key)
+
+        self.headers = r.headers
+
+        # Same as the last check, nothing to process (only when we asked, see conditional_requests.py)
+        if r.status_code == 304 and request_headers and any(h in request_headers for h in ('If-None-Match', 'If-Modified-Since')):
+            logger.debug(f"'{url}' was not modified since the last check")
+            self.status_code = r.status_code
+            self.not_modified = True
+            return
+
+        if not content:
+            logger.debug(f"Requests returned empty content for '{url}'")
+            if not empty_pages_are_a_change:
+                raise EmptyReply(url=url, status_code=r.status_code)
+            else:
+                logger.debug(f"URL {url} gave zero byte content reply with Status Code {r.status_code}, but empty_pages_are_a_change = True")
 
         # If the response did not tell us what encoding format to expect, Then use chardet to override what `requests` thinks.
         # For example - some sites don't tell us it's utf-8, but return utf-8 content
         # This seems to not occur when using webdriver/selenium, it seems to detect the text encoding more reliably.
         # https://github.com/psf/requests/issues/1604 good info about requests encoding detection
-        if not is_binary:
+        if not is_binary or (r.status_code != 200 and not ignore_status_codes):
             # Don't run this for PDF (and requests identified as binary) takes a _long_ time
             if not r.headers.get('content-type') or not 'charset=' in r.headers.get('content-type'):
-                encoding = chardet.detect(r.content)['encoding']
+                encoding = chardet.detect(content)['encoding']
                 if encoding:
                     r.encoding = encoding
 
-        self.headers = r.headers
-
-        if not r.content or not len(r.content):
-            logger.debug(f"Requests returned empty content for '{url}'")
-            if not empty_pages_are_a_change:
-                raise EmptyReply(url=url, status_code=r.status_code)
-            else:
-                logger.debug(f"URL {url} gave zero byte content reply with Status Code {r.status_code}, but empty_pages_are_a_change = True")
-
         # @todo test this
         # @todo maybe you really want to test zero-byte return pages?
         if r.status_code != 200 and not ignore_status_codes:
             # maybe check with content works?
-            raise Non200ErrorCodeReceived(url=url, status_code=r.status_code, page_html=r.text)
+            raise Non200ErrorCodeReceived(url=url, status_code=r.status_code, page_html=self._decode(content, r.encoding))
 
         self.status_code = r.status_code
         if is_binary:
             # Binary files just return their checksum until we add something smarter
-            self.content = hashlib.md5(r.content).hexdigest()
+            self.content = md5.hexdigest()
         else:
-            self.content = r.text
-
-        self.raw_content = r.content
+            self.content = self._decode(content, r.encoding)
+
+        self.raw_content = content
+
+    def _read_body(self, r, url):
+        """The reply body (and its md5) read in chunks, stops as soon as it's over max_download_bytes"""
+        max_bytes = self.max_download_bytes
+
+        # Don't even start when it says it's too big (compressed replies are only known after decompressing)
+        content_length = r.headers.get('Content-Length', '')
+        if max_bytes and content_length.isdigit() and not r.headers.get('Content-Encoding') and int(content_length) > max_bytes:
+            raise ReplyTooLarge(url=url, status_code=r.status_code, max_bytes=max_bytes)
+
+        chunks = []
+        md5 = hashlib.md5()
+        size = 0
+        for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+            size += len(chunk)
+            if max_bytes and size > max_bytes:
+                logger.warning(f"Stopped downloading '{url}' after {size} bytes, the limit is {max_bytes} bytes")
+                raise ReplyTooLarge(url=url, status_code=r.status_code, max_bytes=max_bytes)
+            md5.update(chunk)
+            chunks.append(chunk)
+
+        return b''.join(chunks), md5
+
+    def _decode(self, content, encoding):
+        # Same as requests Response.text
+        if not content:
+            return ''
+        try:
+            return str(content, encoding or 'utf-8', errors='replace')
+        except (LookupError, TypeError):
+            return str(content, errors='replace')
 
     async def run(self,
                   fetch_favicon=True,
@@ -0,0 +1,154 @@
+"""
+Connection pools shared between the checks of the "requests" fetcher, so hundreds of watches on the same host don't
+each pay for a new TCP connection and TLS handshake.
+
+One requests HTTPAdapter (with its urllib3 pools, one per host, up to REQUESTS_POOL_HOSTS hosts and
+REQUESTS_POOL_PER_HOST connections kept per host) for each proxy and TLS setting. Every check still gets its own
+requests.Session, only the adapter is shared, so cookies never leak from one watch to another. Adapters not used for
+REQUESTS_POOL_IDLE_SECONDS (default 120) are closed.
+
+On by default, REQUESTS_POOL=false goes back to a new connection for every check.
+"""
+
+from changedetectionio.strtobool import strtobool
+from loguru import logger
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+import os
+import threading
+import time
+
+# Don't look for idle adapters more often than this
+SWEEP_SECONDS = 30
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.monotonic()
+        super().connect()
+        requests_pool.record_connect(time.monotonic() - start)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        # Includes the TLS handshake
+        start = time.monotonic()
+        super().connect()
+        requests_pool.record_connect(time.monotonic() - start)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+TIMED_POOL_CLASSES = {'http': _TimedHTTPConnectionPool, 'https': _TimedHTTPSConnectionPool}
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter that counts the requests and times the new connections (not for SOCKS proxies)"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = TIMED_POOL_CLASSES
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        is_new = proxy not in self.proxy_manager
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        if is_new and not proxy.lower().startswith('socks'):
+            manager.pool_classes_by_scheme = TIMED_POOL_CLASSES
+        return manager
+
+    def send(self, request, **kwargs):
+        requests_pool.record_request()
+        return super().send(request, **kwargs)
+
+
+class RequestsPool:
+
+    def __init__(self):
+        self.enabled = strtobool(os.getenv('REQUESTS_POOL', 'True'))
+        self.pool_hosts = int(os.getenv('REQUESTS_POOL_HOSTS', 100))
+        self.pool_per_host = int(os.getenv('REQUESTS_POOL_PER_HOST', 4))
+        self.idle_seconds = int(os.getenv('REQUESTS_POOL_IDLE_SECONDS', 120))
+
+        self._lock = threading.Lock()
+        # (proxy, verify) -> {'adapter', 'in_use', 'last_used'}
+        self._adapters = {}
+        self._last_sweep = 0
+
+        self.requests = 0
+        self.connections = 0
+        self.connect_seconds_total = 0.0
+        self.evicted = 0
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_connect(self, seconds):
+        with self._lock:
+            self.connections += 1
+            self.connect_seconds_total += seconds
+
+    def acquire(self, session, proxies=None, verify=False, now=None):
+        """Mount the shared adapter for these proxies on the session, release() it with the same key when done"""
+        now = time.time() if now is None else now
+        key = (tuple(sorted((proxies or {}).items())), verify)
+        with self._lock:
+            self._sweep(now)
+            entry = self._adapters.get(key)
+            if entry is None:
+                adapter = PooledAdapter(pool_connections=self.pool_hosts, pool_maxsize=self.pool_per_host)
+                entry = self._adapters[key] = {'adapter': adapter, 'in_use': 0, 'last_used': now}
+            entry['in_use'] += 1
+            entry['last_used'] = now
+
+        session.mount('http://', entry['adapter'])
+        session.mount('https://', entry['adapter'])
+        return key
+
+    def release(self, key, now=None):
+        with self._lock:
+            entry = self._adapters.get(key)
+            if entry:
+                entry['in_use'] = max(0, entry['in_use'] - 1)
+                entry['last_used'] = time.time() if now is None else now
+
+    def _sweep(self, now):
+        """Call with the lock held, closes the adapters nobody used for a while"""
+        if now - self._last_sweep < SWEEP_SECONDS:
+            return
+        self._last_sweep = now
+        for key, entry in list(self._adapters.items()):
+            if not entry['in_use'] and now - entry['last_used'] > self.idle_seconds:
+                del self._adapters[key]
+                entry['adapter'].close()
+                self.evicted += 1
+                logger.debug(f"Closed idle connection pool for proxy {dict(key[0]) or 'none'}")
+
+    def close(self):
+        with self._lock:
+            adapters, self._adapters = self._adapters, {}
+        for entry in adapters.values():
+            entry['adapter'].close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'adapters': len(self._adapters),
+                'requests': self.requests,
+                'new_connections': self.connections,
+                'reused_connections': max(0, self.requests - self.connections),
+                'reuse_ratio': round(1 - self.connections / self.requests, 3) if self.requests else 0.0,
+                'connect_seconds_avg': round(self.connect_seconds_total / self.connections, 4) if self.connections else 0.0,
+                'evicted': self.evicted,
+            }
+
+
+requests_pool = RequestsPool()
@@ -0,0 +1,135 @@
+"""
+Don't load what isn't needed for the text when fetching with a browser, images, fonts, media and/or known ad and
+analytics hosts are blocked by request interception (Playwright and Puppeteer fetchers).
+
+Set in "Settings > Fetching" for all watches, and per watch in the "Request" tab. The page itself is never blocked.
+
+Everything is loaded anyway when a good screenshot or the visual selector data is needed, when the watch has nothing
+saved yet, or has no screenshot or visual selector data yet, attaches screenshots to notifications, or uses browser
+steps. (Screenshots saved later, when a change is found, can have images missing.)
+
+Counters of blocked requests by type since startup are in /stats.
+"""
+
+from loguru import logger
+from urllib.parse import urlparse
+import threading
+
+BLOCK_NONE = 'none'
+BLOCK_MEDIA = 'media'
+BLOCK_MEDIA_AND_TRACKERS = 'media_trackers'
+BLOCK_TRACKERS = 'trackers'
+
+PROFILES = {
+    BLOCK_NONE: {'types': set(), 'trackers': False},
+    BLOCK_MEDIA: {'types': {'image', 'font', 'media'}, 'trackers': False},
+    BLOCK_TRACKERS: {'types': set(), 'trackers': True},
+    BLOCK_MEDIA_AND_TRACKERS: {'types': {'image', 'font', 'media'}, 'trackers': True},
+}
+
+PROFILE_CHOICES = [
+    (BLOCK_NONE, 'Load everything'),
+    (BLOCK_MEDIA, 'Block images, fonts and media'),
+    (BLOCK_TRACKERS, 'Block known ad and analytics hosts'),
+    (BLOCK_MEDIA_AND_TRACKERS, 'Block images, fonts, media and known ad and analytics hosts'),
+]
+
+# Hosts (and their subdomains) that are only ads, analytics and tracking
+TRACKER_HOSTS = {
+    'adnxs.com',
+    'adservice.google.com',
+    'amazon-adsystem.com',
+    'bat.bing.com',
+    'clarity.ms',
+    'connect.facebook.net',
+    'criteo.com',
+    'criteo.net',
+    'demdex.net',
+    'doubleclick.net',
+    'google-analytics.com',
+    'googleadservices.com',
+    'googlesyndication.com',
+    'googletagmanager.com',
+    'googletagservices.com',
+    'hotjar.com',
+    'mixpanel.com',
+    'moatads.com',
+    'nr-data.net',
+    'outbrain.com',
+    'quantserve.com',
+    'rubiconproject.com',
+    'scorecardresearch.com',
+    'segment.com',
+    'segment.io',
+    'taboola.com',
+}
+
+# Request types that are never blocked
+NEVER_BLOCKED_TYPES = {'document'}
+
+
+def is_tracker_host(url):
+    host = (urlparse(url).hostname or '').lower()
+    while host:
+        if host in TRACKER_HOSTS:
+            return True
+        host = host.partition('.')[2]
+    return False
+
+
+def profile_for_check(watch, datastore):
+    """The blocking profile to use for this check of the watch, or None to load everything"""
+    profile = watch.get('block_resources') or datastore.data['settings']['requests'].get('block_resources') or BLOCK_NONE
+    if profile not in PROFILES or profile == BLOCK_NONE:
+        return None
+
+    # Needs a complete screenshot / the visual selector data
+    if not watch.history_n or not watch.get_screenshot() or not watch.has_xpath_data:
+        return None
+    if watch.get('notification_screenshot') or watch.has_browser_steps:
+        return None
+    return profile
+
+
+class ResourceBlocker:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.blocked = {}
+
+    def should_block(self, profile, resource_type, url):
+        """What to count the request as when it should be blocked, or None"""
+        rules = PROFILES.get(profile)
+        if not rules or resource_type in NEVER_BLOCKED_TYPES:
+            return None
+        if resource_type in rules['types']:
+            return resource_type
+        if rules['trackers'] and is_tracker_host(url):
+            return 'tracker'
+        return None
+
+    def check(self, profile, resource_type, url):
+        """True when the request should be blocked, and counts it"""
+        reason = self.should_block(profile, resource_type, url)
+        with self._lock:
+            if reason:
+                self.blocked[reason] = self.blocked.get(reason, 0) + 1
+            else:
+                self.allowed += 1
+        if reason:
+            logger.trace(f"Blocked {reason} request {url}")
+        return bool(reason)
+
+    def stats(self):
+        with self._lock:
+            blocked = sum(self.blocked.values())
+            return {
+                'allowed': self.allowed,
+                'blocked': blocked,
+                'blocked_by_type': dict(self.blocked),
+                'blocked_ratio': round(blocked / (blocked + self.allowed), 3) if blocked + self.allowed else 0.0,
+            }
+
+
+resource_blocker = ResourceBlocker()
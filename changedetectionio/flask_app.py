@@ -12,8 +12,14 @@ from blinker import signal
 
 from changedetectionio.strtobool import strtobool
 from threading import Event
-from changedetectionio.queue_handlers import RecheckPriorityQueue, NotificationQueue
+from changedetectionio.queue_handlers import RecheckPriorityQueue, NotificationQueue, watch_classifier
+from changedetectionio import adaptive_recheck
 from changedetectionio import worker_handler
+from changedetectionio.scheduler import RecheckScheduler
+from changedetectionio.host_limiter import host_limiter
+from changedetectionio.proxy_pool import proxy_pool, candidates_for_proxy
+from changedetectionio.remote_runners import lease_manager
+from changedetectionio.worker_autoscaler import worker_autoscaler
 
 from flask import (
     Flask,
@@ -38,9 +44,9 @@ from loguru import logger
 
 from changedetectionio import __version__
 from changedetectionio import queuedWatchMetaData
-from changedetectionio.api import Watch, WatchHistory, WatchSingleHistory, CreateWatch, Import, SystemInfo, Tag, Tags, Notifications, WatchFavicon
+from changedetectionio.api import Watch, WatchHistory, WatchSingleHistory, CreateWatch, Import, SystemInfo, Tag, Tags, Notifications, WatchFavicon, RunnerLease, RunnerResult
 from changedetectionio.api.Search import Search
-from .time_handler import is_within_schedule
+from .time_handler import is_within_schedule, next_schedule_start
 
 datastore = None
 
@@ -51,6 +57,7 @@ extra_stylesheets = []
 # Use bulletproof janus-based queues for sync/async reliability  
 update_q = RecheckPriorityQueue()
 notification_q = NotificationQueue()
+recheck_scheduler = RecheckScheduler()
 MAX_QUEUE_SIZE = 2000
 
 app = Flask(__name__,
@@ -259,6 +266,10 @@ def changedetection_app(config=None, datastore_o=None):
     global datastore, socketio_server
     datastore = datastore_o
 
+    # Optionally share the workers fairly between tags (or processors) when there's a backlog, see queue_handlers.py
+    fair_queue_by = os.getenv('QUEUE_FAIR_BY', '').strip().lower()
+    update_q.set_classifier(watch_classifier(datastore, by=fair_queue_by) if fair_queue_by in ('tag', 'processor') else None)
+
     # so far just for read-only via tests, but this will be moved eventually to be the main source
     # (instead of the global var)
     app.config['DATASTORE'] = datastore_o
@@ -337,6 +348,12 @@ def changedetection_app(config=None, datastore_o=None):
     watch_api.add_resource(Notifications, '/api/v1/notifications',
                            resource_class_kwargs={'datastore': datastore})
 
+    watch_api.add_resource(RunnerLease, '/api/v1/runner/lease',
+                           resource_class_kwargs={'datastore': datastore, 'update_q': update_q})
+
+    watch_api.add_resource(RunnerResult, '/api/v1/runner/result/<string:lease_id>',
+                           resource_class_kwargs={'datastore': datastore, 'update_q': update_q})
+
     @login_manager.user_loader
     def user_loader(email):
         user = User()
@@ -572,6 +589,42 @@ def changedetection_app(config=None, datastore_o=None):
             "expected_workers": expected_workers
         })
 
+    # Counters from the various caches, for monitoring
+    @app.route('/stats', methods=['GET'])
+    @login_optionally_required
+    def stats():
+        from flask import jsonify
+        from changedetectionio.model.snapshot_cache import snapshot_cache
+        from changedetectionio.store.config_files import config_file_cache
+        from changedetectionio.processing_pool import processing_pool
+        from changedetectionio.content_fetchers.requests_pool import requests_pool
+        from changedetectionio.content_fetchers.playwright_pool import playwright_pool
+        from changedetectionio.content_fetchers.resource_blocking import resource_blocker
+        from changedetectionio import conditional_requests
+        from changedetectionio.processors import unchanged_content_stats
+
+        # Tag titles are easier to read than their UUIDs
+        tags = datastore.data['settings']['application']['tags']
+        queue_classes = {key: {'title': tags[key].get('title') if key in tags else key, **class_stats}
+                         for key, class_stats in update_q.get_class_stats().items()}
+
+        return jsonify({
+            "status": "success",
+            "snapshot_cache": snapshot_cache.stats(),
+            "scheduler": recheck_scheduler.stats(),
+            "host_limiter": host_limiter.stats(),
+            "proxy_pool": proxy_pool.stats(),
+            "config_files": config_file_cache.stats(),
+            "processing_pool": processing_pool.stats(),
+            "remote_runners": lease_manager.stats(),
+            "queue_classes": queue_classes,
+            "requests_pool": requests_pool.stats(),
+            "playwright_pool": playwright_pool.stats(),
+            "resource_blocking": resource_blocker.stats(),
+            "conditional_requests": conditional_requests.stats(),
+            "unchanged_content": unchanged_content_stats(),
+        })
+
     # Queue status endpoint
     @app.route('/queue-status', methods=['GET'])
     @login_optionally_required
@@ -599,7 +652,8 @@ def changedetection_app(config=None, datastore_o=None):
                 summary = update_q.get_queue_summary()
                 return jsonify({
                     "status": "success",
-                    "queue_summary": summary
+                    "queue_summary": summary,
+                    "workers": worker_autoscaler.status()
                 })
             else:
                 # Get queued items with pagination support
@@ -614,7 +668,8 @@ def changedetection_app(config=None, datastore_o=None):
                 return jsonify({
                     "status": "success",
                     "queue_size": update_q.qsize(),
-                    "queued_data": all_queued
+                    "queued_data": all_queued,
+                    "workers": worker_autoscaler.status()
                 })
 
     # Start the async workers during app initialization
@@ -719,15 +774,42 @@ def notification_runner():
 
 
 # Threaded runner, look for new watches to feed into the Queue.
-def ticker_thread_check_time_launch_checks():
+def _watch_due_time(watch, recheck_time_system_seconds, recheck_time_minimum_seconds, jitter, adaptive=False):
+    """When the watch should next be checked, last_checked plus its recheck time (with jitter)"""
     import random
-    proxy_last_called_time = {}
+
+    # #580 - Jitter plus/minus amount of time to make the check seem more random to the server
+    if jitter > 0 and watch.jitter_seconds == 0:
+        watch.jitter_seconds = random.uniform(-abs(jitter), jitter)
+
+    # If they supplied an individual entry minutes to threshold.
+    threshold = recheck_time_system_seconds if watch.get('time_between_check_use_default') else watch.threshold_seconds()
+
+    # Learnt from how often the page changes, see adaptive_recheck.py
+    if adaptive and watch.get('time_between_check_use_default') and watch.get('recheck_adaptive_seconds'):
+        threshold = watch['recheck_adaptive_seconds']
+
+    return watch['last_checked'] + max(threshold + watch.jitter_seconds, recheck_time_minimum_seconds)
+
+
+def _watch_uuids():
+    # Re #232 - Copy the keys incase it changes while we're iterating through it all
+    while True:
+        try:
+            return list(datastore.data['watching'].keys())
+        except RuntimeError as e:
+            # RuntimeError: dictionary changed size during iteration
+            time.sleep(0.1)
+
+
+def ticker_thread_check_time_launch_checks():
     last_health_check = 0
 
     recheck_time_minimum_seconds = int(os.getenv('MINIMUM_SECONDS_RECHECK_TIME', 3))
     logger.debug(f"System env MINIMUM_SECONDS_RECHECK_TIME {recheck_time_minimum_seconds}")
 
     # Workers are now started during app initialization, not here
+    recheck_scheduler.connect_signals()
 
     while not app.config.exit.is_set():
 
@@ -735,6 +817,8 @@ def ticker_thread_check_time_launch_checks():
         now = time.time()
         if now - last_health_check > 60:
             expected_workers = int(os.getenv("FETCH_WORKERS", datastore.data['settings']['requests']['workers']))
+            if worker_autoscaler.enabled and worker_autoscaler.target:
+                expected_workers = worker_autoscaler.target
             health_result = worker_handler.check_worker_health(
                 expected_count=expected_workers,
                 update_q=update_q,
@@ -748,45 +832,67 @@ def ticker_thread_check_time_launch_checks():
                 
             last_health_check = now
 
-        # Get a list of watches by UUID that are currently fetching data
-        running_uuids = worker_handler.get_running_uuids()
+        # More or fewer workers for the load, see worker_autoscaler.py
+        if worker_autoscaler.enabled:
+            worker_autoscaler.tick(update_q, notification_q, app, datastore)
 
-        # Re #232 - Deepcopy the data incase it changes while we're iterating through it all
-        watch_uuid_list = []
-        while True:
-            try:
-                # Get a list of watches sorted by last_checked, [1] because it gets passed a tuple
-                # This is so we examine the most over-due first
-                for k in sorted(datastore.data['watching'].items(), key=lambda item: item[1].get('last_checked',0)):
-                    watch_uuid_list.append(k[0])
-
-            except RuntimeError as e:
-                # RuntimeError: dictionary changed size during iteration
-                time.sleep(0.1)
-                watch_uuid_list = []
-            else:
-                break
+        # Checks a remote runner didn't finish in time go back in the queue
+        if lease_manager.enabled:
+            lease_manager.requeue_expired(update_q)
+
+        tick_start = time.time()
+        recheck_time_system_seconds = int(datastore.threshold_seconds)
+        jitter = datastore.data['settings']['requests'].get('jitter_seconds', 0)
+        tz_name = datastore.data['settings']['application'].get('scheduler_timezone_default', os.getenv('TZ', 'UTC').strip())
+        adaptive = adaptive_recheck.settings(datastore)[0]
+
+        # Anything global that the due times depend on, everything is scheduled again when it changes
+        settings_fingerprint = (recheck_time_system_seconds, jitter, tz_name, adaptive,
+                                repr(datastore.data['settings']['requests'].get('time_schedule_limit', {})))
+
+        if recheck_scheduler.needs_resync(tick_start, settings_fingerprint):
+            changed_uuids = _watch_uuids()
+        else:
+            # Only the UUIDs, no watch is loaded for this
+            if recheck_scheduler.index_check_due(tick_start):
+                recheck_scheduler.check_index(_watch_uuids())
+            changed_uuids = recheck_scheduler.take_changed()
+
+        for uuid in changed_uuids:
+            watch = datastore.data['watching'].get(uuid)
+            # No need todo further processing if it's paused
+            if not watch or watch['paused']:
+                recheck_scheduler.remove(uuid)
+                continue
+            recheck_scheduler.schedule(uuid, _watch_due_time(watch, recheck_time_system_seconds, recheck_time_minimum_seconds, jitter, adaptive))
 
         # Re #438 - Don't place more watches in the queue to be checked if the queue is already large
         while update_q.qsize() >= 2000:
             logger.warning(f"Recheck watches queue size limit reached ({MAX_QUEUE_SIZE}), skipping adding more items")
             time.sleep(3)
 
+        # Get a list of watches by UUID that are currently fetching data
+        running_uuids = worker_handler.get_running_uuids()
+        lags = []
 
-        recheck_time_system_seconds = int(datastore.threshold_seconds)
-
-        # Check for watches outside of the time threshold to put in the thread queue.
-        for uuid in watch_uuid_list:
+        # Only the watches that are due, most over-due first
+        due_watches = recheck_scheduler.pop_due(time.time())
+        for uuid, scheduled_time in due_watches:
             now = time.time()
             watch = datastore.data['watching'].get(uuid)
             if not watch:
                 logger.error(f"Watch: {uuid} no longer present.")
                 continue
 
-            # No need todo further processing if it's paused
             if watch['paused']:
                 continue
 
+            # Could have been checked or changed since it was scheduled
+            due = _watch_due_time(watch, recheck_time_system_seconds, recheck_time_minimum_seconds, jitter, adaptive)
+            if due > now:
+                recheck_scheduler.schedule(uuid, due)
+                continue
+
             # @todo - Maybe make this a hook?
             # Time schedule limit - Decide between watch or global settings
             if watch.get('time_between_check_use_default'):
@@ -795,7 +901,6 @@ def ticker_thread_check_time_launch_checks():
             else:
                 time_schedule_limit = watch.get('time_schedule_limit')
                 logger.trace(f"{uuid} Time scheduler - Using watch settings (not global settings)")
-            tz_name = datastore.data['settings']['application'].get('scheduler_timezone_default', os.getenv('TZ', 'UTC').strip())
 
             if time_schedule_limit and time_schedule_limit.get('enabled'):
                 try:
@@ -803,65 +908,60 @@ def ticker_thread_check_time_launch_checks():
                                                 default_tz=tz_name
                                                 )
                     if not result:
-                        logger.trace(f"{uuid} Time scheduler - not within schedule skipping.")
+                        # Looked at again when the next time window starts, or after its usual recheck time if that's
+                        # sooner (the schedule can be changed without telling anyone), not on every tick
+                        next_look = now + (due - watch['last_checked'])
+                        next_start = next_schedule_start(time_schedule_limit=time_schedule_limit, default_tz=tz_name)
+                        if next_start:
+                            next_look = min(next_look, next_start)
+                        logger.trace(f"{uuid} Time scheduler - not within schedule skipping until {next_look:.0f}.")
+                        recheck_scheduler.schedule(uuid, max(next_look, now + 1))
                         continue
                 except Exception as e:
                     logger.error(
                         f"{uuid} - Recheck scheduler, error handling timezone, check skipped - TZ name '{tz_name}' - {str(e)}")
                     return False
-            # If they supplied an individual entry minutes to threshold.
-            threshold = recheck_time_system_seconds if watch.get('time_between_check_use_default') else watch.threshold_seconds()
-
-            # #580 - Jitter plus/minus amount of time to make the check seem more random to the server
-            jitter = datastore.data['settings']['requests'].get('jitter_seconds', 0)
-            if jitter > 0:
-                if watch.jitter_seconds == 0:
-                    watch.jitter_seconds = random.uniform(-abs(jitter), jitter)
-
-            seconds_since_last_recheck = now - watch['last_checked']
-
-            if seconds_since_last_recheck >= (threshold + watch.jitter_seconds) and seconds_since_last_recheck >= recheck_time_minimum_seconds:
-                if not uuid in running_uuids and uuid not in [q_uuid.item['uuid'] for q_uuid in update_q.queue]:
-
-                    # Proxies can be set to have a limit on seconds between which they can be called
-                    watch_proxy = datastore.get_preferred_proxy_for_watch(uuid=uuid)
-                    if watch_proxy and watch_proxy in list(datastore.proxy_list.keys()):
-                        # Proxy may also have some threshold minimum
-                        proxy_list_reuse_time_minimum = int(datastore.proxy_list.get(watch_proxy, {}).get('reuse_time_minimum', 0))
-                        if proxy_list_reuse_time_minimum:
-                            proxy_last_used_time = proxy_last_called_time.get(watch_proxy, 0)
-                            time_since_proxy_used = int(time.time() - proxy_last_used_time)
-                            if time_since_proxy_used < proxy_list_reuse_time_minimum:
-                                # Not enough time difference reached, skip this watch
-                                logger.debug(f"> Skipped UUID {uuid} "
-                                        f"using proxy '{watch_proxy}', not "
-                                        f"enough time between proxy requests "
-                                        f"{time_since_proxy_used}s/{proxy_list_reuse_time_minimum}s")
-                                continue
-                            else:
-                                # Record the last used time
-                                proxy_last_called_time[watch_proxy] = int(time.time())
-
-                    # Use Epoch time as priority, so we get a "sorted" PriorityQueue, but we can still push a priority 1 into it.
-                    priority = int(time.time())
-
-                    # Into the queue with you
-                    queued_successfully = worker_handler.queue_item_async_safe(update_q,
-                                                                               queuedWatchMetaData.PrioritizedItem(priority=priority,
-                                                                                                                   item={'uuid': uuid})
-                                                                               )
-                    if queued_successfully:
-                        logger.debug(
-                            f"> Queued watch UUID {uuid} "
-                            f"last checked at {watch['last_checked']} "
-                            f"queued at {now:0.2f} priority {priority} "
-                            f"jitter {watch.jitter_seconds:0.2f}s, "
-                            f"{now - watch['last_checked']:0.2f}s since last checked")
-                    else:
-                        logger.critical(f"CRITICAL: Failed to queue watch UUID {uuid} in ticker thread!")
-                        
-                    # Reset for next time
-                    watch.jitter_seconds = 0
+
+            # Already being checked (or waiting for its host), it's scheduled again when the check finishes ('watch_check_update')
+            if uuid in running_uuids or update_q.contains(uuid) or host_limiter.is_deferred(uuid):
+                continue
+
+            # Proxies can be set to have a limit on seconds between which they can be called, and how many at once,
+            # with a pool any free member will do, the worker picks which one (see proxy_pool.py)
+            proxy_list = datastore.proxy_list
+            proxy_candidates = candidates_for_proxy(proxy_list, datastore.get_preferred_proxy_for_watch(uuid=uuid))
+            if proxy_candidates:
+                proxy_wait = proxy_pool.wait_time(proxy_list, proxy_candidates)
+                if proxy_wait:
+                    # Not enough time since the proxy was last used (or it's busy), skip this watch until it can be used again
+                    logger.debug(f"> Skipped UUID {uuid} no proxy free out of {proxy_candidates}, trying again in {proxy_wait:.1f}s")
+                    recheck_scheduler.schedule(uuid, now + proxy_wait)
+                    continue
+
+            # Use Epoch time as priority, so we get a "sorted" PriorityQueue, but we can still push a priority 1 into it.
+            priority = int(time.time())
+
+            # Into the queue with you
+            queued_successfully = worker_handler.queue_item_async_safe(update_q,
+                                                                       queuedWatchMetaData.PrioritizedItem(priority=priority,
+                                                                                                           item={'uuid': uuid})
+                                                                       )
+            if queued_successfully:
+                lags.append(now - due)
+                logger.debug(
+                    f"> Queued watch UUID {uuid} "
+                    f"last checked at {watch['last_checked']} "
+                    f"queued at {now:0.2f} priority {priority} "
+                    f"jitter {watch.jitter_seconds:0.2f}s, "
+                    f"{now - watch['last_checked']:0.2f}s since last checked")
+            else:
+                logger.critical(f"CRITICAL: Failed to queue watch UUID {uuid} in ticker thread!")
+                recheck_scheduler.schedule(uuid, now + 1)
+
+            # Reset for next time
+            watch.jitter_seconds = 0
+
+        recheck_scheduler.record_tick(lags=lags, tick_seconds=time.time() - tick_start, due_count=len(due_watches))
 
         # Wait before checking the list again - saves CPU
         time.sleep(1)
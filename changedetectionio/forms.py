@@ -38,6 +38,7 @@ from changedetectionio.widgets import TernaryNoneBooleanField
 from changedetectionio.blueprint.browser_steps.browser_steps import browser_step_ui_config
 
 from changedetectionio import html_tools, content_fetchers
+from changedetectionio.content_fetchers.resource_blocking import PROFILE_CHOICES as BLOCK_RESOURCES_CHOICES
 
 from changedetectionio.notification import (
     valid_notification_formats,
@@ -760,6 +761,7 @@ class commonSettingsForm(Form):
     processor = RadioField( label=u"Processor - What do you want to achieve?", choices=processors.available_processors(), default="text_json_diff")
     scheduler_timezone_default = StringField("Default timezone for watch check scheduler", render_kw={"list": "timezones"}, validators=[validateTimeZoneName()])
     webdriver_delay = IntegerField('Wait seconds before extracting text', validators=[validators.Optional(), validators.NumberRange(min=1, message="Should contain one or more seconds")])
+    max_download_mb = IntegerField('Maximum download size in MB', render_kw={"style": "width: 5em;"}, validators=[validators.Optional(), validators.NumberRange(min=1, message="Should be at least 1 MB")])
 
 
 class importForm(Form):
@@ -824,6 +826,7 @@ class processor_text_json_diff_form(commonSettingsForm):
         browser_steps = FieldList(FormField(SingleBrowserStep), min_entries=10)
     text_should_not_be_present = StringListField('Block change-detection while text matches', [validators.Optional(), ValidateListRegex()])
     webdriver_js_execute_code = TextAreaField('Execute JavaScript before change detection', render_kw={"rows": "5"}, validators=[validators.Optional()])
+    block_resources = SelectField('Don\'t load', choices=[('', 'Use the global settings')] + BLOCK_RESOURCES_CHOICES, default='', validators=[validators.Optional()])
 
     save_button = SubmitField('Save', render_kw={"class": "pure-button pure-button-primary"})
 
@@ -955,6 +958,16 @@ class globalSettingsRequestForm(Form):
     jitter_seconds = IntegerField('Random jitter seconds ± check',
                                   render_kw={"style": "width: 5em;"},
                                   validators=[validators.NumberRange(min=0, message="Should contain zero or more seconds")])
+
+    block_resources = SelectField('Chrome/Javascript fetches don\'t load', choices=BLOCK_RESOURCES_CHOICES, default='none', validators=[validators.Optional()])
+
+    adaptive_recheck = BooleanField('Adapt the recheck time to how often each page changes', default=False)
+    adaptive_recheck_min_minutes = IntegerField('Shortest recheck time in minutes',
+                                                render_kw={"style": "width: 5em;"},
+                                                validators=[validators.Optional(), validators.NumberRange(min=1, message="Should be at least 1 minute")])
+    adaptive_recheck_max_minutes = IntegerField('Longest recheck time in minutes',
+                                                render_kw={"style": "width: 5em;"},
+                                                validators=[validators.Optional(), validators.NumberRange(min=1, message="Should be at least 1 minute")])
     
     workers = IntegerField('Number of fetch workers',
                           render_kw={"style": "width: 5em;"},
@@ -966,6 +979,18 @@ class globalSettingsRequestForm(Form):
                            validators=[validators.NumberRange(min=1, max=999,
                                                               message="Should be between 1 and 999")])
 
+    max_download_mb = IntegerField('Maximum download size in MB',
+                                   render_kw={"style": "width: 5em;"},
+                                   validators=[validators.Optional(), validators.NumberRange(min=0, message="Should be zero or more")])
+
+    host_requests_per_minute = IntegerField('Maximum requests per minute to the same host',
+                                            render_kw={"style": "width: 5em;"},
+                                            validators=[validators.Optional(), validators.NumberRange(min=0, message="Should be zero or more")])
+
+    host_max_in_flight = IntegerField('Maximum requests at the same time to the same host',
+                                      render_kw={"style": "width: 5em;"},
+                                      validators=[validators.Optional(), validators.NumberRange(min=0, message="Should be zero or more")])
+
     extra_proxies = FieldList(FormField(SingleExtraProxy), min_entries=5)
     extra_browsers = FieldList(FormField(SingleExtraBrowser), min_entries=5)
 
@@ -0,0 +1,182 @@
+"""
+Per-host politeness, limits how often and how many checks at the same time can go to one host
+
+Applied by the async workers between taking a watch from the queue and fetching it. When the host has had too many
+requests lately (token bucket, "requests per minute") or too many are already running against it ("at the same time"),
+the watch is put back in the queue a little later and the worker carries on with the next one, so a tag full of pages
+on one shop doesn't tie up every worker.
+
+A watch put back because of the requests per minute reserves the next free slot of the bucket, so the watches waiting
+for a host come back one slot apart (and go ahead when they do) instead of all at once.
+
+Set in the global settings (requests) and per tag, for a watch in tags with their own limits the strictest of those
+tags is used instead of the global one. 0 or empty is no limit.
+"""
+
+from urllib.parse import urlparse
+import threading
+import time
+
+# When a host is busy with too many at once, look again after this many seconds
+IN_FLIGHT_RETRY_SECONDS = 1.0
+
+# A reservation nobody came back for is forgotten after this many seconds (the watch was deleted or paused)
+RESERVATION_GRACE_SECONDS = 300
+
+
+def host_for_url(url):
+    try:
+        return (urlparse(url).hostname or '').lower()
+    except ValueError:
+        return ''
+
+
+def limits_for_watch(datastore, watch):
+    """(requests per minute, maximum at the same time) for this watch, 0 is no limit"""
+    requests_settings = datastore.data['settings']['requests']
+    per_minute = requests_settings.get('host_requests_per_minute') or 0
+    in_flight = requests_settings.get('host_max_in_flight') or 0
+
+    tag_per_minute = []
+    tag_in_flight = []
+    for tag_uuid in watch.get('tags', []):
+        tag = datastore.data['settings']['application']['tags'].get(tag_uuid)
+        if not tag:
+            continue
+        if tag.get('host_requests_per_minute'):
+            tag_per_minute.append(tag['host_requests_per_minute'])
+        if tag.get('host_max_in_flight'):
+            tag_in_flight.append(tag['host_max_in_flight'])
+
+    if tag_per_minute:
+        per_minute = min(tag_per_minute)
+    if tag_in_flight:
+        in_flight = min(tag_in_flight)
+
+    return per_minute, in_flight
+
+
+class HostLimiter:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # host -> [tokens, last refill time]
+        self._buckets = {}
+        self._in_flight = {}
+        # uuid -> time it goes back in the queue
+        self._deferred = {}
+        # uuid -> (host, time its reserved slot is free)
+        self._reserved = {}
+        self._last_sweep = 0
+        self._in_flight_retry_at = {}
+
+        self.acquired = 0
+        self.deferred_total = 0
+        self.deferred_by_host = {}
+
+    def try_acquire(self, host, per_minute=0, max_in_flight=0, now=None, uuid=None):
+        """
+        :param uuid: When given, a watch that has to wait for the requests per minute reserves its slot
+        :return: 0 when the check can go ahead, release() the host when it's done, otherwise seconds until it's worth trying again
+        """
+        if not host or (not per_minute and not max_in_flight):
+            return 0
+
+        now = time.time() if now is None else now
+        with self._lock:
+            reserved = self._reserved.get(uuid) if uuid else None
+            if reserved and reserved[0] != host:
+                # The watch changed host since
+                del self._reserved[uuid]
+                reserved = None
+
+            running = self._in_flight.get(host, 0)
+            if max_in_flight and running >= max_in_flight:
+                # Spread out, no more than max_in_flight a second come back for the host
+                retry_at = max(now, self._in_flight_retry_at.get(host, 0)) + IN_FLIGHT_RETRY_SECONDS / max_in_flight
+                self._in_flight_retry_at[host] = retry_at
+                return self._record_deferred(host, max(IN_FLIGHT_RETRY_SECONDS, retry_at - now))
+
+            if per_minute:
+                if reserved:
+                    if reserved[1] - now > 0.5:
+                        return self._record_deferred(host, reserved[1] - now)
+                    # Already taken out of the bucket
+                    del self._reserved[uuid]
+                else:
+                    # Allow a burst of as many as may run at the same time, otherwise one at a time
+                    capacity = float(max(1, max_in_flight))
+                    rate = per_minute / 60.0
+                    tokens, last = self._buckets.get(host, (capacity, now))
+                    tokens = min(capacity, tokens + (now - last) * rate)
+                    if tokens < 1 and not uuid:
+                        self._buckets[host] = (tokens, now)
+                        return self._record_deferred(host, (1 - tokens) / rate)
+
+                    # Below zero is the slots reserved by the watches waiting
+                    self._buckets[host] = (tokens - 1, now)
+                    if tokens < 1:
+                        wait = (1 - tokens) / rate
+                        self._sweep_reserved(now)
+                        self._reserved[uuid] = (host, now + wait)
+                        return self._record_deferred(host, wait)
+
+            self._in_flight[host] = running + 1
+            self.acquired += 1
+            return 0
+
+    def _sweep_reserved(self, now):
+        """Call with the lock held"""
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        for uuid, (host, ready_at) in list(self._reserved.items()):
+            if now - ready_at > RESERVATION_GRACE_SECONDS:
+                del self._reserved[uuid]
+
+    def _record_deferred(self, host, wait):
+        self.deferred_total += 1
+        self.deferred_by_host[host] = self.deferred_by_host.get(host, 0) + 1
+        return wait
+
+    def release(self, host, unused=False):
+        """
+        :param unused: Nothing was sent to the host after all (no proxy was free..), the token goes back in the bucket
+        """
+        with self._lock:
+            running = self._in_flight.get(host, 0) - 1
+            if running > 0:
+                self._in_flight[host] = running
+            else:
+                self._in_flight.pop(host, None)
+
+            if unused and host in self._buckets:
+                tokens, last = self._buckets[host]
+                self._buckets[host] = (tokens + 1, last)
+
+    def defer(self, uuid, until):
+        with self._lock:
+            self._deferred[uuid] = until
+
+    def undefer(self, uuid):
+        with self._lock:
+            self._deferred.pop(uuid, None)
+
+    def is_deferred(self, uuid):
+        with self._lock:
+            return uuid in self._deferred
+
+    def stats(self):
+        with self._lock:
+            busiest = sorted(self.deferred_by_host.items(), key=lambda i: i[1], reverse=True)[:10]
+            return {
+                'acquired': self.acquired,
+                'deferred': self.deferred_total,
+                'deferred_now': len(self._deferred),
+                'reserved': len(self._reserved),
+                'in_flight': dict(self._in_flight),
+                'most_deferred_hosts': dict(busiest),
+            }
+
+
+host_limiter = HostLimiter()
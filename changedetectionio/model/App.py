@@ -22,9 +22,16 @@ class model(dict):
                 'headers': {
                 },
                 'requests': {
+                    'adaptive_recheck': False,  # Learn the recheck time of each watch from how often it changes
+                    'adaptive_recheck_max_minutes': 10080,
+                    'adaptive_recheck_min_minutes': 5,
+                    'block_resources': 'none',  # What browser fetches don't load, see content_fetchers/resource_blocking.py
                     'extra_proxies': [], # Configurable extra proxies via the UI
                     'extra_browsers': [],  # Configurable extra proxies via the UI
+                    'host_max_in_flight': 0,  # Maximum checks at the same time to the same host, 0 is no limit
+                    'host_requests_per_minute': 0,  # Maximum checks per minute to the same host, 0 is no limit
                     'jitter_seconds': 0,
+                    'max_download_mb': int(getenv("DEFAULT_SETTINGS_REQUESTS_MAX_DOWNLOAD_MB", "0")),  # Replies bigger than this are not downloaded (plain requests), 0 is no limit (default)
                     'proxy': None, # Preferred proxy connection
                     'time_between_check': {'weeks': None, 'days': None, 'hours': 3, 'minutes': None, 'seconds': None},
                     'timeout': int(getenv("DEFAULT_SETTINGS_REQUESTS_TIMEOUT", "45")),  # Default 45 seconds
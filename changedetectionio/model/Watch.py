@@ -3,6 +3,11 @@ from blinker import signal
 from changedetectionio.strtobool import strtobool
 from changedetectionio.jinja2_custom import render as jinja_render
 from . import watch_base
+from . import line_hash_index
+from . import snapshot_delta
+from .snapshot_cache import snapshot_cache
+from . import snapshot_segments
+import bisect
 import os
 import re
 from pathlib import Path
@@ -40,6 +45,10 @@ def is_safe_url(test_url):
 class model(watch_base):
     __newest_history_key = None
     __history_n = 0
+    # Parsed history.txt, only re-read when its (path, mtime, size) changes, see history
+    __history_cache = None
+    __history_cache_stat = None
+    __history_sorted_keys = None
     jitter_seconds = 0
 
     def __init__(self, *arg, **kw):
@@ -119,6 +128,8 @@ class model(watch_base):
         for item in pathlib.Path(str(self.watch_data_dir)).rglob("*.*"):
             os.unlink(item)
 
+        snapshot_cache.invalidate_watch(self.get('uuid'))
+
         # Force the attr to recalculate
         bump = self.history
 
@@ -128,12 +139,16 @@ class model(watch_base):
             'check_count': 0,
             'fetch_time': 0.0,
             'has_ldjson_price_data': None,
+            'http_etag': None,
+            'http_last_modified': None,
+            'http_validators_revision': None,
             'last_checked': 0,
             'last_error': False,
             'last_notification_error': False,
             'last_viewed': 0,
             'previous_md5': False,
             'previous_md5_before_filters': False,
+            'processing_revision': None,
             'remote_server_reply': None,
             'track_ldjson_price_data': None
         })
@@ -185,6 +200,14 @@ class model(watch_base):
     def history_n(self):
         return self.__history_n
 
+    @staticmethod
+    def __history_file_stat(fname):
+        try:
+            stat = os.stat(fname)
+        except FileNotFoundError:
+            return None
+        return (fname, stat.st_mtime_ns, stat.st_size)
+
     @property
     def history(self):
         """History index is just a text file as a list
@@ -196,6 +219,7 @@ class model(watch_base):
 
             We read in this list as the history information
 
+            The parsed result is kept and only read again when history.txt changes on disk
         """
         tmp_history = {}
 
@@ -205,7 +229,11 @@ class model(watch_base):
 
         # Read the history file as a dict
         fname = os.path.join(self.watch_data_dir, "history.txt")
-        if os.path.isfile(fname):
+        stat = self.__history_file_stat(fname)
+        if stat is not None and self.__history_cache is not None and stat == self.__history_cache_stat:
+            return dict(self.__history_cache)
+
+        if stat is not None:
             logger.debug(f"Reading watch history index for {self.get('uuid')}")
             with open(fname, "r") as f:
                 for i in f.readlines():
@@ -232,14 +260,36 @@ class model(watch_base):
             self.__newest_history_key = None
 
         self.__history_n = len(tmp_history)
+        self.__history_cache = tmp_history if stat is not None else None
+        self.__history_cache_stat = stat
+        self.__history_sorted_keys = sorted(int(k) for k in tmp_history.keys())
 
-        return tmp_history
+        return dict(tmp_history)
+
+    @property
+    def history_keys_sorted(self):
+        """History timestamps as int, oldest first"""
+        # Loads (or refreshes) the history cache
+        self.history
+        return list(self.__history_sorted_keys or [])
+
+    def get_history_key_at_or_before(self, timestamp):
+        """The newest history timestamp (as the str key used by history) that is <= timestamp, or None"""
+        self.history
+        keys = self.__history_sorted_keys or []
+        i = bisect.bisect_right(keys, int(timestamp))
+        return str(keys[i - 1]) if i else None
 
     @property
     def has_history(self):
         fname = os.path.join(self.watch_data_dir, "history.txt")
         return os.path.isfile(fname)
 
+    @property
+    def has_xpath_data(self):
+        """Visual selector data was saved"""
+        return os.path.isfile(os.path.join(str(self.watch_data_dir), "elements.deflate"))
+
     @property
     def has_browser_steps(self):
         has_browser_steps = self.get('browser_steps') and list(filter(
@@ -280,25 +330,35 @@ class model(watch_base):
             return keys[0]
 
         last_viewed = int(self.get('last_viewed'))
-        sorted_keys = sorted(keys, key=lambda x: int(x))
-        sorted_keys.reverse()
+        sorted_keys = self.__history_sorted_keys
 
         # When the 'last viewed' timestamp is greater than or equal the newest snapshot, return second newest
-        if last_viewed >= int(sorted_keys[0]):
-            return sorted_keys[1]
-        
-        # When the 'last viewed' timestamp is between snapshots, return the older snapshot
-        for newer, older in list(zip(sorted_keys[0:], sorted_keys[1:])):
-            if last_viewed < int(newer) and last_viewed >= int(older):
-                return older
+        if last_viewed >= sorted_keys[-1]:
+            return str(sorted_keys[-2])
 
+        # When the 'last viewed' timestamp is between snapshots, return the older snapshot
         # When the 'last viewed' timestamp is less than the oldest snapshot, return oldest
-        return sorted_keys[-1]
+        return self.get_history_key_at_or_before(last_viewed) or str(sorted_keys[0])
 
     def get_history_snapshot(self, timestamp):
-        import brotli
         filepath = self.history[timestamp]
 
+        text = snapshot_cache.get(self.get('uuid'), timestamp, filepath)
+        if text is None:
+            text = self.__read_history_snapshot(filepath)
+            snapshot_cache.set(self.get('uuid'), timestamp, filepath, text)
+
+        return text
+
+    def __read_history_snapshot(self, filepath):
+        import brotli
+
+        if snapshot_segments.parse_ref(filepath):
+            return snapshot_segments.read(filepath)
+
+        if snapshot_delta.is_delta(filepath):
+            return snapshot_delta.reconstruct(filepath, self.get_history_snapshot)
+
         # See if a brotli versions exists and switch to that
         if not filepath.endswith('.br') and os.path.isfile(f"{filepath}.br"):
             filepath = f"{filepath}.br"
@@ -329,8 +389,13 @@ class model(watch_base):
         threshold = int(os.getenv('SNAPSHOT_BROTLI_COMPRESSION_THRESHOLD', 1024))
         skip_brotli = strtobool(os.getenv('DISABLE_BROTLI_TEXT_SNAPSHOT', 'False'))
 
+        # Only what changed compared to the previous snapshot, or None when it's time for a full one (keyframe)
+        delta = self.__make_history_delta(contents, snapshot_id) if snapshot_delta.use_delta() else None
+
         # Decide on snapshot filename and destination path
-        if not skip_brotli and len(contents) > threshold:
+        if delta:
+            snapshot_fname, encoded_data = delta
+        elif not skip_brotli and len(contents) > threshold:
             snapshot_fname = f"{snapshot_id}.txt.br"
             encoded_data = brotli.compress(contents.encode('utf-8'), mode=brotli.MODE_TEXT)
         else:
@@ -339,8 +404,13 @@ class model(watch_base):
 
         dest = os.path.join(self.watch_data_dir, snapshot_fname)
 
+        if snapshot_segments.use_segments():
+            # Packed into the per-watch segment file, history.txt gets the offset/length reference instead of a filename
+            snapshot_fname = snapshot_segments.append(self.watch_data_dir, encoded_data, 'br' if snapshot_fname.endswith('.br') else 'txt')
+            dest = os.path.join(self.watch_data_dir, snapshot_fname)
+
         # Write snapshot file atomically if it doesn't exist
-        if not os.path.exists(dest):
+        elif not os.path.exists(dest):
             with tempfile.NamedTemporaryFile('wb', delete=False, dir=self.watch_data_dir) as tmp:
                 tmp.write(encoded_data)
                 tmp.flush()
@@ -352,6 +422,11 @@ class model(watch_base):
         index_fname = os.path.join(self.watch_data_dir, "history.txt")
         index_line = f"{timestamp},{snapshot_fname}\n"
 
+        # Only keep the parsed history if it was current, otherwise the next read will load it again
+        history_cache_is_current = self.__history_cache is not None and self.__history_cache_stat == self.__history_file_stat(index_fname)
+
+        history_size_before = os.path.getsize(index_fname) if os.path.isfile(index_fname) else 0
+
         # Lets try force flush here since it's usually a very small file
         # If this still fails in the future then try reading all to memory first, re-writing etc
         with open(index_fname, 'a', encoding='utf-8') as f:
@@ -359,13 +434,56 @@ class model(watch_base):
             f.flush()
             os.fsync(f.fileno())
 
+        if line_hash_index.use_index():
+            try:
+                line_hash_index.LineHashIndex(self.watch_data_dir).add_snapshot(contents, history_size_before)
+            except Exception as e:
+                # Not fatal, it no longer matches history.txt and is rebuilt on the next check
+                logger.warning(f"{self.get('uuid')} - Could not update the line hash index - {str(e)}")
+
         # Update internal state
         self.__newest_history_key = timestamp
         self.__history_n += 1
 
+        if history_cache_is_current:
+            key = str(timestamp)
+            if key not in self.__history_cache:
+                bisect.insort(self.__history_sorted_keys, int(timestamp))
+            self.__history_cache[key] = dest
+            self.__history_cache_stat = self.__history_file_stat(index_fname)
+        else:
+            self.__history_cache = None
+
         # @todo bump static cache of the last timestamp so we dont need to examine the file to set a proper ''viewed'' status
         return snapshot_fname
 
+    def __make_history_delta(self, contents, snapshot_id):
+        delta_fname = f"{snapshot_id}{snapshot_delta.DELTA_SUFFIX}"
+        if os.path.exists(os.path.join(self.watch_data_dir, delta_fname)):
+            # Same content was stored before, it will be re-used
+            return delta_fname, b''
+
+        for fname in [f"{snapshot_id}.txt", f"{snapshot_id}.txt.br"]:
+            if os.path.exists(os.path.join(self.watch_data_dir, fname)):
+                return None
+
+        history = self.history
+        if not history:
+            return None
+
+        base_key = list(history.keys())[-1]
+        base_path = history[base_key]
+        try:
+            depth = snapshot_delta.read_delta(base_path)['depth'] + 1 if snapshot_delta.is_delta(base_path) else 1
+            if depth >= snapshot_delta.keyframe_interval():
+                return None
+            base_text = self.get_history_snapshot(base_key)
+        except Exception as e:
+            logger.warning(f"{self.get('uuid')} - Could not read the previous snapshot {base_path}, saving a full snapshot instead - {str(e)}")
+            return None
+
+        return delta_fname, snapshot_delta.encode(base_key, depth, base_text, contents)
+
     @property
     def has_empty_checktime(self):
         # using all() + dictionary comprehension
@@ -384,6 +502,15 @@ class model(watch_base):
     # Iterate over all history texts and see if something new exists
     # Always applying .strip() to start/end but optionally replace any other whitespace
     def lines_contain_something_unique_compared_to_history(self, lines: list, ignore_whitespace=False):
+        if line_hash_index.use_index() and self.watch_data_dir and os.path.isdir(self.watch_data_dir):
+            # Only the new lines need hashing, see line_hash_index.py
+            index = line_hash_index.LineHashIndex(self.watch_data_dir)
+            if not index.is_current():
+                history_keys = list(self.history.keys())
+                counts = index.rebuild(self.get_history_snapshot(k) for k in history_keys)
+                logger.debug(f"{self.get('uuid')} - Rebuilt line hash index from {len(history_keys)} snapshots {counts}")
+            return not index.contains_all(lines, ignore_whitespace=ignore_whitespace)
+
         local_lines = set([])
         if lines:
             if ignore_whitespace:
@@ -656,7 +783,7 @@ class model(watch_base):
 
         # self.history will be keyed with the full path
         for k, fname in self.history.items():
-            if os.path.isfile(fname):
+            if snapshot_segments.snapshot_exists(fname):
                 if True:
                     contents = self.get_history_snapshot(k)
                     res = re.findall(regex, contents, re.MULTILINE)
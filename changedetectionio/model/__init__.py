@@ -13,6 +13,7 @@ class watch_base(dict):
             # Re #110, so then if this is set to None, we know to use the default value instead
             # Requires setting to None on submit if it's the same as the default
             # Should be all None by default, so we use the system default in this case.
+            'block_resources': None,  # Resource blocking profile for browser fetches, None uses the global setting, see content_fetchers/resource_blocking.py
             'body': None,
             'browser_steps': [],
             'browser_steps_last_error_step': None,
@@ -22,6 +23,7 @@ class watch_base(dict):
             'check_unique_lines': False,  # On change-detected, compare against all history if its something new
             'consecutive_filter_failures': 0,  # Every time the CSS/xPath filter cannot be located, reset when all is fine.
             'content-type': None,
+            'conditional_hits': 0,  # Checks answered with "304 Not Modified", see conditional_requests.py
             'date_created': None,
             'extract_text': [],  # Extract text by regex after filters
             'fetch_backend': 'system',  # plaintext, playwright etc
@@ -33,6 +35,9 @@ class watch_base(dict):
             'follow_price_changes': True,
             'has_ldjson_price_data': None,
             'headers': {},  # Extra headers to send
+            'http_etag': None,  # ETag reply header of the last check, sent back as If-None-Match
+            'http_last_modified': None,  # Last-Modified reply header of the last check, sent back as If-Modified-Since
+            'http_validators_revision': None,  # Settings revision the validators were stored with
             'ignore_text': [],  # List of text to ignore when calculating the comparison checksum
             'ignore_status_codes': None,
             'in_stock_only': True,  # Only trigger change on going to instock from out-of-stock
@@ -41,6 +46,7 @@ class watch_base(dict):
             'last_error': False,
             'last_notification_error': None,
             'last_viewed': 0,  # history key value of the last viewed via the [diff] link
+            'max_download_mb': None,  # None uses the global setting
             'method': 'GET',
             'notification_alert_count': 0,
             'notification_body': None,
@@ -53,9 +59,12 @@ class watch_base(dict):
             'paused': False,
             'previous_md5': False,
             'previous_md5_before_filters': False,  # Used for skipping changedetection entirely
+            'processing_revision': None,  # Settings revision 'previous_md5_before_filters' was processed with
             'processor': 'text_json_diff',  # could be restock_diff or others from .processors
             'price_change_threshold_percent': None,
             'proxy': None,  # Preferred proxy connection
+            'recheck_adaptive_seconds': None,  # Learnt recheck time when adaptive rechecks are enabled, see adaptive_recheck.py
+            'recheck_change_ratio': None,  # Moving average of checks that found a change
             'remote_server_reply': None,  # From 'server' reply header
             'sort_text_alphabetically': False,
             'strip_ignored_lines': None,
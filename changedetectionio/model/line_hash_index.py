@@ -0,0 +1,261 @@
+"""
+Persistent index of the normalised lines of every snapshot in a watch history, used by
+Watch.lines_contain_something_unique_compared_to_history() for "Only trigger when unique lines appear"
+
+Without it every check that found a change had to decompress and split every snapshot the watch ever recorded,
+now a check only has to hash the lines of the new page.
+
+Files in the watch data directory
+
+    line-hashes.json           {"version": 1, "history_size": <how many bytes of history.txt are covered>}
+    line-hashes-strip.bin      8 byte hashes of line.strip().lower()
+    line-hashes-ws.bin         8 byte hashes of the line with all whitespace removed and lower(), "ignore whitespace"
+    line-hashes-*.bloom        Optional Bloom filter in front of the .bin file, LINE_HASH_INDEX_BLOOM=true
+
+history.txt is only ever appended to, save_history_text() appends the hashes of the new snapshot and moves
+history_size along with it. When history.txt no longer matches what the index covers (index missing or from
+before a crash, history.txt rewritten) the index is built again from the snapshots on the next check.
+
+LINE_HASH_INDEX=false goes back to comparing against every snapshot.
+"""
+
+from array import array
+from changedetectionio.strtobool import strtobool
+import hashlib
+import json
+import os
+import struct
+import sys
+import tempfile
+
+from ..html_tools import TRANSLATE_WHITESPACE_TABLE
+
+INDEX_VERSION = 1
+META_FILENAME = "line-hashes.json"
+MODES = {False: 'strip', True: 'ws'}
+
+
+def use_index():
+    return strtobool(os.getenv('LINE_HASH_INDEX', 'True'))
+
+
+def use_bloom():
+    return strtobool(os.getenv('LINE_HASH_INDEX_BLOOM', 'False'))
+
+
+def normalise(line, ignore_whitespace=False):
+    # Can be either str or bytes depending on what was on the disk
+    if isinstance(line, bytes):
+        line = line.decode('utf-8')
+    if ignore_whitespace:
+        return line.translate(TRANSLATE_WHITESPACE_TABLE).lower()
+    return line.strip().lower()
+
+
+def line_hash(line):
+    return int.from_bytes(hashlib.blake2b(line.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def hash_lines(lines, ignore_whitespace=False):
+    return {line_hash(normalise(line, ignore_whitespace)) for line in lines}
+
+
+def _write_atomic(fname, data: bytes):
+    with tempfile.NamedTemporaryFile('wb', delete=False, dir=os.path.dirname(fname)) as tmp:
+        tmp.write(data)
+        tmp.flush()
+        os.fsync(tmp.fileno())
+    os.replace(tmp.name, fname)
+
+
+def _to_bytes(hashes):
+    a = array('Q', hashes)
+    if sys.byteorder != 'little':
+        a.byteswap()
+    return a.tobytes()
+
+
+class BloomFilter:
+    """Fixed size Bloom filter over the 64bit line hashes, about 1% false positives at capacity"""
+
+    BITS_PER_ENTRY = 10
+    HASHES = 7
+    HEADER = struct.Struct('<QQI')
+
+    def __init__(self, size_bits, count=0, bits=None):
+        self.size_bits = size_bits
+        self.count = count
+        self.bits = bits if bits is not None else bytearray((size_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity):
+        return cls(size_bits=max(1024, capacity) * cls.BITS_PER_ENTRY)
+
+    @property
+    def capacity(self):
+        return self.size_bits // self.BITS_PER_ENTRY
+
+    def _positions(self, h):
+        # Double hashing, both halves of the 64bit hash
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        return ((h1 + i * h2) % self.size_bits for i in range(self.HASHES))
+
+    def add(self, h):
+        for p in self._positions(h):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def might_contain(self, h):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(h))
+
+    def to_bytes(self):
+        return self.HEADER.pack(self.size_bits, self.count, self.HASHES) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        size_bits, count, hashes = cls.HEADER.unpack_from(data)
+        bits = bytearray(data[cls.HEADER.size:])
+        if hashes != cls.HASHES or len(bits) != (size_bits + 7) // 8:
+            return None
+        return cls(size_bits=size_bits, count=count, bits=bits)
+
+
+class LineHashIndex:
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.meta_fname = os.path.join(data_dir, META_FILENAME)
+        self.history_fname = os.path.join(data_dir, "history.txt")
+
+    def _hashes_fname(self, ignore_whitespace):
+        return os.path.join(self.data_dir, f"line-hashes-{MODES[ignore_whitespace]}.bin")
+
+    def _bloom_fname(self, ignore_whitespace):
+        return os.path.join(self.data_dir, f"line-hashes-{MODES[ignore_whitespace]}.bloom")
+
+    def history_size(self):
+        try:
+            return os.path.getsize(self.history_fname)
+        except FileNotFoundError:
+            return 0
+
+    def covered_history_size(self):
+        try:
+            with open(self.meta_fname, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if meta.get('version') != INDEX_VERSION:
+            return None
+        return meta.get('history_size')
+
+    def _write_meta(self, history_size):
+        _write_atomic(self.meta_fname, json.dumps({'version': INDEX_VERSION, 'history_size': history_size}).encode('utf-8'))
+
+    def is_current(self):
+        return (self.covered_history_size() == self.history_size()
+                and all(os.path.isfile(self._hashes_fname(mode)) for mode in MODES.keys()))
+
+    def read_hashes(self, ignore_whitespace=False):
+        a = array('Q')
+        try:
+            with open(self._hashes_fname(ignore_whitespace), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return set()
+        # Cut off anything half written
+        a.frombytes(data[:len(data) - len(data) % a.itemsize])
+        if sys.byteorder != 'little':
+            a.byteswap()
+        return set(a)
+
+    def rebuild(self, snapshots):
+        """
+        :param snapshots: Iterable of the text of every snapshot in the history
+        """
+        # Measured first, anything added to history.txt while this runs is picked up by the next rebuild
+        history_size = self.history_size()
+        hashes = {mode: set() for mode in MODES.keys()}
+        for text in snapshots:
+            lines = text.splitlines()
+            for mode in MODES.keys():
+                hashes[mode].update(hash_lines(lines, mode))
+
+        for mode, mode_hashes in hashes.items():
+            _write_atomic(self._hashes_fname(mode), _to_bytes(mode_hashes))
+            if os.path.isfile(self._bloom_fname(mode)):
+                os.unlink(self._bloom_fname(mode))
+        self._write_meta(history_size)
+
+        return {MODES[mode]: len(mode_hashes) for mode, mode_hashes in hashes.items()}
+
+    def add_snapshot(self, text, history_size_before):
+        """
+        Add a snapshot that was just appended to history.txt, only when the index covered all of history.txt before it,
+        otherwise it's left to be rebuilt on the next check (also when the watch doesn't use "unique lines" at all)
+
+        :return: True when the index was updated
+        """
+        if self.covered_history_size() != history_size_before:
+            return False
+
+        lines = text.splitlines()
+        for mode in MODES.keys():
+            existing = self.read_hashes(mode)
+            new_hashes = hash_lines(lines, mode) - existing
+            if new_hashes:
+                with open(self._hashes_fname(mode), 'ab') as f:
+                    f.write(_to_bytes(new_hashes))
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._add_to_bloom(mode, existing, new_hashes)
+
+        self._write_meta(self.history_size())
+        return True
+
+    def _add_to_bloom(self, ignore_whitespace, existing, new_hashes):
+        fname = self._bloom_fname(ignore_whitespace)
+        bloom = self._read_bloom(ignore_whitespace)
+        if bloom is None:
+            return
+        if bloom.count != len(existing) or bloom.count + len(new_hashes) > bloom.capacity:
+            # Out of step or full, build a bigger one
+            bloom = BloomFilter.for_capacity((len(existing) + len(new_hashes)) * 2)
+            new_hashes = existing | new_hashes
+        for h in new_hashes:
+            bloom.add(h)
+        _write_atomic(fname, bloom.to_bytes())
+
+    def _read_bloom(self, ignore_whitespace):
+        try:
+            with open(self._bloom_fname(ignore_whitespace), 'rb') as f:
+                return BloomFilter.from_bytes(f.read())
+        except (FileNotFoundError, struct.error):
+            return None
+
+    def _bloom(self, ignore_whitespace):
+        bloom = self._read_bloom(ignore_whitespace)
+        hashes_fname = self._hashes_fname(ignore_whitespace)
+        count = os.path.getsize(hashes_fname) // 8 if os.path.isfile(hashes_fname) else 0
+        if bloom is None or bloom.count != count:
+            existing = self.read_hashes(ignore_whitespace)
+            bloom = BloomFilter.for_capacity(len(existing) * 2)
+            for h in existing:
+                bloom.add(h)
+            _write_atomic(self._bloom_fname(ignore_whitespace), bloom.to_bytes())
+        return bloom
+
+    def contains_all(self, lines, ignore_whitespace=False):
+        """True when every line (normalised) was already seen in some snapshot"""
+        wanted = hash_lines(lines, ignore_whitespace)
+        if not wanted:
+            return True
+
+        if use_bloom():
+            bloom = self._bloom(ignore_whitespace)
+            # Definitely something new, no need to read the full index
+            if not all(bloom.might_contain(h) for h in wanted):
+                return False
+
+        return wanted.issubset(self.read_hashes(ignore_whitespace))
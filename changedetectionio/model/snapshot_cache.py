@@ -0,0 +1,97 @@
+"""
+Process-wide LRU cache of decompressed snapshot text, used by Watch.get_history_snapshot()
+
+The diff page, RSS feed, notifications and conditions plugins all read the same newest snapshots again and again,
+this keeps them in memory up to SNAPSHOT_CACHE_MB (default 64, 0 disables it).
+
+Keyed by (watch uuid, timestamp), the snapshot path is stored with the text so an entry is never used for a different
+snapshot file, entries are also dropped when a watch history is cleared or the watch is deleted.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+import os
+
+
+class SnapshotCache:
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._keys_by_uuid = {}
+        self._lock = Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _size(text):
+        # Bytes not characters, non-ASCII text is 2-4 bytes a character
+        return len(text.encode('utf-8', errors='replace'))
+
+    def get(self, uuid, timestamp, path):
+        key = (uuid, str(timestamp))
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] == path:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[2]
+            self.misses += 1
+            return None
+
+    def set(self, uuid, timestamp, path, text):
+        size = self._size(text)
+        if not self.max_bytes or size > self.max_bytes:
+            return
+
+        key = (uuid, str(timestamp))
+        with self._lock:
+            self._remove(key)
+            self._items[key] = (path, size, text)
+            self._keys_by_uuid.setdefault(uuid, set()).add(key)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes and self._items:
+                oldest = next(iter(self._items))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        item = self._items.pop(key, None)
+        if item is None:
+            return
+        self.current_bytes -= item[1]
+        keys = self._keys_by_uuid.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_uuid[key[0]]
+
+    def invalidate_watch(self, uuid):
+        with self._lock:
+            for key in list(self._keys_by_uuid.get(uuid, [])):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._keys_by_uuid.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._items),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+snapshot_cache = SnapshotCache(max_bytes=int(float(os.getenv('SNAPSHOT_CACHE_MB', 64)) * 1024 * 1024))
@@ -0,0 +1,78 @@
+"""
+Delta encoded snapshot storage
+
+Most snapshots differ from the one before by a few lines, so instead of storing every snapshot in full, store only
+the lines that changed compared to the previous snapshot in `{snapshot_id}.delta.br`, with a full snapshot (keyframe,
+the normal `{snapshot_id}.txt(.br)` file) every SNAPSHOT_DELTA_KEYFRAME_INTERVAL snapshots so that rebuilding one never
+has to walk back through the whole history. Rebuilt snapshots are kept in the snapshot cache (snapshot_cache.py) like
+any other snapshot, so the base of the next one is usually already there.
+
+The delta is brotli compressed JSON
+
+    {"base": "{timestamp of the previous snapshot}", "depth": 3, "ops": [[0, 10], ["new line\n"], [11, 20]]}
+
+where [start, end] copies those lines from the base snapshot and a list of strings are new lines.
+
+Enable for new snapshots with SNAPSHOT_STORAGE_FORMAT=delta, any existing snapshots are still read as they are.
+"""
+
+import difflib
+import json
+import os
+
+DELTA_SUFFIX = ".delta.br"
+
+
+def use_delta():
+    return os.getenv('SNAPSHOT_STORAGE_FORMAT', 'files').strip().lower() == 'delta'
+
+
+def keyframe_interval():
+    return max(1, int(os.getenv('SNAPSHOT_DELTA_KEYFRAME_INTERVAL', 20)))
+
+
+def is_delta(path):
+    return path.endswith(DELTA_SUFFIX)
+
+
+def encode(base_key, depth, base_text, new_text):
+    import brotli
+
+    base_lines = base_text.splitlines(keepends=True)
+    new_lines = new_text.splitlines(keepends=True)
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, base_lines, new_lines).get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(new_lines[j1:j2])
+
+    return brotli.compress(json.dumps({'base': str(base_key), 'depth': depth, 'ops': ops}).encode('utf-8'), mode=brotli.MODE_TEXT)
+
+
+def read_delta(path):
+    import brotli
+
+    with open(path, 'rb') as f:
+        return json.loads(brotli.decompress(f.read()).decode('utf-8'))
+
+
+def apply(base_text, ops):
+    base_lines = base_text.splitlines(keepends=True)
+    output = []
+    for op in ops:
+        if op and isinstance(op[0], int):
+            output.extend(base_lines[op[0]:op[1]])
+        else:
+            output.extend(op)
+
+    return ''.join(output)
+
+
+def reconstruct(path, get_snapshot):
+    """
+    :param path: Full path of the delta file
+    :param get_snapshot: Callable returning the text for a history timestamp, Watch.get_history_snapshot
+    """
+    delta = read_delta(path)
+    return apply(get_snapshot(delta['base']), delta['ops'])
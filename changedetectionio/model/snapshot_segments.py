@@ -0,0 +1,126 @@
+"""
+Packed snapshot storage
+
+Instead of one `{snapshot_id}.txt(.br)` file per snapshot, snapshots are appended to a single `snapshots.seg` file in
+the watch data directory. history.txt stays the index, the entry just points into the segment instead of to a file
+
+    {epoch-time},snapshots.seg:{offset}:{length}:{br|txt}
+
+so reading a snapshot is one seek() and one read(), and both layouts can be mixed in the same history.txt
+
+Enable for new snapshots with SNAPSHOT_STORAGE_FORMAT=segment, existing snapshots can be packed with the `-P` option.
+"""
+
+from loguru import logger
+import os
+import re
+
+SEGMENT_FILENAME = "snapshots.seg"
+SEGMENT_REF_REGEX = re.compile(r'^(?P<path>.*\.seg):(?P<offset>\d+):(?P<length>\d+):(?P<codec>br|txt)$')
+
+
+def use_segments():
+    return os.getenv('SNAPSHOT_STORAGE_FORMAT', 'files').strip().lower() == 'segment'
+
+
+def parse_ref(value):
+    """Returns (segment path, offset, length, codec) or None when it's a plain snapshot filename"""
+    m = SEGMENT_REF_REGEX.match(value)
+    if not m:
+        return None
+    return m.group('path'), int(m.group('offset')), int(m.group('length')), m.group('codec')
+
+
+def snapshot_exists(value):
+    ref = parse_ref(value)
+    return os.path.isfile(ref[0] if ref else value)
+
+
+def append(data_dir, encoded_data: bytes, codec):
+    """Append to the segment and return the reference for history.txt (relative to the watch data dir)"""
+    with open(os.path.join(data_dir, SEGMENT_FILENAME), 'ab') as f:
+        offset = f.seek(0, os.SEEK_END)
+        f.write(encoded_data)
+        f.flush()
+        os.fsync(f.fileno())
+
+    return f"{SEGMENT_FILENAME}:{offset}:{len(encoded_data)}:{codec}"
+
+
+def read(value):
+    import brotli
+
+    path, offset, length, codec = parse_ref(value)
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(length)
+
+    if codec == 'br':
+        data = brotli.decompress(data)
+
+    return data.decode('utf-8', errors='ignore')
+
+
+def pack_watch_history(data_dir):
+    """
+    Move every snapshot file listed in history.txt into the segment, rewrite history.txt and then remove the files.
+    Should only be used when nothing else is writing to this watch (at startup).
+
+    :return: Number of snapshots that were packed
+    """
+    import tempfile
+
+    index_fname = os.path.join(data_dir, "history.txt")
+    if not os.path.isfile(index_fname):
+        return 0
+
+    with open(index_fname, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+
+    packed = 0
+    new_lines = []
+    # The same snapshot file can be listed more than once
+    refs_by_file = {}
+    for line in lines:
+        if ',' not in line:
+            continue
+        timestamp, value = line.strip().split(',', 1)
+        # Already packed, or a delta (see snapshot_delta.py) which only makes sense as its own file
+        if parse_ref(value) or value.endswith('.delta.br'):
+            new_lines.append(f"{timestamp},{value}\n")
+            continue
+
+        # Like Watch.history, could be an old absolute path from before the datadir was moved
+        filepath = value if '/' in value and os.path.isfile(value) else os.path.join(data_dir, os.path.basename(value))
+        # Same as Watch.get_history_snapshot(), prefer the brotli one
+        if not filepath.endswith('.br') and os.path.isfile(f"{filepath}.br"):
+            filepath = f"{filepath}.br"
+        elif filepath.endswith('.br') and not os.path.isfile(filepath) and os.path.isfile(filepath[:-3]):
+            filepath = filepath[:-3]
+
+        if not os.path.isfile(filepath):
+            logger.warning(f"Snapshot {filepath} listed in {index_fname} is missing, leaving the entry as it is")
+            new_lines.append(f"{timestamp},{value}\n")
+            continue
+
+        if filepath not in refs_by_file:
+            with open(filepath, 'rb') as f:
+                refs_by_file[filepath] = append(data_dir, f.read(), 'br' if filepath.endswith('.br') else 'txt')
+
+        new_lines.append(f"{timestamp},{refs_by_file[filepath]}\n")
+        packed += 1
+
+    if not packed:
+        return 0
+
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', delete=False, dir=data_dir) as tmp:
+        tmp.writelines(new_lines)
+        tmp.flush()
+        os.fsync(tmp.fileno())
+    os.replace(tmp.name, index_fname)
+
+    # Only now that the index points into the segment
+    for filepath in refs_by_file.keys():
+        os.unlink(filepath)
+
+    return packed
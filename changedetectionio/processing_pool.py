@@ -0,0 +1,221 @@
+"""
+Runs the change detection stage of a check (run_changedetection(), filters, HTML to text, diffing) in a pool of
+processes instead of on the async workers' event loop, so one big page doesn't hold up every other fetch and more than
+one CPU core gets used.
+
+Enabled with PROCESSING_POOL_WORKERS=<number of processes> (default 0, run it in the worker as before). The process
+gets the fetched content and a copy of the watch, its tags and the settings (not the whole datastore), it returns the
+same (changed_detected, update_obj, contents) as run_changedetection() or raises the same exception. Each process is
+replaced after PROCESSING_POOL_MAX_TASKS (default 100) checks (on Python 3.10 the whole pool is replaced after that many),
+which also gets rid of the small libxml leaks (see html_tools.py).
+
+Only for processors that set process_pool_safe, the screenshot and xpath data stay in the worker and are put back on
+the update handler (and any exception that carries them) afterwards.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from loguru import logger
+import asyncio
+import importlib
+import multiprocessing
+import os
+import pickle
+import sys
+import threading
+import time
+
+# What the processors use from the fetcher, the rest is about talking to the browser
+FETCHER_ATTRIBUTES = ['content', 'raw_content', 'headers', 'status_code', 'instock_data', 'error']
+
+# ProcessPoolExecutor(max_tasks_per_child=) is 3.11+, before that the whole pool is replaced by hand
+NATIVE_MAX_TASKS_PER_CHILD = sys.version_info >= (3, 11)
+
+
+class DatastoreSnapshot:
+    """The parts of the datastore the processors use, for one watch, small enough to send to another process"""
+
+    def __init__(self, datastore, uuid):
+        self.datastore_path = datastore.datastore_path
+        self.data = {'settings': datastore.data['settings'],
+                     'watching': {uuid: datastore.data['watching'].get(uuid)}}
+
+    def get_all_tags_for_watch(self, uuid):
+        watch = self.data['watching'].get(uuid)
+        if not watch:
+            return {}
+        tags = self.data['settings']['application']['tags']
+        return {tag_uuid: tags[tag_uuid] for tag_uuid in watch.get('tags', []) if tag_uuid in tags}
+
+    def get_tag_overrides_for_watch(self, uuid, attr):
+        ret = []
+        for tag_uuid, tag in self.get_all_tags_for_watch(uuid=uuid).items():
+            if attr in tag and tag[attr]:
+                ret = [*ret, *tag[attr]]
+        return ret
+
+
+def pack_exception(e):
+    state = {k: v for k, v in e.__dict__.items() if k not in ('screenshot', 'xpath_data')}
+    packed = {'module': type(e).__module__, 'name': type(e).__qualname__, 'args': e.args, 'state': state,
+              'has': [k for k in ('screenshot', 'xpath_data') if hasattr(e, k)]}
+    try:
+        pickle.dumps(packed)
+    except Exception:
+        packed = {'module': 'builtins', 'name': 'Exception', 'args': (f"{type(e).__name__}: {str(e)}",), 'state': {}, 'has': []}
+    return packed
+
+
+def unpack_exception(packed, fetcher):
+    """The exception from pack_exception(), only our own exception classes are made again, anything else is an Exception"""
+    try:
+        if packed['module'] != 'builtins' and not packed['module'].startswith('changedetectionio.'):
+            raise ValueError(f"Not making {packed['module']}.{packed['name']}")
+        cls = getattr(importlib.import_module(packed['module']), packed['name'])
+        if not isinstance(cls, type) or not issubclass(cls, Exception):
+            raise ValueError(f"{packed['name']} is not an exception")
+        e = cls.__new__(cls)
+        e.args = packed['args']
+        e.__dict__.update(packed['state'])
+    except Exception:
+        return Exception(*packed.get('args', ()))
+
+    # Same as the processors do, from the fetcher that stayed here
+    if 'screenshot' in packed['has']:
+        e.screenshot = getattr(fetcher, 'screenshot', None)
+    if 'xpath_data' in packed['has']:
+        e.xpath_data = getattr(fetcher, 'xpath_data', None)
+    return e
+
+
+def _run_changedetection(payload):
+    """Runs in the pool process"""
+    processor_module_name, datastore, uuid, fetcher_state = pickle.loads(payload)
+    processor_module = importlib.import_module(processor_module_name)
+    update_handler = processor_module.perform_site_check(datastore=datastore, watch_uuid=uuid)
+    for k, v in fetcher_state.items():
+        setattr(update_handler.fetcher, k, v)
+    update_handler.fetcher.screenshot = None
+    update_handler.fetcher.xpath_data = None
+
+    try:
+        return 'ok', update_handler.run_changedetection(watch=datastore.data['watching'].get(uuid))
+    except Exception as e:
+        return 'exception', pack_exception(e)
+
+
+class ProcessingPool:
+
+    def __init__(self):
+        self.workers = int(os.getenv('PROCESSING_POOL_WORKERS', 0))
+        self.max_tasks = int(os.getenv('PROCESSING_POOL_MAX_TASKS', 100))
+        self._executor = None
+        self._executor_tasks = 0
+        self._lock = threading.Lock()
+
+        self.submitted = 0
+        self.completed = 0
+        self.exceptions = 0
+        self.fallbacks = 0
+        self.busy = 0
+        self.seconds_total = 0.0
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def _get_executor(self):
+        retired = None
+        with self._lock:
+            if (self._executor is not None and not NATIVE_MAX_TASKS_PER_CHILD
+                    and self.max_tasks and self._executor_tasks >= self.max_tasks):
+                logger.debug(f"Processing pool did {self._executor_tasks} checks, replacing it")
+                retired, self._executor = self._executor, None
+
+            if self._executor is None:
+                logger.info(f"Starting processing pool with {self.workers} processes, replaced after {self.max_tasks} checks")
+                # 'spawn', forking a process full of threads isn't safe, and needed for max_tasks_per_child anyway
+                kwargs = {'max_tasks_per_child': self.max_tasks or None} if NATIVE_MAX_TASKS_PER_CHILD else {}
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'),
+                                                     **kwargs)
+                self._executor_tasks = 0
+            self._executor_tasks += 1
+            executor = self._executor
+
+        if retired:
+            # Checks already running in it still finish
+            self._reset(retired, cancel_futures=False)
+        return executor
+
+    def _reset(self, executor, cancel_futures=True):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=cancel_futures)
+
+    async def run_changedetection(self, update_handler, watch, datastore):
+        """Same as update_handler.run_changedetection(watch=watch), in the pool when it's enabled and the processor can"""
+        if not self.enabled or not getattr(update_handler, 'process_pool_safe', False):
+            return update_handler.run_changedetection(watch=watch)
+
+        uuid = watch.get('uuid')
+        fetcher = update_handler.fetcher
+        try:
+            payload = pickle.dumps((type(update_handler).__module__,
+                                    DatastoreSnapshot(datastore, uuid),
+                                    uuid,
+                                    {k: getattr(fetcher, k) for k in FETCHER_ATTRIBUTES if hasattr(fetcher, k)}))
+        except Exception as e:
+            logger.warning(f"{uuid} - Could not send the check to the processing pool, running it here - {str(e)}")
+            self.fallbacks += 1
+            return update_handler.run_changedetection(watch=watch)
+
+        executor = self._get_executor()
+        start = time.time()
+        self.submitted += 1
+        self.busy += 1
+        try:
+            status, result = await asyncio.get_running_loop().run_in_executor(executor, _run_changedetection, payload)
+        except BrokenProcessPool as e:
+            logger.error(f"{uuid} - Processing pool process died, starting a new pool and running the check here - {str(e)}")
+            self._reset(executor)
+            self.fallbacks += 1
+            return update_handler.run_changedetection(watch=watch)
+        finally:
+            self.busy -= 1
+            self.seconds_total += time.time() - start
+
+        self.completed += 1
+
+        # Same as the processors do, these stayed here
+        update_handler.screenshot = fetcher.screenshot
+        update_handler.xpath_data = fetcher.xpath_data
+
+        if status == 'exception':
+            self.exceptions += 1
+            raise unpack_exception(result, fetcher)
+
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'processes': self.workers,
+            'max_tasks_per_process': self.max_tasks,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'exceptions': self.exceptions,
+            'fallbacks': self.fallbacks,
+            'busy': self.busy,
+            'seconds_avg': round(self.seconds_total / self.completed, 4) if self.completed else 0.0,
+        }
+
+
+processing_pool = ProcessingPool()
@@ -7,9 +7,78 @@ import hashlib
 import importlib
 import inspect
 import os
+import json
 import pkgutil
 import re
 
+# Watch and tag keys that are results of checks or only about notifications/the UI, changing them doesn't change
+# what the processed content would be
+STATE_KEYS = {
+    'browser_steps_last_error_step',
+    'check_count',
+    'conditional_hits',
+    'consecutive_filter_failures',
+    'content-type',
+    'content_type',
+    'date_created',
+    'fetch_time',
+    'has_ldjson_price_data',
+    'last_changed',
+    'last_check_status',
+    'last_checked',
+    'last_error',
+    'last_viewed',
+    'page_title',
+    'paused',
+    'previous_md5',
+    'previous_md5_before_filters',
+    'processing_revision',
+    'recheck_adaptive_seconds',
+    'recheck_change_ratio',
+    'remote_server_reply',
+    'restock',
+    'time_between_check',
+    'time_between_check_use_default',
+    'time_schedule_limit',
+    'title',
+    'use_page_title_in_list',
+}
+STATE_KEY_PREFIXES = ('http_', 'notification_', 'last_notification')
+
+# Not used for processing, and never sent to remote runners
+SECRET_APPLICATION_SETTINGS = ['password', 'api_access_token', 'rss_access_token']
+
+# Since startup, see difference_detection_processor.content_is_unchanged()
+unchanged_content_counters = {'compared': 0, 'skipped': 0}
+
+
+def _processing_config(d):
+    return {k: v for k, v in d.items() if k not in STATE_KEYS and not k.startswith(STATE_KEY_PREFIXES)}
+
+
+def processing_config_revision(watch, datastore):
+    """Checksum of everything that decides how the fetched content of this watch is processed"""
+    application = {k: v for k, v in datastore.data['settings']['application'].items()
+                   if k != 'tags' and k not in SECRET_APPLICATION_SETTINGS and not k.startswith('notification_')}
+    tags = datastore.get_all_tags_for_watch(uuid=watch.get('uuid')) or {}
+    revision = {
+        'watch': _processing_config(watch),
+        'tags': {tag_uuid: _processing_config(tag) for tag_uuid, tag in tags.items()},
+        'application': application,
+    }
+    return hashlib.md5(json.dumps(revision, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def unchanged_content_stats():
+    compared, skipped = unchanged_content_counters['compared'], unchanged_content_counters['skipped']
+    return {
+        'enabled': strtobool(os.getenv('SKIP_UNCHANGED_CONTENT', 'True')),
+        'compared': compared,
+        'skipped': skipped,
+        'skip_ratio': round(skipped / compared, 3) if compared else 0.0,
+    }
+
+
 class difference_detection_processor():
 
     browser_steps = None
@@ -19,6 +88,11 @@ class difference_detection_processor():
     watch = None
     xpath_data = None
     preferred_proxy = None
+    # run_changedetection() only needs the fetched content, the watch and the settings, so it can run in another process (see processing_pool.py)
+    process_pool_safe = False
+    # run_changedetection() is skipped when the fetched content and the settings are the same as last time, the
+    # processor has to save 'previous_md5_before_filters' and 'processing_revision' for it (see content_is_unchanged())
+    skip_unchanged_content = False
 
     def __init__(self, *args, datastore, watch_uuid, **kwargs):
         super().__init__(*args, **kwargs)
@@ -124,11 +198,25 @@ class difference_detection_processor():
 
         timeout = self.datastore.data['settings']['requests'].get('timeout')
 
+        # Stop downloading replies that are bigger than this, empty per watch is the global setting, 0 is no limit
+        max_download_mb = self.watch.get('max_download_mb') or self.datastore.data['settings']['requests'].get('max_download_mb') or 0
+        self.fetcher.max_download_bytes = int(max_download_mb) * 1024 * 1024
+
         request_body = self.watch.get('body')
         if request_body:
             request_body = jinja_render(template_str=self.watch.get('body'))
         
         request_method = self.watch.get('method')
+
+        # ETag / Last-Modified from the last check, a "304 Not Modified" reply skips the processing
+        from changedetectionio import conditional_requests
+        request_headers.update(conditional_requests.request_headers(watch=self.watch,
+                                                                    datastore=self.datastore,
+                                                                    fetch_backend=prefer_fetch_backend,
+                                                                    headers=request_headers,
+                                                                    request_method=request_method,
+                                                                    request_body=request_body))
+
         ignore_status_codes = self.watch.get('ignore_status_codes', False)
 
         # Configurable per-watch or global extra delay before extracting text (for webDriver types)
@@ -141,6 +229,10 @@ class difference_detection_processor():
         if self.watch.get('webdriver_js_execute_code') is not None and self.watch.get('webdriver_js_execute_code').strip():
             self.fetcher.webdriver_js_execute_code = self.watch.get('webdriver_js_execute_code')
 
+        # Don't load images, trackers etc when they're not needed for the screenshot, see content_fetchers/resource_blocking.py
+        from changedetectionio.content_fetchers.resource_blocking import profile_for_check
+        self.fetcher.block_resources = profile_for_check(watch=self.watch, datastore=self.datastore)
+
         # Requests for PDF's, images etc should be passwd the is_binary flag
         is_binary = self.watch.is_pdf
 
@@ -165,6 +257,25 @@ class difference_detection_processor():
 
         # After init, call run_changedetection() which will do the actual change-detection
 
+    def content_is_unchanged(self, watch):
+        """True when the fetched content is byte for byte what the last check processed, with the same settings, so
+        run_changedetection() would only find no change again"""
+        if not self.skip_unchanged_content or not strtobool(os.getenv('SKIP_UNCHANGED_CONTENT', 'True')):
+            return False
+        if not watch.get('previous_md5_before_filters') or not watch.get('processing_revision') or not isinstance(self.fetcher.content, str):
+            return False
+        # Nothing saved yet, the first check always has to be processed
+        if not watch.history_n:
+            return False
+
+        unchanged_content_counters['compared'] += 1
+        if hashlib.md5(self.fetcher.content.encode('utf-8')).hexdigest() != watch.get('previous_md5_before_filters'):
+            return False
+        if watch.get('processing_revision') != processing_config_revision(watch, self.datastore):
+            return False
+        unchanged_content_counters['skipped'] += 1
+        return True
+
     @abstractmethod
     def run_changedetection(self, watch):
         update_obj = {'last_notification_error': False, 'last_error': False}
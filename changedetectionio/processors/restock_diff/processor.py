@@ -143,6 +143,7 @@ def is_between(number, lower=None, upper=None):
 class perform_site_check(difference_detection_processor):
     screenshot = None
     xpath_data = None
+    process_pool_safe = True
 
     def run_changedetection(self, watch):
         import hashlib
@@ -7,7 +7,7 @@ import re
 import urllib3
 
 from changedetectionio.conditions import execute_ruleset_against_all_plugins
-from changedetectionio.processors import difference_detection_processor
+from changedetectionio.processors import difference_detection_processor, processing_config_revision
 from changedetectionio.html_tools import PERL_STYLE_REGEX, cdata_in_document_to_text, TRANSLATE_WHITESPACE_TABLE
 from changedetectionio import html_tools, content_fetchers
 from changedetectionio.blueprint.price_data_follower import PRICE_DATA_TRACK_ACCEPT, PRICE_DATA_TRACK_REJECT
@@ -362,6 +362,8 @@ class ChecksumCalculator:
 # Some common stuff here that can be moved to a base class
 # (set_proxy_from_list)
 class perform_site_check(difference_detection_processor):
+    process_pool_safe = True
+    skip_unchanged_content = True
 
     def run_changedetection(self, watch):
         changed_detected = False
@@ -389,6 +391,8 @@ class perform_site_check(difference_detection_processor):
         # Track the content type and checksum before filters
         update_obj['content_type'] = ctype_header
         update_obj['previous_md5_before_filters'] = hashlib.md5(self.fetcher.content.encode('utf-8')).hexdigest()
+        # With the settings it was processed with, see content_is_unchanged()
+        update_obj['processing_revision'] = processing_config_revision(watch, self.datastore)
 
         # === CONTENT PREPROCESSING ===
         # Avoid creating unnecessary intermediate string copies by reassigning only when needed
@@ -465,7 +469,9 @@ class perform_site_check(difference_detection_processor):
             if stripped_text is None:
                 # No differences found, but content exists
                 c = ChecksumCalculator.calculate(text_content_before_ignored_filter, ignore_whitespace=True)
-                return False, {'previous_md5': c}, text_content_before_ignored_filter.encode('utf-8')
+                return False, {'previous_md5': c,
+                               'previous_md5_before_filters': update_obj['previous_md5_before_filters'],
+                               'processing_revision': update_obj['processing_revision']}, text_content_before_ignored_filter.encode('utf-8')
 
         # === EMPTY PAGE CHECK ===
         empty_pages_are_a_change = self.datastore.data['settings']['application'].get('empty_pages_are_a_change', False)
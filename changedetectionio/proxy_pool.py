@@ -0,0 +1,205 @@
+"""
+Proxy pools, spreading the checks over a group of proxies from proxies.json
+
+Proxies in proxies.json with the same "pool" name are grouped together, each pool shows up in the proxy choices as
+"Pool: <name>" next to the single proxies. A watch (or the system default) using a pool gets whichever member is the
+best choice when the check starts.
+
+    {
+      "res-1": {"label": "Residential 1", "url": "http://...", "pool": "residential", "max_concurrent": 2, "weight": 2},
+      "res-2": {"label": "Residential 2", "url": "http://...", "pool": "residential", "reuse_time_minimum": 10}
+    }
+
+- "max_concurrent" how many checks can go through the proxy at the same time (default PROXY_MAX_CONCURRENT, 0 is no limit)
+- "reuse_time_minimum" seconds to wait between requests through the proxy
+- "weight" how much traffic it should get compared to the other members (default 1)
+
+The members with a free slot are picked from, the least loaded one (default) or at random by weight and health score
+when PROXY_POOL_STRATEGY=weighted. The health score is a moving average of fetches through the proxy that worked
+(connection errors, timeouts and 407s count against it) over its moving average latency. After PROXY_EJECT_FAILURES
+(default 3) failures in a row a member is ejected for PROXY_EJECT_SECONDS (default 300), doubled every time it fails
+again straight after coming back, the others carry on without it. When every member is ejected they are used anyway.
+
+Single proxies get the same concurrency limit, reuse time and health score, they're just the only choice. When nothing is
+free the worker puts the watch back in the queue for when something is, the ticker uses wait_time() to not queue it
+before then.
+"""
+
+from loguru import logger
+import os
+import random
+import threading
+import time
+
+# How much the latest fetch counts in the moving averages
+SCORE_WEIGHT = 0.2
+# Longest a member stays ejected
+MAX_EJECT_SECONDS = 3600
+# When every member is busy with too many at once, look again after this many seconds
+BUSY_RETRY_SECONDS = 1.0
+
+
+def pools_from_proxy_list(proxy_list):
+    """{pool name: [proxy id, ...]} from the "pool" setting of the proxies"""
+    pools = {}
+    for proxy_id, proxy in proxy_list.items():
+        if proxy.get('pool') and proxy.get('url'):
+            pools.setdefault(str(proxy['pool']), []).append(proxy_id)
+    return pools
+
+
+def candidates_for_proxy(proxy_list, proxy_id):
+    """The proxy ids that can be used for the chosen proxy id, all the members for a pool"""
+    if not proxy_list or not proxy_id or proxy_id not in proxy_list:
+        return []
+    return list(proxy_list[proxy_id].get('members') or [proxy_id])
+
+
+def is_proxy_failure(e):
+    """True when the fetch failed in a way that's probably the fault of the proxy, not the web site"""
+    from changedetectionio.content_fetchers import exceptions
+
+    if isinstance(e, exceptions.Non200ErrorCodeReceived):
+        # Proxy authentication required
+        return e.status_code == 407
+    if isinstance(e, (exceptions.BrowserFetchTimedOut, exceptions.PageUnloadable)):
+        return True
+    # Anything else from the fetchers means something came back from the site (or the browser had a problem)
+    if type(e).__module__.startswith('changedetectionio.'):
+        return False
+    # Connection refused, proxy errors, timeouts etc
+    return True
+
+
+class ProxyPool:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # proxy id -> state dict, see _state()
+        self._proxies = {}
+        self.strategy = os.getenv('PROXY_POOL_STRATEGY', 'least_loaded').strip().lower()
+        self.default_max_concurrent = int(os.getenv('PROXY_MAX_CONCURRENT', 0))
+        self.eject_failures = int(os.getenv('PROXY_EJECT_FAILURES', 3))
+        self.eject_seconds = int(os.getenv('PROXY_EJECT_SECONDS', 300))
+
+    def _state(self, proxy_id):
+        state = self._proxies.get(proxy_id)
+        if state is None:
+            state = self._proxies[proxy_id] = {
+                'in_flight': 0,
+                'last_used': 0,
+                'success_avg': 1.0,
+                'latency_avg': None,
+                'consecutive_failures': 0,
+                'ejected_until': 0,
+                'eject_seconds': 0,
+                'ejections': 0,
+                'requests': 0,
+                'failures': 0,
+            }
+        return state
+
+    @staticmethod
+    def _score(state):
+        # Successes per second of latency, a proxy that works and is quick scores best
+        return state['success_avg'] / max(state['latency_avg'] or 1.0, 0.1)
+
+    def _wait_for(self, proxy, state, now):
+        """Seconds until the proxy can take another check, 0 when it can now"""
+        max_concurrent = int(proxy.get('max_concurrent') or self.default_max_concurrent or 0)
+        if max_concurrent and state['in_flight'] >= max_concurrent:
+            return BUSY_RETRY_SECONDS
+
+        reuse_time_minimum = int(proxy.get('reuse_time_minimum') or 0)
+        if reuse_time_minimum and state['last_used'] and now - state['last_used'] < reuse_time_minimum:
+            return state['last_used'] + reuse_time_minimum - now
+
+        return 0
+
+    def _pick(self, proxy_list, candidates, now):
+        """(proxy id, 0) for the best candidate that is free, otherwise (None, seconds until one might be)"""
+        candidates = [c for c in candidates if c in proxy_list]
+        if not candidates:
+            return None, 0
+
+        healthy = [c for c in candidates if self._state(c)['ejected_until'] <= now]
+        waits = {c: self._wait_for(proxy_list[c], self._state(c), now) for c in (healthy or candidates)}
+        free = [c for c, wait in waits.items() if not wait]
+        if not free:
+            return None, min(waits.values())
+
+        if self.strategy == 'weighted' and len(free) > 1:
+            weights = [float(proxy_list[c].get('weight') or 1) * self._score(self._state(c)) for c in free]
+            if sum(weights) > 0:
+                return random.choices(free, weights=weights)[0], 0
+
+        def load(c):
+            state = self._state(c)
+            return state['in_flight'] / float(proxy_list[c].get('weight') or 1), -self._score(state), state['last_used']
+
+        return min(free, key=load), 0
+
+    def wait_time(self, proxy_list, candidates, now=None):
+        """Seconds until one of the candidates can be used, 0 when one can be now"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._pick(proxy_list, candidates, now)[1]
+
+    def acquire(self, proxy_list, candidates, now=None):
+        """
+        :return: (proxy id, 0) to use for the check, call release() when it's done, or (None, seconds) when none are free
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            proxy_id, wait = self._pick(proxy_list, candidates, now)
+            if proxy_id:
+                state = self._state(proxy_id)
+                state['in_flight'] += 1
+                state['last_used'] = now
+                state['requests'] += 1
+            return proxy_id, wait
+
+    def release(self, proxy_id, ok=None, latency=None, now=None):
+        """
+        :param ok: True/False how the fetch went, None when it didn't get that far
+        :param latency: Seconds the fetch took
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            state = self._state(proxy_id)
+            state['in_flight'] = max(0, state['in_flight'] - 1)
+            if ok is None:
+                return
+
+            state['success_avg'] = state['success_avg'] * (1 - SCORE_WEIGHT) + (SCORE_WEIGHT if ok else 0.0)
+            if ok and latency is not None:
+                state['latency_avg'] = latency if state['latency_avg'] is None else state['latency_avg'] * (1 - SCORE_WEIGHT) + latency * SCORE_WEIGHT
+
+            if ok:
+                state['consecutive_failures'] = 0
+                state['eject_seconds'] = 0
+                return
+
+            state['failures'] += 1
+            state['consecutive_failures'] += 1
+            if self.eject_failures and state['consecutive_failures'] >= self.eject_failures and state['ejected_until'] <= now:
+                state['eject_seconds'] = min(MAX_EJECT_SECONDS, max(self.eject_seconds, state['eject_seconds'] * 2))
+                state['ejected_until'] = now + state['eject_seconds']
+                state['ejections'] += 1
+                logger.warning(f"Proxy '{proxy_id}' failed {state['consecutive_failures']} times in a row, not using it for {state['eject_seconds']}s")
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            return {proxy_id: {
+                'in_flight': state['in_flight'],
+                'requests': state['requests'],
+                'failures': state['failures'],
+                'success_avg': round(state['success_avg'], 3),
+                'latency_avg': round(state['latency_avg'], 3) if state['latency_avg'] is not None else None,
+                'ejected_for_seconds': round(max(0.0, state['ejected_until'] - now), 1),
+                'ejections': state['ejections'],
+            } for proxy_id, state in self._proxies.items()}
+
+
+proxy_pool = ProxyPool()
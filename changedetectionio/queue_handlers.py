@@ -1,9 +1,11 @@
 from blinker import signal
 from loguru import logger
 from typing import Dict, List, Any, Optional
+import bisect
 import heapq
 import queue
 import threading
+import time
 
 try:
     import janus
@@ -11,6 +13,109 @@ except ImportError:
     logger.critical(f"CRITICAL: janus library is required. Install with: pip install janus")
     raise
 
+# Below this it's someone waiting on it (manual and API rechecks, remote runner results), not the scheduler's epoch
+# time, these are served first whatever class they are in
+URGENT_PRIORITY = 10
+
+
+def watch_classifier(datastore, by='tag'):
+    """
+    For RecheckPriorityQueue.set_classifier(), by 'tag' a watch goes in the class of its tag with the biggest
+    queue weight (set on the tag edit page, untagged watches are 'default'), by 'processor' in its processor's class
+    """
+    def classify(item):
+        watch = datastore.data['watching'].get(item.item.get('uuid'))
+        if not watch:
+            return 'default', 1
+        if by == 'processor':
+            return watch.get('processor') or 'text_json_diff', 1
+
+        best = ('default', 1)
+        tags = datastore.data['settings']['application']['tags']
+        for tag_uuid in watch.get('tags', []):
+            tag = tags.get(tag_uuid)
+            if tag is None:
+                continue
+            weight = int(tag.get('queue_weight') or 1)
+            if best[0] == 'default' or weight > best[1]:
+                best = (tag_uuid, weight)
+        return best
+
+    return classify
+
+
+class _PriorityRanks:
+    """
+    Live item counts by priority, with a Fenwick tree over the sorted priorities so "how many items are before this
+    priority" is O(log n) however many seconds the queued (epoch time) priorities span.
+
+    Priorities stay in the tree after their last item left, so new ones (almost always a later epoch second) are
+    appended in O(log n), only a new priority before the last one rebuilds it. It's compacted to the live ones when
+    the dead ones outnumber them.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self._keys = []
+        self._index = {}
+        self._tree = [0]
+
+    def add(self, priority, n):
+        i = self._index.get(priority)
+        if i is None:
+            if self._keys and priority < self._keys[-1]:
+                bisect.insort(self._keys, priority)
+                self._rebuild(self._keys)
+            else:
+                self._append(priority)
+            i = self._index[priority]
+
+        while i < len(self._tree):
+            self._tree[i] += n
+            i += i & -i
+
+        count = self.counts.get(priority, 0) + n
+        if count > 0:
+            self.counts[priority] = count
+        else:
+            self.counts.pop(priority, None)
+            if len(self._keys) > 2 * len(self.counts) + 1024:
+                self._rebuild(sorted(self.counts))
+
+    def before(self, priority) -> int:
+        """Live items with a better (lower) priority"""
+        return self._prefix(bisect.bisect_left(self._keys, priority))
+
+    def first(self):
+        return next((p for p in self._keys if p in self.counts), None)
+
+    def last(self):
+        return next((p for p in reversed(self._keys) if p in self.counts), None)
+
+    def _prefix(self, i) -> int:
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _append(self, priority):
+        self._keys.append(priority)
+        i = len(self._keys)
+        self._index[priority] = i
+        # The new node covers (i - lowbit(i), i], nothing is counted for the new priority itself yet
+        self._tree.append(self._prefix(i - 1) - self._prefix(i - (i & -i)))
+
+    def _rebuild(self, keys):
+        self._keys = list(keys)
+        self._index = {p: i for i, p in enumerate(self._keys, start=1)}
+        self._tree = [0] * (len(self._keys) + 1)
+        for i, p in enumerate(self._keys, start=1):
+            self._tree[i] += self.counts.get(p, 0)
+            parent = i + (i & -i)
+            if parent < len(self._tree):
+                self._tree[parent] += self._tree[i]
+
 
 class RecheckPriorityQueue:
     """
@@ -34,6 +139,16 @@ class RecheckPriorityQueue:
     - Pure janus for sync/async bridge
     - Thread-safe priority ordering  
     - Bulletproof error handling with critical logging
+
+    Each watch UUID is only queued once, queueing it again with a better (lower) priority moves it up instead.
+    Items are tracked by UUID so contains() and the position lookups don't have to scan the whole queue, replaced
+    heap entries are left in place and skipped when they come up (there is exactly one janus notification per live item).
+
+    With a classifier set (see set_classifier()) items are also split into classes (a tag, a processor..) each with
+    its own priority order and a weight, and get() serves the classes by start-time fair queueing, a class with weight 3
+    gets three times the turns of a class with weight 1 while both have something waiting. So a huge import into one tag
+    doesn't hold up the other tags for an hour. The positions and listings are still in plain priority order.
+    Urgent items (priority below URGENT_PRIORITY) always go first, they don't wait for their class' turn.
     """
     
     def __init__(self, maxsize: int = 0):
@@ -46,6 +161,20 @@ class RecheckPriorityQueue:
             # Priority storage - thread-safe
             self._priority_items = []
             self._lock = threading.RLock()
+
+            # UUID -> the live heap entry, anything else in the heap with that UUID is stale
+            self._entries_by_uuid = {}
+            self._live_count = 0
+            self._stale_count = 0
+            # Live items per priority, for cheap position lookups
+            self._priority_ranks = _PriorityRanks()
+
+            # Weighted fair queueing, class key -> state (see _class_state()), off until set_classifier()
+            self._classify = None
+            self._classes = {}
+            self._class_by_uuid = {}
+            self._queued_at = {}
+            self._virtual_time = 0.0
             
             # Signals for UI updates
             self.queue_length_signal = signal('queue_length')
@@ -57,19 +186,20 @@ class RecheckPriorityQueue:
     
     # SYNC INTERFACE (for ticker thread)
     def put(self, item, block: bool = True, timeout: Optional[float] = None):
-        """Thread-safe sync put with priority ordering"""
+        """Thread-safe sync put with priority ordering, an already queued UUID is only moved up"""
         try:
             # Add to priority storage
             with self._lock:
-                heapq.heappush(self._priority_items, item)
-            
-            # Notify via janus sync queue
-            self.sync_q.put(True, block=block, timeout=timeout)
-            
+                added = self._add_item(item)
+
+            if added:
+                # Notify via janus sync queue
+                self.sync_q.put(True, block=block, timeout=timeout)
+
             # Emit signals
             self._emit_put_signals(item)
             
-            logger.debug(f"Successfully queued item: {self._get_item_uuid(item)}")
+            logger.debug(f"Successfully queued item: {self._get_item_uuid(item)}" if added else f"Already queued item: {self._get_item_uuid(item)}")
             return True
             
         except Exception as e:
@@ -77,12 +207,115 @@ class RecheckPriorityQueue:
             # Remove from priority storage if janus put failed
             try:
                 with self._lock:
-                    if item in self._priority_items:
-                        self._priority_items.remove(item)
-                        heapq.heapify(self._priority_items)
+                    self._discard_item(item)
             except Exception as cleanup_e:
                 logger.critical(f"CRITICAL: Failed to cleanup after put failure: {str(e)}")
             return False
+
+    def put_many(self, items: List[Any]) -> int:
+        """Queue many items under one lock, returns how many were new to the queue"""
+        added = 0
+        with self._lock:
+            added_items = [item for item in items if self._add_item(item)]
+
+        for item in added_items:
+            try:
+                self.sync_q.put(True, block=True, timeout=5.0)
+                added += 1
+            except Exception as e:
+                logger.critical(f"CRITICAL: Failed to put item {self._get_item_uuid(item)}: {str(e)}")
+                with self._lock:
+                    self._discard_item(item)
+
+        if self.queue_length_signal:
+            self.queue_length_signal.send(length=self.qsize())
+        for item in items:
+            self._emit_put_signals(item, send_queue_length=False)
+
+        logger.debug(f"Queued {added} new items of {len(items)}")
+        return added
+
+    def take_matching(self, limit: int, accept=None, scan: int = 100) -> List[Any]:
+        """
+        Take up to `limit` items without waiting, highest priority first, only those accept(item) is True for
+        (of the first `scan`), the rest stay where they are. Used by the remote runners, see remote_runners.py
+        """
+        # Claim the notifications first, so a worker never wakes up to an empty queue
+        claimed = 0
+        while claimed < limit:
+            try:
+                self.sync_q.get_nowait()
+            except queue.Empty:
+                break
+            claimed += 1
+
+        taken = []
+        if claimed:
+            with self._lock:
+                candidates = heapq.nsmallest(max(scan, claimed), (i for i in self._priority_items if self._is_live(i)))
+                for item in candidates:
+                    if len(taken) >= claimed:
+                        break
+                    if accept is None or accept(item):
+                        self._discard_item(item)
+                        taken.append(item)
+
+            # Give back the ones that weren't needed
+            for i in range(claimed - len(taken)):
+                self.sync_q.put_nowait(True)
+
+            if taken:
+                self._emit_get_signals()
+
+        return taken
+
+    def set_classifier(self, classify):
+        """
+        classify(item) -> (class key, weight), called once when an item is queued, None turns the fair queueing off
+        """
+        with self._lock:
+            self._classify = classify
+            self._classes = {}
+            self._class_by_uuid = {}
+            if classify is not None:
+                for item in self._priority_items:
+                    uuid = self._uuid_of(item)
+                    if uuid is not None and self._is_live(item):
+                        self._add_to_class(item, uuid)
+
+    def oldest_waiting_seconds(self) -> float:
+        """How long the item that's been in the queue the longest has been waiting"""
+        with self._lock:
+            if not self._queued_at:
+                return 0.0
+            return max(0.0, time.time() - min(self._queued_at.values()))
+
+    def get_class_stats(self) -> Dict[str, Any]:
+        """Per class queue depth, weight and how long the items waited"""
+        now = time.time()
+        with self._lock:
+            oldest = {}
+            for uuid, key in self._class_by_uuid.items():
+                oldest[key] = min(oldest.get(key, now), self._queued_at.get(uuid, now))
+
+            return {key: {
+                'queued': state['queued'],
+                'weight': state['weight'],
+                'served': state['served'],
+                'wait_avg_seconds': round(state['wait_total'] / state['served'], 2) if state['served'] else 0.0,
+                'wait_max_seconds': round(state['wait_max'], 2),
+                'oldest_waiting_seconds': round(now - oldest[key], 2) if key in oldest else 0.0,
+            } for key, state in self._classes.items()}
+
+    def contains(self, uuid: str) -> bool:
+        """Is this watch UUID waiting in the queue"""
+        with self._lock:
+            return uuid in self._entries_by_uuid
+
+    def get_queued_uuids(self) -> set:
+        """All watch UUIDs waiting in the queue"""
+        with self._lock:
+            return set(self._entries_by_uuid.keys())
     
     def get(self, block: bool = True, timeout: Optional[float] = None):
         """Thread-safe sync get with priority ordering"""
@@ -92,10 +325,10 @@ class RecheckPriorityQueue:
             
             # Get highest priority item
             with self._lock:
-                if not self._priority_items:
+                item = self._pop_item()
+                if item is None:
                     logger.critical(f"CRITICAL: Queue notification received but no priority items available")
                     raise Exception("Priority queue inconsistency")
-                item = heapq.heappop(self._priority_items)
             
             # Emit signals
             self._emit_get_signals()
@@ -113,15 +346,16 @@ class RecheckPriorityQueue:
         try:
             # Add to priority storage
             with self._lock:
-                heapq.heappush(self._priority_items, item)
-            
-            # Notify via janus async queue
-            await self.async_q.put(True)
+                added = self._add_item(item)
+
+            if added:
+                # Notify via janus async queue
+                await self.async_q.put(True)
             
             # Emit signals
             self._emit_put_signals(item)
             
-            logger.debug(f"Successfully async queued item: {self._get_item_uuid(item)}")
+            logger.debug(f"Successfully async queued item: {self._get_item_uuid(item)}" if added else f"Already queued item: {self._get_item_uuid(item)}")
             return True
             
         except Exception as e:
@@ -129,9 +363,7 @@ class RecheckPriorityQueue:
             # Remove from priority storage if janus put failed
             try:
                 with self._lock:
-                    if item in self._priority_items:
-                        self._priority_items.remove(item)
-                        heapq.heapify(self._priority_items)
+                    self._discard_item(item)
             except Exception as cleanup_e:
                 logger.critical(f"CRITICAL: Failed to cleanup after async put failure: {str(e)}")
             return False
@@ -144,10 +376,10 @@ class RecheckPriorityQueue:
             
             # Get highest priority item
             with self._lock:
-                if not self._priority_items:
+                item = self._pop_item()
+                if item is None:
                     logger.critical(f"CRITICAL: Async queue notification received but no priority items available")
                     raise Exception("Priority queue inconsistency")
-                item = heapq.heappop(self._priority_items)
             
             # Emit signals
             self._emit_get_signals()
@@ -164,7 +396,7 @@ class RecheckPriorityQueue:
         """Get current queue size"""
         try:
             with self._lock:
-                return len(self._priority_items)
+                return self._live_count
         except Exception as e:
             logger.critical(f"CRITICAL: Failed to get queue size: {str(e)}")
             return 0
@@ -187,7 +419,7 @@ class RecheckPriorityQueue:
         """Provide compatibility with original queue access"""
         try:
             with self._lock:
-                return list(self._priority_items)
+                return [item for item in self._priority_items if self._is_live(item)]
         except Exception as e:
             logger.critical(f"CRITICAL: Failed to get queue list: {str(e)}")
             return []
@@ -196,27 +428,22 @@ class RecheckPriorityQueue:
         """Find position of UUID in queue"""
         try:
             with self._lock:
-                queue_list = list(self._priority_items)
-                total_items = len(queue_list)
+                total_items = self._live_count
                 
                 if total_items == 0:
                     return {'position': None, 'total_items': 0, 'priority': None, 'found': False}
                 
-                # Find target item
-                for item in queue_list:
-                    if (hasattr(item, 'item') and isinstance(item.item, dict) and 
-                        item.item.get('uuid') == target_uuid):
-                        
-                        # Count items with higher priority
-                        position = sum(1 for other in queue_list if other.priority < item.priority)
-                        return {
-                            'position': position,
-                            'total_items': total_items, 
-                            'priority': item.priority,
-                            'found': True
-                        }
-                
-                return {'position': None, 'total_items': total_items, 'priority': None, 'found': False}
+                item = self._entries_by_uuid.get(target_uuid)
+                if item is None:
+                    return {'position': None, 'total_items': total_items, 'priority': None, 'found': False}
+
+                # Count items with higher priority
+                return {
+                    'position': self._count_before(item.priority),
+                    'total_items': total_items,
+                    'priority': item.priority,
+                    'found': True
+                }
                 
         except Exception as e:
             logger.critical(f"CRITICAL: Failed to get UUID position for {target_uuid}: {str(e)}")
@@ -226,15 +453,17 @@ class RecheckPriorityQueue:
         """Get all queued UUIDs with pagination"""
         try:
             with self._lock:
-                queue_list = sorted(self._priority_items)  # Sort by priority
-                total_items = len(queue_list)
+                total_items = self._live_count
                 
                 if total_items == 0:
                     return {'items': [], 'total_items': 0, 'returned_items': 0, 'has_more': False}
                 
-                # Apply pagination
-                end_idx = min(offset + limit, total_items) if limit else total_items
-                items_to_process = queue_list[offset:end_idx]
+                live_items = (item for item in self._priority_items if self._is_live(item))
+                # Apply pagination, only the first page needs sorting
+                if limit:
+                    items_to_process = heapq.nsmallest(offset + limit, live_items)[offset:]
+                else:
+                    items_to_process = sorted(live_items)[offset:]
                 
                 result = []
                 for position, item in enumerate(items_to_process, start=offset):
@@ -261,8 +490,7 @@ class RecheckPriorityQueue:
         """Get queue summary statistics"""
         try:
             with self._lock:
-                queue_list = list(self._priority_items)
-                total_items = len(queue_list)
+                total_items = self._live_count
                 
                 if total_items == 0:
                     return {
@@ -270,28 +498,16 @@ class RecheckPriorityQueue:
                         'immediate_items': 0, 'clone_items': 0, 'scheduled_items': 0
                     }
                 
-                immediate_items = clone_items = scheduled_items = 0
-                priority_counts = {}
-                
-                for item in queue_list:
-                    priority = item.priority
-                    priority_counts[priority] = priority_counts.get(priority, 0) + 1
-                    
-                    if priority == 1:
-                        immediate_items += 1
-                    elif priority == 5:
-                        clone_items += 1
-                    elif priority > 100:
-                        scheduled_items += 1
+                priority_counts = dict(self._priority_ranks.counts)
                 
                 return {
                     'total_items': total_items,
                     'priority_breakdown': priority_counts,
-                    'immediate_items': immediate_items,
-                    'clone_items': clone_items,
-                    'scheduled_items': scheduled_items,
-                    'min_priority': min(priority_counts.keys()) if priority_counts else None,
-                    'max_priority': max(priority_counts.keys()) if priority_counts else None
+                    'immediate_items': priority_counts.get(1, 0),
+                    'clone_items': priority_counts.get(5, 0),
+                    'scheduled_items': sum(count for priority, count in priority_counts.items() if priority > 100),
+                    'min_priority': self._priority_ranks.first(),
+                    'max_priority': self._priority_ranks.last()
                 }
                 
         except Exception as e:
@@ -300,6 +516,195 @@ class RecheckPriorityQueue:
                    'clone_items': 0, 'scheduled_items': 0}
     
     # PRIVATE METHODS
+    @staticmethod
+    def _uuid_of(item) -> Optional[str]:
+        if hasattr(item, 'item') and isinstance(item.item, dict):
+            return item.item.get('uuid')
+        return None
+
+    def _is_live(self, item) -> bool:
+        uuid = self._uuid_of(item)
+        return uuid is None or self._entries_by_uuid.get(uuid) is item
+
+    def _count_priority(self, priority, n):
+        self._priority_ranks.add(priority, n)
+
+    def _count_before(self, priority) -> int:
+        return self._priority_ranks.before(priority)
+
+    def _class_state(self, key):
+        state = self._classes.get(key)
+        if state is None:
+            # 'start' is the virtual time of the class' next turn, it moves on by 1/weight for every item served
+            state = self._classes[key] = {'heap': [], 'queued': 0, 'weight': 1, 'start': self._virtual_time,
+                                          'served': 0, 'wait_total': 0.0, 'wait_max': 0.0}
+        return state
+
+    def _add_to_class(self, item, uuid):
+        """Call with the lock held"""
+        try:
+            key, weight = self._classify(item)
+        except Exception as e:
+            logger.error(f"Queue classifier failed for {uuid}, using the default class - {str(e)}")
+            key, weight = 'default', 1
+
+        state = self._class_state(key)
+        state['weight'] = max(1, int(weight or 1))
+        if not state['queued']:
+            # A class that had nothing waiting doesn't get to save up turns
+            state['start'] = max(state['start'], self._virtual_time)
+        state['queued'] += 1
+        heapq.heappush(state['heap'], item)
+        self._class_by_uuid[uuid] = key
+
+    def _remove_from_class(self, uuid):
+        """Call with the lock held, the heap entry is left behind as stale"""
+        key = self._class_by_uuid.pop(uuid, None)
+        if key is not None:
+            self._classes[key]['queued'] -= 1
+
+    def _add_item(self, item) -> bool:
+        """Call with the lock held, True when it's a new item in the queue (and needs a janus notification)"""
+        uuid = self._uuid_of(item)
+        existing = self._entries_by_uuid.get(uuid) if uuid is not None else None
+        if existing is not None:
+            # One queue entry for both, nothing either of them carries is lost
+            item.item = self._merge_payloads(existing.item, item.item, newer_wins=item.priority <= existing.priority)
+            if not item.priority < existing.priority:
+                existing.item = item.item
+                return False
+            # Moved up, the old heap entry becomes stale
+            self._count_priority(existing.priority, -1)
+            self._stale_count += 1
+            self._entries_by_uuid[uuid] = item
+            self._count_priority(item.priority, 1)
+            heapq.heappush(self._priority_items, item)
+            if self._classify is not None:
+                self._remove_from_class(uuid)
+                self._add_to_class(item, uuid)
+            return False
+
+        if uuid is not None:
+            self._entries_by_uuid[uuid] = item
+            self._queued_at[uuid] = time.time()
+            if self._classify is not None:
+                self._add_to_class(item, uuid)
+        self._live_count += 1
+        self._count_priority(item.priority, 1)
+        heapq.heappush(self._priority_items, item)
+        return True
+
+    @staticmethod
+    def _merge_payloads(old, new, newer_wins=True):
+        """
+        The payload of a UUID queued twice, the better placed one wins where both have a key (the newer one when equal).
+        A plain check queued together with a remote runner result (see remote_runners.py) is kept as 'recheck',
+        the worker queues a new check after saving the result.
+        """
+        merged = {**old, **new} if newer_wins else {**new, **old}
+        if ('remote_result' in old) != ('remote_result' in new):
+            merged['recheck'] = True
+        return merged
+
+    def _discard_item(self, item):
+        """Call with the lock held, undo _add_item() of a new item"""
+        if not self._is_live(item):
+            return
+        uuid = self._uuid_of(item)
+        if uuid is not None:
+            del self._entries_by_uuid[uuid]
+            self._queued_at.pop(uuid, None)
+            self._remove_from_class(uuid)
+            self._stale_count += 1
+        else:
+            self._priority_items.remove(item)
+            heapq.heapify(self._priority_items)
+        self._live_count -= 1
+        self._count_priority(item.priority, -1)
+
+    def _pop_item(self):
+        """Call with the lock held, the next live item or None"""
+        item = None
+        if self._class_by_uuid:
+            item = self._pop_urgent_item() or self._pop_fair_item()
+        if item is not None:
+            # Left behind in the main heap, or in its class heap when it was urgent
+            self._stale_count += 1
+        else:
+            while self._priority_items:
+                candidate = heapq.heappop(self._priority_items)
+                if not self._is_live(candidate):
+                    self._stale_count -= 1
+                    continue
+                item = candidate
+                break
+
+        if item is None:
+            return None
+
+        uuid = self._uuid_of(item)
+        if uuid is not None:
+            del self._entries_by_uuid[uuid]
+            self._queued_at.pop(uuid, None)
+            self._remove_from_class(uuid)
+        self._live_count -= 1
+        self._count_priority(item.priority, -1)
+
+        # Too many stale entries left behind, rebuild from the live ones
+        if self._stale_count > self._live_count + 1000:
+            self._priority_items = [i for i in self._priority_items if self._is_live(i)]
+            heapq.heapify(self._priority_items)
+            for state in self._classes.values():
+                state['heap'] = [i for i in state['heap'] if self._is_live(i)]
+                heapq.heapify(state['heap'])
+            self._stale_count = 0
+        return item
+
+    def _count_served(self, state, uuid):
+        state['served'] += 1
+        waited = time.time() - self._queued_at.get(uuid, time.time())
+        state['wait_total'] += waited
+        state['wait_max'] = max(state['wait_max'], waited)
+
+    def _pop_urgent_item(self):
+        """Call with the lock held, the best item when it's urgent, it's left behind as stale in its class heap"""
+        while self._priority_items and not self._is_live(self._priority_items[0]):
+            heapq.heappop(self._priority_items)
+            self._stale_count -= 1
+        if not self._priority_items or self._priority_items[0].priority >= URGENT_PRIORITY:
+            return None
+
+        item = heapq.heappop(self._priority_items)
+        key = self._class_by_uuid.get(self._uuid_of(item))
+        if key is not None:
+            # Not charged to the class' turns, only counted
+            self._count_served(self._classes[key], self._uuid_of(item))
+        return item
+
+    def _pop_fair_item(self):
+        """Call with the lock held, the best item of the class whose turn it is"""
+        waiting = [(state['start'], key) for key, state in self._classes.items() if state['queued']]
+        if not waiting:
+            return None
+        start, key = min(waiting)
+        state = self._classes[key]
+
+        while state['heap']:
+            item = heapq.heappop(state['heap'])
+            uuid = self._uuid_of(item)
+            if not self._is_live(item) or self._class_by_uuid.get(uuid) != key:
+                continue
+
+            self._virtual_time = start
+            state['start'] = start + 1 / state['weight']
+            self._count_served(state, uuid)
+            return item
+
+        # Shouldn't happen, the count was out
+        logger.critical(f"CRITICAL: Queue class {key} had no live items left, count was {state['queued']}")
+        state['queued'] = 0
+        return self._pop_fair_item()
+
     def _get_item_uuid(self, item) -> str:
         """Safely extract UUID from item for logging"""
         try:
@@ -309,7 +714,7 @@ class RecheckPriorityQueue:
             pass
         return 'unknown'
     
-    def _emit_put_signals(self, item):
+    def _emit_put_signals(self, item, send_queue_length=True):
         """Emit signals when item is added"""
         try:
             # Watch update signal
@@ -319,7 +724,7 @@ class RecheckPriorityQueue:
                     watch_check_update.send(watch_uuid=item.item['uuid'])
             
             # Queue length signal
-            if self.queue_length_signal:
+            if send_queue_length and self.queue_length_signal:
                 self.queue_length_signal.send(length=self.qsize())
                 
         except Exception as e:
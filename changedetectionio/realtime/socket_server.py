@@ -208,12 +208,6 @@ def handle_watch_update(socketio, **kwargs):
         # Get list of watches that are currently running
         running_uuids = worker_handler.get_running_uuids()
 
-        # Get list of watches in the queue
-        queue_list = []
-        for q_item in update_q.queue:
-            if hasattr(q_item, 'item') and 'uuid' in q_item.item:
-                queue_list.append(q_item.item['uuid'])
-
         # Get the error texts from the watch
         error_texts = watch.compile_error_texts()
         # Create a simplified watch data object to send to clients
@@ -231,7 +225,7 @@ def handle_watch_update(socketio, **kwargs):
             'last_checked_text': _jinja2_filter_datetime(watch),
             'notification_muted': True if watch.get('notification_muted') else False,
             'paused': True if watch.get('paused') else False,
-            'queued': True if watch.get('uuid') in queue_list else False,
+            'queued': update_q.contains(watch.get('uuid')),
             'unviewed': watch.has_unviewed,
             'uuid': watch.get('uuid'),
         }
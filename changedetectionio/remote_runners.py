@@ -0,0 +1,244 @@
+"""
+Remote check runners, other machines (or processes) that fetch and process watches for this instance
+
+Enabled with REMOTE_RUNNERS=true. A runner (python -m changedetectionio.runner, see runner.py) leases a batch of the
+watches waiting in the queue through the API (POST /api/v1/runner/lease, always with the API key), runs call_browser()
+and run_changedetection() for them itself and posts the results back (POST /api/v1/runner/result/<lease id>).
+The results go back in the queue ahead of everything else and one of the local workers saves them the same as its own
+checks (history, notifications, errors and all), so this instance still owns the datastore and the scheduling.
+
+A lease is good for RUNNER_LEASE_SECONDS (default 300), after that the watch goes back in the queue for anyone and a
+late result is refused. Watches that need their history or the datastore to be processed (unique lines, only
+added/removed lines, conditions, processors that can't run in another process) always stay here, see is_remotable().
+The local workers carry on as well (at least one is needed to save the results), runners get whatever is still waiting
+when they ask, so the fewer FETCH_WORKERS here the more of the checks go to the runners.
+"""
+
+from changedetectionio import queuedWatchMetaData
+from changedetectionio.host_limiter import host_limiter, host_for_url, limits_for_watch
+from changedetectionio.processing_pool import unpack_exception
+from changedetectionio.processors import difference_detection_processor, SECRET_APPLICATION_SETTINGS
+from changedetectionio.proxy_pool import proxy_pool, candidates_for_proxy, is_proxy_failure
+from changedetectionio.strtobool import strtobool
+from blinker import signal
+from loguru import logger
+import base64
+import importlib
+import os
+import threading
+import time
+import uuid as uuid_builder
+
+# Results are saved before anything else in the queue
+RESULT_PRIORITY = 0
+
+
+def is_remotable(watch):
+    """True when the watch can be fetched and processed away from the datastore"""
+    if watch.get('check_unique_lines') or watch.get('conditions') or watch.has_special_diff_filter_options_set():
+        return False
+    try:
+        processor_module = importlib.import_module(f"changedetectionio.processors.{watch.get('processor', 'text_json_diff')}.processor")
+    except ModuleNotFoundError:
+        return False
+    return bool(getattr(processor_module.perform_site_check, 'process_pool_safe', False))
+
+
+def _without_secrets(d):
+    """Notification URLs (often with tokens and passwords in them) and secrets are never needed by a runner"""
+    return {k: v for k, v in d.items() if k not in SECRET_APPLICATION_SETTINGS and not k.startswith('notification_')}
+
+
+def build_job(datastore, watch, proxy_id=None):
+    """Everything a runner needs for the check, JSON safe"""
+    uuid = watch.get('uuid')
+    settings = datastore.data['settings']
+
+    application = _without_secrets(settings['application'])
+    # Only the tags of this watch
+    application['tags'] = {tag_uuid: _without_secrets(tag) for tag_uuid, tag in datastore.get_all_tags_for_watch(uuid=uuid).items()}
+
+    proxy_list = datastore.proxy_list or {}
+    return {
+        'uuid': uuid,
+        'processor': watch.get('processor', 'text_json_diff'),
+        'watch': _without_secrets(watch),
+        'settings': {
+            'application': application,
+            'headers': dict(settings.get('headers', {})),
+            # Only the proxy chosen for this check is sent
+            'requests': {k: v for k, v in settings['requests'].items() if k != 'extra_proxies'},
+        },
+        'proxy_id': proxy_id,
+        'proxy_list': {proxy_id: proxy_list[proxy_id]} if proxy_id in proxy_list else {},
+        'textfile_headers': datastore.get_all_headers_in_textfile_for_watch(uuid=uuid),
+    }
+
+
+class RemoteResult(difference_detection_processor):
+    """Stands in for the processor in the worker, replays what the remote runner sent back"""
+
+    def __init__(self, *args, datastore, watch_uuid, result, **kwargs):
+        super().__init__(*args, datastore=datastore, watch_uuid=watch_uuid, **kwargs)
+        self.result = result
+
+    async def call_browser(self, preferred_proxy_id=None):
+        fetched = self.result.get('fetcher') or {}
+        self.fetcher.content = fetched.get('content')
+        self.fetcher.headers = fetched.get('headers') or {}
+        self.fetcher.status_code = fetched.get('status_code')
+        self.fetcher.not_modified = bool(fetched.get('not_modified'))
+        self.fetcher.xpath_data = fetched.get('xpath_data')
+        self.fetcher.instock_data = fetched.get('instock_data')
+        self.fetcher.favicon_blob = fetched.get('favicon_blob')
+        self.fetcher.screenshot = base64.b64decode(fetched['screenshot']) if fetched.get('screenshot') else None
+
+        if self.result.get('exception') and self.result.get('stage') == 'fetch':
+            raise unpack_exception(self.result['exception'], self.fetcher)
+
+    def run_changedetection(self, watch):
+        self.screenshot = self.fetcher.screenshot
+        self.xpath_data = self.fetcher.xpath_data
+
+        if self.result.get('exception'):
+            raise unpack_exception(self.result['exception'], self.fetcher)
+
+        update_obj = dict(self.result.get('update_obj') or {})
+        if isinstance(update_obj.get('restock'), dict):
+            from changedetectionio.processors.restock_diff import Restock
+            update_obj['restock'] = Restock(update_obj['restock'])
+
+        return bool(self.result.get('changed_detected')), update_obj, self.result.get('contents') or ''
+
+
+class LeaseManager:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # lease id -> {'uuid', 'runner', 'expires', 'item', 'host', 'proxy_id', 'leased_at'}
+        self._leases = {}
+        self.enabled = strtobool(os.getenv('REMOTE_RUNNERS', 'False'))
+        self.lease_seconds = int(os.getenv('RUNNER_LEASE_SECONDS', 300))
+
+        self.leased = 0
+        self.completed = 0
+        self.expired = 0
+        self.refused = 0
+        # runner name -> when it last asked for work
+        self.runners_seen = {}
+
+    def lease(self, update_q, datastore, runner, limit, now=None):
+        """Take up to `limit` waiting watches out of the queue for the runner, returns the jobs"""
+        from changedetectionio import worker_handler
+        now = time.time() if now is None else now
+        with self._lock:
+            self.runners_seen[runner] = now
+
+        def accept(item):
+            watch = datastore.data['watching'].get(item.item.get('uuid'))
+            return bool(watch and watch.get('url') and not item.item.get('remote_result') and is_remotable(watch))
+
+        jobs = []
+        for item in update_q.take_matching(limit, accept=accept):
+            uuid = item.item.get('uuid')
+            watch = datastore.data['watching'].get(uuid)
+
+            # Same politeness and proxy choice as the local workers, when it has to wait it's left for them
+            host = None
+            per_minute, max_in_flight = limits_for_watch(datastore, watch)
+            if per_minute or max_in_flight:
+                host = host_for_url(watch.get('url'))
+                if host_limiter.try_acquire(host, per_minute=per_minute, max_in_flight=max_in_flight, uuid=uuid):
+                    update_q.put(item)
+                    continue
+
+            proxy_id = None
+            proxy_list = datastore.proxy_list
+            candidates = candidates_for_proxy(proxy_list, datastore.get_preferred_proxy_for_watch(uuid=uuid))
+            if candidates:
+                proxy_id, wait = proxy_pool.acquire(proxy_list, candidates)
+                if not proxy_id:
+                    if host:
+                        host_limiter.release(host, unused=True)
+                    update_q.put(item)
+                    continue
+
+            lease_id = str(uuid_builder.uuid4())
+            with self._lock:
+                self._leases[lease_id] = {'uuid': uuid, 'runner': runner, 'expires': now + self.lease_seconds,
+                                          'item': item, 'host': host, 'proxy_id': proxy_id, 'leased_at': now}
+                self.leased += 1
+
+            worker_handler.set_uuid_processing(uuid, processing=True)
+            signal('watch_check_update').send(watch_uuid=uuid)
+            jobs.append({'lease_id': lease_id, 'lease_seconds': self.lease_seconds, **build_job(datastore, watch, proxy_id)})
+            logger.debug(f"Runner '{runner}' leased {uuid} lease {lease_id}")
+
+        return jobs
+
+    def _finish(self, lease, ok=None, latency=None):
+        from changedetectionio import worker_handler
+        if lease['host']:
+            host_limiter.release(lease['host'])
+        if lease['proxy_id']:
+            proxy_pool.release(lease['proxy_id'], ok=ok, latency=latency)
+        worker_handler.set_uuid_processing(lease['uuid'], processing=False)
+
+    def leased_uuid(self, lease_id, now=None):
+        """The watch UUID of a lease that's still good, otherwise None"""
+        now = time.time() if now is None else now
+        with self._lock:
+            lease = self._leases.get(lease_id)
+            return lease['uuid'] if lease and lease['expires'] >= now else None
+
+    def complete(self, update_q, lease_id, result, now=None):
+        """Queue the result to be saved, False when the lease is unknown, expired or for another watch"""
+        from changedetectionio import worker_handler
+        now = time.time() if now is None else now
+        with self._lock:
+            lease = self._leases.get(lease_id)
+            if not lease or lease['expires'] < now or result.get('uuid') != lease['uuid']:
+                self.refused += 1
+                return False
+            del self._leases[lease_id]
+            self.completed += 1
+
+        ok = True
+        if result.get('exception') and result.get('stage') == 'fetch':
+            ok = not is_proxy_failure(unpack_exception(result['exception'], None))
+        self._finish(lease, ok=ok, latency=result.get('fetch_seconds') if ok else None)
+
+        worker_handler.queue_item_async_safe(update_q, queuedWatchMetaData.PrioritizedItem(priority=RESULT_PRIORITY,
+                                                                                           item={'uuid': lease['uuid'], 'remote_result': result}))
+        return True
+
+    def requeue_expired(self, update_q, now=None):
+        """Watches whose lease ran out go back in the queue with their old priority, call regularly"""
+        from changedetectionio import worker_handler
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [lease_id for lease_id, lease in self._leases.items() if lease['expires'] < now]
+            leases = [self._leases.pop(lease_id) for lease_id in expired]
+            self.expired += len(leases)
+
+        for lease in leases:
+            logger.warning(f"Runner '{lease['runner']}' didn't finish {lease['uuid']} in time, back in the queue")
+            self._finish(lease)
+            worker_handler.queue_item_async_safe(update_q, lease['item'])
+        return len(leases)
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'active_leases': len(self._leases),
+                'leased': self.leased,
+                'completed': self.completed,
+                'expired': self.expired,
+                'refused': self.refused,
+                'runners': {runner: round(now - seen, 1) for runner, seen in self.runners_seen.items()},
+            }
+
+
+lease_manager = LeaseManager()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+"""
+Remote check runner, fetches and processes checks for a changedetection.io instance started with REMOTE_RUNNERS=true
+
+    python -m changedetectionio.runner -u http://changedetection:5000 -k <API key> [-n name] [-c checks at once] [-b lease batch] [-w seconds between polls]
+
+The API key can also be set with RUNNER_API_KEY. It leases waiting checks through the API, runs call_browser() and
+run_changedetection() here with the same fetchers and processors (so the browser, playwright etc need to be set up
+here the same way, PLAYWRIGHT_DRIVER_URL and friends) and sends the results back, see remote_runners.py.
+Nothing is stored here, more than one runner can run on the same machine, just give them different names.
+"""
+
+from changedetectionio.processing_pool import DatastoreSnapshot, pack_exception
+from changedetectionio.processors import get_custom_watch_obj_for_processor
+from loguru import logger
+import asyncio
+import base64
+import getopt
+import importlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+
+class JobDatastore(DatastoreSnapshot):
+    """What the processors need from the datastore, made from the job the instance sent"""
+
+    def __init__(self, job, datastore_path):
+        self.datastore_path = datastore_path
+        self.job = job
+        watch_class = get_custom_watch_obj_for_processor(job.get('processor'))
+        self.data = {'settings': job['settings'],
+                     'watching': {job['uuid']: watch_class(datastore_path=datastore_path, default=job['watch'])}}
+
+    @property
+    def proxy_list(self):
+        return self.job.get('proxy_list') or None
+
+    def get_preferred_proxy_for_watch(self, uuid):
+        # Already chosen by the instance
+        return self.job.get('proxy_id')
+
+    def get_all_base_headers(self):
+        return dict(self.data['settings'].get('headers', {}))
+
+    def get_all_headers_in_textfile_for_watch(self, uuid):
+        return dict(self.job.get('textfile_headers') or {})
+
+
+def fetcher_result(fetcher):
+    """What the instance needs from the fetcher to save the check, JSON safe"""
+    return {
+        'content': fetcher.content,
+        'headers': dict(fetcher.headers or {}),
+        'status_code': fetcher.status_code,
+        'not_modified': fetcher.not_modified,
+        'screenshot': base64.b64encode(fetcher.screenshot).decode('ascii') if fetcher.screenshot else None,
+        'xpath_data': fetcher.xpath_data,
+        'instock_data': fetcher.instock_data,
+        'favicon_blob': getattr(fetcher, 'favicon_blob', None),
+    }
+
+
+async def run_job(job, runner_name):
+    """Fetch and process one leased check, returns the result to send back"""
+    uuid = job['uuid']
+    datastore_path = tempfile.mkdtemp(prefix='changedetection-runner-')
+    result = {'uuid': uuid, 'runner': runner_name}
+    update_handler = None
+    stage = 'fetch'
+    try:
+        datastore = JobDatastore(job, datastore_path)
+        processor_module = importlib.import_module(f"changedetectionio.processors.{job['processor']}.processor")
+        update_handler = processor_module.perform_site_check(datastore=datastore, watch_uuid=uuid)
+
+        fetch_start = time.time()
+        await update_handler.call_browser(preferred_proxy_id=job.get('proxy_id'))
+        result['fetch_seconds'] = round(time.time() - fetch_start, 3)
+
+        stage = 'changedetection'
+        changed_detected, update_obj, contents = update_handler.run_changedetection(watch=datastore.data['watching'][uuid])
+        result.update({
+            'changed_detected': bool(changed_detected),
+            'update_obj': update_obj,
+            'contents': contents.decode('utf-8', errors='replace') if isinstance(contents, bytes) else contents,
+        })
+    except Exception as e:
+        logger.debug(f"{uuid} - {stage} raised {type(e).__name__}: {str(e)}")
+        result['stage'] = stage
+        result['exception'] = pack_exception(e)
+    finally:
+        if update_handler and update_handler.fetcher:
+            result['fetcher'] = fetcher_result(update_handler.fetcher)
+            update_handler.fetcher.clear_content()
+        shutil.rmtree(datastore_path, ignore_errors=True)
+
+    return result
+
+
+class Runner:
+
+    def __init__(self, url, api_key, name, concurrency=2, batch=5, poll_seconds=5):
+        import requests
+        self.url = url.rstrip('/')
+        self.name = name
+        self.concurrency = concurrency
+        self.batch = batch
+        self.poll_seconds = poll_seconds
+        self.session = requests.Session()
+        self.session.headers.update({'x-api-key': api_key, 'Content-Type': 'application/json'})
+        self.running = set()
+
+    def _post(self, path, data):
+        r = self.session.post(f"{self.url}/api/v1/{path}", data=json.dumps(data, default=str), timeout=60)
+        return r.status_code, r.json() if r.content else None
+
+    async def lease(self, limit):
+        status_code, reply = await asyncio.to_thread(self._post, 'runner/lease', {'runner': self.name, 'limit': limit})
+        if status_code != 200:
+            raise RuntimeError(f"Lease refused ({status_code}) - {reply}")
+        return reply.get('jobs', [])
+
+    async def work(self, job):
+        result = await run_job(job, self.name)
+        try:
+            status_code, reply = await asyncio.to_thread(self._post, f"runner/result/{job['lease_id']}", result)
+            if status_code == 200:
+                logger.info(f"{job['uuid']} done {job['watch'].get('url')}")
+            else:
+                logger.warning(f"{job['uuid']} result refused ({status_code}) - {reply}")
+        except Exception as e:
+            logger.error(f"{job['uuid']} could not send the result, the lease will expire - {str(e)}")
+
+    async def run(self):
+        logger.info(f"Runner '{self.name}' working for {self.url}, {self.concurrency} at once")
+        while True:
+            free = self.concurrency - len(self.running)
+            jobs = []
+            if free > 0:
+                try:
+                    jobs = await self.lease(min(free, self.batch))
+                except Exception as e:
+                    logger.error(f"Could not lease checks - {str(e)}")
+
+            for job in jobs:
+                task = asyncio.create_task(self.work(job))
+                self.running.add(task)
+                task.add_done_callback(self.running.discard)
+
+            # Straight back for more when there was something to do
+            if not jobs or len(self.running) >= self.concurrency:
+                await asyncio.sleep(self.poll_seconds if not jobs else 0.5)
+
+
+def main():
+    url = None
+    api_key = os.getenv('RUNNER_API_KEY')
+    name = f"{platform.node()}-{os.getpid()}"
+    concurrency = 2
+    batch = 5
+    poll_seconds = 5
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "u:k:n:c:b:w:")
+    except getopt.GetoptError:
+        print('runner.py -u [changedetection.io URL] -k [API key] -n [runner name] -c [checks at once] -b [lease batch size] -w [seconds between polls]')
+        sys.exit(2)
+
+    for opt, arg in opts:
+        if opt == '-u':
+            url = arg
+        if opt == '-k':
+            api_key = arg
+        if opt == '-n':
+            name = arg
+        if opt == '-c':
+            concurrency = int(arg)
+        if opt == '-b':
+            batch = int(arg)
+        if opt == '-w':
+            poll_seconds = float(arg)
+
+    if not url or not api_key:
+        print('runner.py needs -u [changedetection.io URL] and -k [API key] (or RUNNER_API_KEY)')
+        sys.exit(2)
+
+    logger.remove()
+    logger.add(sys.stderr, level=os.getenv("LOGGER_LEVEL", 'INFO').upper())
+
+    try:
+        asyncio.run(Runner(url=url, api_key=api_key, name=name, concurrency=concurrency, batch=batch, poll_seconds=poll_seconds).run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
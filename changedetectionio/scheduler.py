@@ -0,0 +1,164 @@
+"""
+Next-due-time priority queue for the ticker thread
+
+Instead of sorting every watch by last_checked and examining all of them every second, the ticker keeps the time
+each watch is next due in a heap and only looks at the ones that are due.
+
+Due times only change when something happens to the watch, ChangeDetectionStore.mark_watch_dirty() sends the
+'watch_changed' signal (edits, API updates, pause/unpause, check results) and 'watch_check_update' is sent when a check
+is queued, starts and finishes, those watches are worked out again on the next tick. Everything is only worked out
+again at startup and whenever the global recheck settings change, a due watch is always looked at again anyway before
+it's queued. Every SCHEDULER_RESYNC_SECONDS (default 600) the watch UUIDs are compared with what is scheduled, so a
+watch added or removed without a signal isn't lost, that doesn't load (hydrate) any watch.
+"""
+
+from blinker import signal
+from loguru import logger
+import heapq
+import os
+import threading
+import time
+
+
+class RecheckScheduler:
+
+    def __init__(self):
+        self._heap = []
+        # uuid -> due time, heap entries that don't match this any more are stale and skipped
+        self._due = {}
+        # Looked at but not scheduled (paused, gone..), until they change
+        self._unscheduled = set()
+        self._changed = set()
+        self._lock = threading.Lock()
+        self.resync_seconds = int(os.getenv('SCHEDULER_RESYNC_SECONDS', 600))
+        self._last_index_check = 0
+        self._settings_fingerprint = None
+        self._signals_connected = False
+
+        # Metrics
+        self.lag_seconds = 0.0
+        self.lag_seconds_avg = 0.0
+        self.tick_seconds = 0.0
+        self.due_last_tick = 0
+        self.queued_last_tick = 0
+        self.resyncs = 0
+        self.missed_changes = 0
+
+    def connect_signals(self):
+        if self._signals_connected:
+            return
+        signal('watch_changed').connect(self._handle_watch_signal, weak=False)
+        signal('watch_check_update').connect(self._handle_watch_signal, weak=False)
+        self._signals_connected = True
+
+    def _handle_watch_signal(self, *args, **kwargs):
+        watch_uuid = kwargs.get('watch_uuid')
+        if watch_uuid:
+            self.mark_changed(watch_uuid)
+
+    def mark_changed(self, uuid):
+        with self._lock:
+            self._changed.add(uuid)
+
+    def take_changed(self):
+        with self._lock:
+            changed, self._changed = self._changed, set()
+        return changed
+
+    def needs_resync(self, now, settings_fingerprint):
+        """True when everything should be scheduled again (first time and when anything global the due times depend on changes)"""
+        if settings_fingerprint != self._settings_fingerprint:
+            self._settings_fingerprint = settings_fingerprint
+            self._last_index_check = now
+            self.resyncs += 1
+            # Everything is being worked out again anyway
+            self.take_changed()
+            return True
+        return False
+
+    def index_check_due(self, now):
+        if now - self._last_index_check >= self.resync_seconds:
+            self._last_index_check = now
+            return True
+        return False
+
+    def check_index(self, uuids):
+        """
+        Compare all the watch UUIDs with what is known, new ones are worked out again on the next take_changed(),
+        ones that are gone are dropped, returns how many were found that way
+        """
+        uuids = set(uuids)
+        with self._lock:
+            known = set(self._due.keys()) | self._unscheduled | self._changed
+            missed = uuids - known
+            self._changed |= missed
+            for uuid in known - uuids:
+                self._due.pop(uuid, None)
+                self._unscheduled.discard(uuid)
+
+        if missed:
+            self.missed_changes += len(missed)
+            logger.warning(f"Recheck scheduler found {len(missed)} watches that changed without a signal")
+        return len(missed)
+
+    def schedule(self, uuid, due):
+        with self._lock:
+            self._unscheduled.discard(uuid)
+            if self._due.get(uuid) == due:
+                return
+            self._due[uuid] = due
+            heapq.heappush(self._heap, (due, uuid))
+
+            # Too many stale entries, start again from what is current
+            if len(self._heap) > 2 * len(self._due) + 1024:
+                self._heap = [(t, u) for u, t in self._due.items()]
+                heapq.heapify(self._heap)
+
+    def remove(self, uuid):
+        with self._lock:
+            self._due.pop(uuid, None)
+            self._unscheduled.add(uuid)
+
+    def pop_due(self, now):
+        """Remove and return [(uuid, due time), ...] for everything due at or before now, most overdue first"""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                t, uuid = heapq.heappop(self._heap)
+                if self._due.get(uuid) == t:
+                    del self._due[uuid]
+                    self._unscheduled.add(uuid)
+                    due.append((uuid, t))
+        return due
+
+    def due_time(self, uuid):
+        with self._lock:
+            return self._due.get(uuid)
+
+    def record_tick(self, lags, tick_seconds, due_count):
+        self.lag_seconds = max(lags) if lags else 0.0
+        if lags:
+            # Moving average so one slow tick doesn't hide a trend
+            self.lag_seconds_avg = (self.lag_seconds_avg * 0.9) + (sum(lags) / len(lags) * 0.1)
+        self.tick_seconds = tick_seconds
+        self.due_last_tick = due_count
+        self.queued_last_tick = len(lags)
+
+        if self.lag_seconds > 60:
+            logger.warning(f"Recheck scheduler is running behind, watches queued up to {self.lag_seconds:.1f}s after they were due")
+
+    def stats(self):
+        with self._lock:
+            scheduled = len(self._due)
+            next_due = min(self._due.values()) if self._due else None
+        return {
+            'scheduled': scheduled,
+            'next_due_in_seconds': round(max(0.0, next_due - time.time()), 1) if next_due is not None else None,
+            'due_last_tick': self.due_last_tick,
+            'queued_last_tick': self.queued_last_tick,
+            'lag_seconds': round(self.lag_seconds, 3),
+            'lag_seconds_avg': round(self.lag_seconds_avg, 3),
+            'tick_seconds': round(self.tick_seconds, 4),
+            'resyncs': self.resyncs,
+            'missed_changes': self.missed_changes,
+        }
@@ -4,8 +4,9 @@ from flask import (
     flash
 )
 
-from .html_tools import TRANSLATE_WHITESPACE_TABLE
-from . model import App, Watch
+from ..html_tools import TRANSLATE_WHITESPACE_TABLE
+from ..model import App, Watch
+from ..model.snapshot_cache import snapshot_cache
 from copy import deepcopy, copy
 from os import path, unlink
 from threading import Lock
@@ -20,8 +21,12 @@ import uuid as uuid_builder
 from loguru import logger
 from blinker import signal
 
-from .processors import get_custom_watch_obj_for_processor
-from .processors.restock_diff import Restock
+from ..processors import get_custom_watch_obj_for_processor
+from ..processors.restock_diff import Restock
+from .backends import get_backend
+from .config_files import config_file_cache, load_json
+from .index import WatchIndex
+from .lazy import LazyEntityDict
 
 # Because the server will run as a daemon and wont know the URL for notification links when firing off a notification
 BASE_URL_NOT_SET_TEXT = '("Base URL" not set - see settings - notifications)'
@@ -39,16 +44,31 @@ class ChangeDetectionStore:
     # For when we edit, we should write to disk
     needs_write_urgent = False
 
+    # How often (seconds) to do a full save when only single watches were being written (backends that support it)
+    full_sync_interval = int(os.getenv('DATASTORE_FULL_SYNC_SECONDS', 600))
+
     __version_check = True
 
     def __init__(self, datastore_path="/datastore", include_default_watches=True, version_tag="0.0.0"):
         # Should only be active for docker
         # logging.basicConfig(filename='/dev/stdout', level=logging.INFO)
+        startup_start = time.time()
         self.__data = App.model()
+        # Watches from disk are only converted to Watch.model when first used, see rehydrate_entity()
+        self.__data['watching'] = LazyEntityDict(hydrate=self.rehydrate_entity)
         self.datastore_path = datastore_path
         self.json_store_path = os.path.join(self.datastore_path, "url-watches.json")
-        logger.info(f"Datastore path is '{self.json_store_path}'")
+        self.backend = get_backend(os.getenv('DATASTORE_BACKEND'), self.datastore_path)
+        logger.info(f"Datastore path is '{self.datastore_path}' using '{self.backend.name}' backend")
         self.needs_write = False
+        # Watches that changed (or were removed) since the last save, see mark_watch_dirty()
+        self.__dirty_watches = set()
+        self.__deleted_watches = set()
+        self.__dirty_lock = Lock()
+        self.__last_full_sync = time.time()
+        # Lookups by tag, URL, title, error state and processor, see store/index.py
+        self.__index = WatchIndex()
+        self.__tag_uuids_by_title = {}
         self.start_time = time.time()
         self.stop_thread = False
         # Base definition for all watchers
@@ -61,43 +81,39 @@ class ChangeDetectionStore:
                 # So when someone gives us a backup file to examine, we know exactly what code they were running.
                 self.__data['build_sha'] = f.read()
 
+        startup_timings = {}
         try:
-            # @todo retest with ", encoding='utf-8'"
-            with open(self.json_store_path) as json_file:
-                from_disk = json.load(json_file)
-
-                # @todo isnt there a way todo this dict.update recursively?
-                # Problem here is if the one on the disk is missing a sub-struct, it wont be present anymore.
-                if 'watching' in from_disk:
-                    self.__data['watching'].update(from_disk['watching'])
+            load_start = time.time()
+            from_disk = self.backend.load()
+            startup_timings['load'] = time.time() - load_start
+            # @todo isnt there a way todo this dict.update recursively?
+            # Problem here is if the one on the disk is missing a sub-struct, it wont be present anymore.
+            if 'watching' in from_disk:
+                self.__data['watching'].load_raw(from_disk['watching'])
 
-                if 'app_guid' in from_disk:
-                    self.__data['app_guid'] = from_disk['app_guid']
+            if 'app_guid' in from_disk:
+                self.__data['app_guid'] = from_disk['app_guid']
 
-                if 'settings' in from_disk:
-                    if 'headers' in from_disk['settings']:
-                        self.__data['settings']['headers'].update(from_disk['settings']['headers'])
+            if 'settings' in from_disk:
+                if 'headers' in from_disk['settings']:
+                    self.__data['settings']['headers'].update(from_disk['settings']['headers'])
 
-                    if 'requests' in from_disk['settings']:
-                        self.__data['settings']['requests'].update(from_disk['settings']['requests'])
+                if 'requests' in from_disk['settings']:
+                    self.__data['settings']['requests'].update(from_disk['settings']['requests'])
 
-                    if 'application' in from_disk['settings']:
-                        self.__data['settings']['application'].update(from_disk['settings']['application'])
+                if 'application' in from_disk['settings']:
+                    self.__data['settings']['application'].update(from_disk['settings']['application'])
 
-                # Convert each existing watch back to the Watch.model object
-                for uuid, watch in self.__data['watching'].items():
-                    self.__data['watching'][uuid] = self.rehydrate_entity(uuid, watch)
-                    logger.info(f"Watching: {uuid} {watch['url']}")
+            # Tags should be Restock type because it has extra settings, there are only a few so convert them now
+            for uuid, tag in self.__data['settings']['application']['tags'].items():
+                self.__data['settings']['application']['tags'][uuid] = self.rehydrate_entity(uuid, tag, processor_override='restock_diff')
 
-                # And for Tags also, should be Restock type because it has extra settings
-                for uuid, tag in self.__data['settings']['application']['tags'].items():
-                    self.__data['settings']['application']['tags'][uuid] = self.rehydrate_entity(uuid, tag, processor_override='restock_diff')
-                    logger.info(f"Tag: {uuid} {tag['title']}")
+            logger.info(f"Loaded {len(self.__data['watching'])} watches and {len(self.__data['settings']['application']['tags'])} tags")
 
         # First time ran, Create the datastore.
         except (FileNotFoundError):
             if include_default_watches:
-                logger.critical(f"No JSON DB found at {self.json_store_path}, creating JSON store at {self.datastore_path}")
+                logger.critical(f"No datastore found at {self.datastore_path}, creating new '{self.backend.name}' store")
                 self.add_watch(url='https://news.ycombinator.com/',
                                tag='Tech news',
                                extras={'fetch_backend': 'html_requests'})
@@ -111,7 +127,9 @@ class ChangeDetectionStore:
 
         else:
             # Bump the update version by running updates
+            updates_start = time.time()
             self.run_updates()
+            startup_timings['updates'] = time.time() - updates_start
 
         self.__data['version_tag'] = version_tag
 
@@ -142,9 +160,26 @@ class ChangeDetectionStore:
 
         self.needs_write = True
 
+        startup_timings['total'] = time.time() - startup_start
+        self.startup_timings = startup_timings
+        logger.info("Datastore ready in " + ", ".join(f"{k} {v:.3f}s" for k, v in startup_timings.items()))
+
         # Finally start the thread that will manage periodic data saves to JSON
         save_data_thread = threading.Thread(target=self.save_datastore).start()
 
+    def __getstate__(self):
+        # The datastore is pickled along with the update handler for the filter preview (ProcessPoolExecutor),
+        # locks can't be pickled and the index is rebuilt on first use anyway
+        state = self.__dict__.copy()
+        del state['_ChangeDetectionStore__dirty_lock']
+        del state['_ChangeDetectionStore__index']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dirty_lock = Lock()
+        self.__index = WatchIndex()
+
     def rehydrate_entity(self, uuid, entity, processor_override=None):
         """Set the dict back to the dict Watch object"""
         entity['uuid'] = uuid
@@ -164,7 +199,7 @@ class ChangeDetectionStore:
     def set_last_viewed(self, uuid, timestamp):
         logger.debug(f"Setting watch UUID: {uuid} last viewed to {int(timestamp)}")
         self.data['watching'][uuid].update({'last_viewed': int(timestamp)})
-        self.needs_write = True
+        self.mark_watch_dirty(uuid)
 
         watch_check_update = signal('watch_check_update')
         if watch_check_update:
@@ -190,7 +225,42 @@ class ChangeDetectionStore:
                         del (update_obj[dict_key])
 
             self.__data['watching'][uuid].update(update_obj)
-        self.needs_write = True
+        self.mark_watch_dirty(uuid)
+
+    def mark_watch_dirty(self, uuid):
+        """Record that a watch changed so the next save only has to write that watch, and anything else that keeps track"""
+        with self.__dirty_lock:
+            self.__dirty_watches.add(uuid)
+
+        watch = self.__data['watching'].get(uuid)
+        if watch is not None:
+            self.__get_index().update(uuid, watch)
+
+        # The recheck scheduler works out when it's next due again
+        watch_changed = signal('watch_changed')
+        if watch_changed:
+            watch_changed.send(watch_uuid=uuid)
+
+    def __get_index(self):
+        self.__index.ensure(self.__data['watching'])
+        return self.__index
+
+    def __verified_watch_uuids(self, candidates, check):
+        """Index lookups are only candidates, confirm each one against the watch as it is now"""
+        results = []
+        for uuid in candidates:
+            watch = self.__data['watching'].get(uuid)
+            if watch is not None and check(watch):
+                results.append(uuid)
+        return results
+
+    def get_watch_uuids_with_tag(self, tag_uuid):
+        return self.__verified_watch_uuids(self.__get_index().uuids_with_tag(tag_uuid),
+                                           lambda watch: tag_uuid in (watch.get('tags') or []))
+
+    def get_errored_watch_uuids(self):
+        return self.__verified_watch_uuids(self.__get_index().errored_uuids(),
+                                           lambda watch: watch.get('last_error'))
 
     @property
     def threshold_seconds(self):
@@ -236,6 +306,7 @@ class ChangeDetectionStore:
         with self.lock:
             if uuid == 'all':
                 self.__data['watching'] = {}
+                snapshot_cache.clear()
                 time.sleep(1) # Mainly used for testing to allow all items to flush before running next test
 
                 # GitHub #30 also delete history records
@@ -249,6 +320,12 @@ class ChangeDetectionStore:
                 if os.path.exists(path):
                     shutil.rmtree(path)
                 del self.data['watching'][uuid]
+                self.__index.remove(uuid)
+                snapshot_cache.invalidate_watch(uuid)
+
+                with self.__dirty_lock:
+                    self.__deleted_watches.add(uuid)
+                    self.__dirty_watches.discard(uuid)
 
         self.needs_write_urgent = True
         watch_delete_signal = signal('watch_deleted')
@@ -264,13 +341,9 @@ class ChangeDetectionStore:
         return new_uuid
 
     def url_exists(self, url):
-
-        # Probably their should be dict...
-        for watch in self.data['watching'].values():
-            if watch['url'].lower() == url.lower():
-                return True
-
-        return False
+        url = url.lower()
+        return bool(self.__verified_watch_uuids(self.__get_index().uuids_with_url(url),
+                                                lambda watch: watch['url'].lower() == url))
 
     # Remove a watchs data but keep the entry (URL etc)
     def clear_watch_history(self, uuid):
@@ -330,7 +403,7 @@ class ChangeDetectionStore:
                 logger.error(f"Error fetching metadata for shared watch link {url} {str(e)}")
                 flash("Error fetching metadata for {}".format(url), 'error')
                 return False
-        from .model.Watch import is_safe_url
+        from ..model.Watch import is_safe_url
         if not is_safe_url(url):
             flash('Watch protocol is not permitted by SAFE_PROTOCOL_REGEX', 'error')
             return None
@@ -370,6 +443,7 @@ class ChangeDetectionStore:
         new_watch.update(apply_extras)
         new_watch.ensure_data_dir_exists()
         self.__data['watching'][new_uuid] = new_watch
+        self.mark_watch_dirty(new_uuid)
 
         if write_to_disk_now:
             self.sync_to_json()
@@ -388,30 +462,47 @@ class ChangeDetectionStore:
         return False
 
     def sync_to_json(self):
-        logger.info("Saving JSON..")
+        logger.info(f"Saving datastore ({self.backend.name})..")
+        with self.__dirty_lock:
+            self.__dirty_watches.clear()
+            self.__deleted_watches.clear()
         try:
-            data = deepcopy(self.__data)
+            self.backend.save_all(self.__data)
         except RuntimeError as e:
             # Try again in 15 seconds
             time.sleep(15)
             logger.error(f"! Data changed when writing to JSON, trying again.. {str(e)}")
             self.sync_to_json()
             return
-        else:
+        except Exception as e:
+            logger.error(f"Error writing datastore!! (Main datastore save was skipped) : {str(e)}")
 
-            try:
-                # Re #286  - First write to a temp file, then confirm it looks OK and rename it
-                # This is a fairly basic strategy to deal with the case that the file is corrupted,
-                # system was out of memory, out of RAM etc
-                with open(self.json_store_path+".tmp", 'w') as json_file:
-                    # Use compact JSON in production for better performance
-                    json.dump(data, json_file, indent=2)
-                os.replace(self.json_store_path+".tmp", self.json_store_path)
-            except Exception as e:
-                logger.error(f"Error writing JSON!! (Main JSON file save was skipped) : {str(e)}")
+        self.needs_write = False
+        self.needs_write_urgent = False
+        self.__last_full_sync = time.time()
+        # Catch anything that changed without going through update_watch()/mark_watch_dirty()
+        self.__index.rebuild(self.__data['watching'])
+
+    def sync_dirty_watches(self):
+        """Save only the watches that changed since the last save"""
+        with self.__dirty_lock:
+            dirty = self.__dirty_watches
+            deleted = self.__deleted_watches
+            self.__dirty_watches = set()
+            self.__deleted_watches = set()
+
+        if not dirty and not deleted:
+            return
 
-            self.needs_write = False
-            self.needs_write_urgent = False
+        try:
+            self.backend.save_watches(self.__data, uuids=dirty, deleted_uuids=deleted)
+        except Exception as e:
+            logger.error(f"Error writing changed watches, will try a full save : {str(e)}")
+            self.needs_write = True
+
+    def export_json(self, path):
+        """Write the whole datastore in the url-watches.json format (for backups etc), regardless of the backend"""
+        self.backend.export_json(self.__data, path)
 
     # Thread runner, this helps with thread/write issues when there are many operations that want to update the JSON
     # by just running periodically in one thread, according to python, dict updates are threadsafe.
@@ -433,6 +524,11 @@ class ChangeDetectionStore:
 
             if self.needs_write or self.needs_write_urgent:
                 self.sync_to_json()
+            elif time.time() - self.__last_full_sync > self.full_sync_interval and (self.__dirty_watches or self.__deleted_watches):
+                # Compact the journal (json backend) and catch anything that was changed in a watch without telling the datastore
+                self.sync_to_json()
+            else:
+                self.sync_dirty_watches()
 
             # Once per minute is enough, more and it can cause high CPU usage
             # better here is to use something like self.app.config.exit.wait(1), but we cant get to 'app' from here
@@ -460,15 +556,28 @@ class ChangeDetectionStore:
                     logger.info(f"Removing {item}")
                     unlink(item)
 
+    # Move the existing one-file-per-snapshot history of every watch into packed segment files
+    def pack_snapshots_to_segments(self):
+        from ..model import snapshot_segments
+        logger.info("Packing snapshots into segment files..")
+        total = 0
+        for uuid in self.data['watching'].keys():
+            data_dir = os.path.join(self.datastore_path, uuid)
+            if os.path.isdir(data_dir):
+                total += snapshot_segments.pack_watch_history(data_dir)
+
+        logger.success(f"Packed {total} snapshots")
+        return total
+
     @property
     def proxy_list(self):
         proxy_list = {}
-        proxy_list_file = os.path.join(self.datastore_path, 'proxies.json')
 
-        # Load from external config file
-        if path.isfile(proxy_list_file):
-            with open(os.path.join(self.datastore_path, "proxies.json")) as f:
-                proxy_list = json.load(f)
+        # Load from external config file, only read again when it changes
+        loaded = config_file_cache.get(os.path.join(self.datastore_path, 'proxies.json'), load_json)
+        if loaded:
+            # Copy, the cached one is shared
+            proxy_list = deepcopy(loaded)
 
         # Mapping from UI config if available
         extras = self.data['settings']['requests'].get('extra_proxies')
@@ -480,6 +589,14 @@ class ChangeDetectionStore:
                     k = "ui-" + str(i) + proxy.get('proxy_name')
                     proxy_list[k] = {'label': proxy.get('proxy_name'), 'url': proxy.get('proxy_url')}
 
+        # Proxies grouped with "pool" can be chosen as one, the member is picked when the check runs, see proxy_pool.py
+        from ..proxy_pool import pools_from_proxy_list
+        for pool_name, members in pools_from_proxy_list(proxy_list).items():
+            proxy_list[f"pool-{pool_name}"] = {'label': f"Pool: {pool_name} ({len(members)} proxies)",
+                                               # Anything that doesn't know about pools just uses the first one
+                                               'url': proxy_list[members[0]]['url'],
+                                               'members': members}
+
         if proxy_list and strtobool(os.getenv('ENABLE_NO_PROXY_OPTION', 'True')):
             proxy_list["no-proxy"] = {'label': "No proxy", 'url': ''}
 
@@ -533,14 +650,14 @@ class ChangeDetectionStore:
         return headers
 
     def get_all_headers_in_textfile_for_watch(self, uuid):
-        from .model.App import parse_headers_from_text_file
+        from ..model.App import parse_headers_from_text_file
         headers = {}
 
+        # All of these are only read again when they change, see config_files.py
         # Global in /datastore/headers.txt
         filepath = os.path.join(self.datastore_path, 'headers.txt')
         try:
-            if os.path.isfile(filepath):
-                headers.update(parse_headers_from_text_file(filepath))
+            headers.update(config_file_cache.get(filepath, parse_headers_from_text_file) or {})
         except Exception as e:
             logger.error(f"ERROR reading headers.txt at {filepath} {str(e)}")
 
@@ -550,8 +667,7 @@ class ChangeDetectionStore:
             # In /datastore/xyz-xyz/headers.txt
             filepath = os.path.join(watch.watch_data_dir, 'headers.txt')
             try:
-                if os.path.isfile(filepath):
-                    headers.update(parse_headers_from_text_file(filepath))
+                headers.update(config_file_cache.get(filepath, parse_headers_from_text_file) or {})
             except Exception as e:
                 logger.error(f"ERROR reading headers.txt at {filepath} {str(e)}")
 
@@ -561,8 +677,7 @@ class ChangeDetectionStore:
                 fname = "headers-"+re.sub(r'[\W_]', '', tag.get('title')).lower().strip() + ".txt"
                 filepath = os.path.join(self.datastore_path, fname)
                 try:
-                    if os.path.isfile(filepath):
-                        headers.update(parse_headers_from_text_file(filepath))
+                    headers.update(config_file_cache.get(filepath, parse_headers_from_text_file) or {})
                 except Exception as e:
                     logger.error(f"ERROR reading headers.txt at {filepath} {str(e)}")
 
@@ -594,7 +709,7 @@ class ChangeDetectionStore:
         # Eventually almost everything todo with a watch will apply as a Tag
         # So we use the same model as a Watch
         with self.lock:
-            from .model import Tag
+            from ..model import Tag
             new_tag = Tag.model(datastore_path=self.datastore_path, default={
                 'title': title.strip(),
                 'date_created': int(time.time())
@@ -604,6 +719,7 @@ class ChangeDetectionStore:
 
             self.__data['settings']['application']['tags'][new_uuid] = new_tag
 
+        self.needs_write = True
         return new_uuid
 
     def get_all_tags_for_watch(self, uuid):
@@ -629,17 +745,24 @@ class ChangeDetectionStore:
         return res
 
     def tag_exists_by_name(self, tag_name):
+        tag_name = tag_name.lower()
+        tags = self.__data['settings']['application']['tags']
+
+        # Remembered from last time, but tags can be renamed or removed so check it still matches
+        tag = tags.get(self.__tag_uuids_by_title.get(tag_name))
+        if tag and tag.get('title', '').lower() == tag_name:
+            return tag
+
         # Check if any tag dictionary has a 'title' attribute matching the provided tag_name
-        tags = self.__data['settings']['application']['tags'].values()
-        return next((v for v in tags if v.get('title', '').lower() == tag_name.lower()),
-                    None)
+        tag = next((v for v in tags.values() if v.get('title', '').lower() == tag_name), None)
+        if tag:
+            self.__tag_uuids_by_title[tag_name] = tag.get('uuid')
+        return tag
 
     def any_watches_have_processor_by_name(self, processor_name):
-        for watch in self.data['watching'].values():
-            if watch.get('processor') == processor_name:
-                return True
-        return False
-        
+        return bool(self.__verified_watch_uuids(self.__get_index().uuids_with_processor(processor_name),
+                                                lambda watch: watch.get('processor') == processor_name))
+
     def search_watches_for_url(self, query, tag_limit=None, partial=False):
         """Search watches by URL, title, or error messages
         
@@ -654,12 +777,22 @@ class ChangeDetectionStore:
         matching_uuids = []
         query = query.lower().strip()
         tag = self.tag_exists_by_name(tag_limit) if tag_limit else False
+        if tag_limit and not tag:
+            return matching_uuids
+
+        if tag_limit:
+            candidates = self.get_watch_uuids_with_tag(tag.get('uuid'))
+        elif not partial:
+            # Exact matches can come straight from the index, only the (few) errored watches need to be looked at
+            index = self.__get_index()
+            candidates = dict.fromkeys(index.uuids_with_url(query) + index.uuids_with_title(query) + index.errored_uuids())
+        else:
+            candidates = list(self.data['watching'].keys())
 
-        for uuid, watch in self.data['watching'].items():
-            # Filter by tag if requested
-            if tag_limit:
-                if not tag.get('uuid') in watch.get('tags', []):
-                    continue
+        for uuid in candidates:
+            watch = self.data['watching'].get(uuid)
+            if watch is None:
+                continue
 
             # Search in URL, title, or error messages
             if partial:
@@ -703,10 +836,10 @@ class ChangeDetectionStore:
 
 
     def get_updates_available(self):
-        import inspect
         updates_available = []
-        for i, o in inspect.getmembers(self, predicate=inspect.ismethod):
-            m = re.search(r'update_(\d+)$', i)
+        # Look at the class, inspect.getmembers(self) would evaluate every property (unread_changes_count reads every watch)
+        for i in dir(type(self)):
+            m = re.search(r'^update_(\d+)$', i)
             if m:
                 updates_available.append(int(m.group(1)))
         updates_available.sort()
@@ -724,8 +857,7 @@ class ChangeDetectionStore:
             if update_n > self.__data['settings']['application']['schema_version']:
                 logger.critical(f"Applying update_{update_n}")
                 # Wont exist on fresh installs
-                if os.path.exists(self.json_store_path):
-                    shutil.copyfile(self.json_store_path, os.path.join(self.datastore_path, f"url-watches-before-{update_n}.json"))
+                self.backend.snapshot_before_update(self.__data, os.path.join(self.datastore_path, f"url-watches-before-{update_n}.json"))
 
                 try:
                     update_method = getattr(self, f"update_{update_n}")()
@@ -0,0 +1,328 @@
+"""
+Persistence backends for the ChangeDetectionStore
+
+The datastore keeps everything in memory (see model/App.py), a backend is only responsible for getting that
+structure onto the disk and back again.
+
+- `json`   - The original single `url-watches.json` file, rewritten in full when compacted, in between only the
+             watches that changed are appended to `url-watches.journal` which is replayed on startup.
+- `sqlite` - `url-watches.db` in WAL mode, one row per watch and per tag, only the rows that changed are written.
+
+Set with the `DATASTORE_BACKEND` env var, `json` is the default.
+"""
+
+from changedetectionio.strtobool import strtobool
+from copy import deepcopy
+from loguru import logger
+import json
+import os
+import sqlite3
+import threading
+
+JSON_STORE_FILENAME = "url-watches.json"
+JSON_JOURNAL_FILENAME = "url-watches.journal"
+SQLITE_STORE_FILENAME = "url-watches.db"
+
+
+def write_json_atomic(data, path):
+    # Re #286  - First write to a temp file, then confirm it looks OK and rename it
+    # This is a fairly basic strategy to deal with the case that the file is corrupted,
+    # system was out of memory, out of RAM etc
+    with open(path + ".tmp", 'w') as json_file:
+        json.dump(data, json_file, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _dumps(obj, attempts=3):
+    """Serialize a single watch/tag, the worker threads can change it while we are reading it, so try a few times"""
+    for i in range(attempts):
+        try:
+            return json.dumps(obj)
+        except RuntimeError as e:
+            if i == attempts - 1:
+                raise
+            logger.warning(f"Data changed while serializing, trying again.. {str(e)}")
+
+
+class DatastoreBackend:
+    """Base class, every backend must be able to load and save the whole datastore structure"""
+    name = None
+
+    def __init__(self, datastore_path):
+        self.datastore_path = datastore_path
+
+    @property
+    def exists(self):
+        raise NotImplementedError
+
+    def load(self):
+        """
+        Return the stored structure in the same layout as url-watches.json
+        :raises FileNotFoundError: when nothing has been stored yet
+        """
+        raise NotImplementedError
+
+    def save_all(self, data):
+        raise NotImplementedError
+
+    def save_watches(self, data, uuids, deleted_uuids):
+        """Write only the watches listed in `uuids` and remove `deleted_uuids`, backends that can't do this rewrite everything"""
+        self.save_all(data)
+
+    def export_json(self, data, path):
+        """Export in the url-watches.json layout, used by backups so they can be restored on any backend"""
+        write_json_atomic(deepcopy(data), path)
+
+    def snapshot_before_update(self, data, path):
+        """Keep a copy of the datastore before a schema update runs"""
+        if self.exists:
+            self.export_json(data, path)
+
+    def close(self):
+        pass
+
+
+class JSONFileBackend(DatastoreBackend):
+    """
+    url-watches.json is the compacted snapshot, changed watches are appended to url-watches.journal as one JSON
+    line each, the first line of the journal records which snapshot it belongs to so that a journal left over from
+    an older snapshot (crash during compaction, restored backup) is never replayed on top of a newer one.
+    """
+    name = 'json'
+
+    def __init__(self, datastore_path):
+        super().__init__(datastore_path)
+        self.json_store_path = os.path.join(datastore_path, JSON_STORE_FILENAME)
+        self.journal_path = os.path.join(datastore_path, JSON_JOURNAL_FILENAME)
+        self.journal_enabled = strtobool(os.getenv('DATASTORE_JOURNAL', 'True'))
+        # Compact early when the journal gets this big, otherwise it happens on the datastore full sync interval
+        self.journal_max_bytes = int(os.getenv('DATASTORE_JOURNAL_MAX_MB', 50)) * 1024 * 1024
+
+    @property
+    def exists(self):
+        return os.path.isfile(self.json_store_path)
+
+    def _snapshot_id(self):
+        # write_json_atomic() always renames a new file into place, so the inode changes on every snapshot
+        stat = os.stat(self.json_store_path)
+        return f"{stat.st_ino}-{stat.st_mtime_ns}-{stat.st_size}"
+
+    def load(self):
+        # @todo retest with ", encoding='utf-8'"
+        with open(self.json_store_path) as json_file:
+            data = json.load(json_file)
+
+        self._replay_journal(data)
+        return data
+
+    def _replay_journal(self, data):
+        if not os.path.isfile(self.journal_path):
+            return
+
+        with open(self.journal_path) as f:
+            lines = f.readlines()
+
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except ValueError:
+            header = {}
+
+        if header.get('snapshot') != self._snapshot_id():
+            logger.warning(f"Journal {self.journal_path} does not belong to the current {JSON_STORE_FILENAME}, ignoring it")
+            os.unlink(self.journal_path)
+            return
+
+        watching = data.setdefault('watching', {})
+        replayed = 0
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Last line was only partly written when we stopped, everything before it is good
+                logger.warning(f"Journal {self.journal_path} has a damaged entry, stopping replay there")
+                break
+
+            if entry.get('op') == 'delete':
+                watching.pop(entry['uuid'], None)
+            else:
+                watching[entry['uuid']] = entry['data']
+            replayed += 1
+
+        logger.info(f"Replayed {replayed} changes from {self.journal_path}")
+
+    def save_all(self, data):
+        # RuntimeError from deepcopy() (data changed while copying) is handled by the caller
+        write_json_atomic(deepcopy(data), self.json_store_path)
+        # Everything in the journal is now in the snapshot
+        if os.path.isfile(self.journal_path):
+            os.unlink(self.journal_path)
+
+    def save_watches(self, data, uuids, deleted_uuids):
+        if not self.journal_enabled or not self.exists:
+            return self.save_all(data)
+
+        journal_exists = os.path.isfile(self.journal_path)
+        if journal_exists and os.path.getsize(self.journal_path) > self.journal_max_bytes:
+            logger.info(f"Journal is over {self.journal_max_bytes} bytes, compacting")
+            return self.save_all(data)
+
+        watching = data.get('watching', {})
+        lines = []
+        for uuid in uuids:
+            watch = watching.get(uuid)
+            if watch is not None:
+                # Already serialized by _dumps(), no need to decode it again just to wrap it
+                lines.append(f'{{"op": "put", "uuid": {json.dumps(uuid)}, "data": {_dumps(watch)}}}')
+        for uuid in deleted_uuids:
+            lines.append(json.dumps({'op': 'delete', 'uuid': uuid}))
+
+        if not lines:
+            return
+
+        with open(self.journal_path, 'a') as f:
+            if not journal_exists:
+                f.write(json.dumps({'snapshot': self._snapshot_id()}) + "\n")
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        logger.debug(f"Journaled {len(lines)} watch changes")
+
+
+class SQLiteBackend(DatastoreBackend):
+    name = 'sqlite'
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS app (key TEXT PRIMARY KEY, data TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS tags (uuid TEXT PRIMARY KEY, data TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS watches (uuid TEXT PRIMARY KEY, data TEXT NOT NULL);
+    """
+
+    def __init__(self, datastore_path):
+        super().__init__(datastore_path)
+        self.db_path = os.path.join(datastore_path, SQLITE_STORE_FILENAME)
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # The connection is opened again on first use
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def exists(self):
+        return os.path.isfile(self.db_path)
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            # Saves run in the datastore thread, loading/exporting can happen elsewhere, access is protected by self._lock
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+        return self._conn
+
+    def load(self):
+        if not self.exists:
+            # First time on this backend, import any existing url-watches.json
+            json_backend = JSONFileBackend(self.datastore_path)
+            from_disk = json_backend.load()
+            logger.critical(f"Importing {json_backend.json_store_path} into {self.db_path}")
+            self.save_all(from_disk)
+            return from_disk
+
+        with self._lock:
+            data = {key: json.loads(value) for key, value in self.conn.execute("SELECT key, data FROM app")}
+            data.setdefault('settings', {}).setdefault('application', {})['tags'] = {
+                uuid: json.loads(value) for uuid, value in self.conn.execute("SELECT uuid, data FROM tags")
+            }
+            data['watching'] = {uuid: json.loads(value) for uuid, value in self.conn.execute("SELECT uuid, data FROM watches")}
+
+        return data
+
+    def _app_rows(self, data):
+        rows = []
+        for key, value in data.items():
+            if key == 'watching':
+                continue
+            if key == 'settings':
+                # Tags have their own table
+                value = dict(value)
+                value['application'] = {k: v for k, v in value.get('application', {}).items() if k != 'tags'}
+            rows.append((key, _dumps(value)))
+        return rows
+
+    def _replace_table(self, table, items):
+        self.conn.executemany(f"INSERT OR REPLACE INTO {table} (uuid, data) VALUES (?, ?)",
+                              ((uuid, _dumps(item)) for uuid, item in items.items()))
+        existing = {row[0] for row in self.conn.execute(f"SELECT uuid FROM {table}")}
+        removed = existing - set(items.keys())
+        if removed:
+            self.conn.executemany(f"DELETE FROM {table} WHERE uuid = ?", ((uuid,) for uuid in removed))
+
+    def save_all(self, data):
+        # dict.items() so that watches that were not used yet are written as they are, without hydrating them
+        watches = dict(dict.items(data.get('watching', {})))
+        tags = dict(data.get('settings', {}).get('application', {}).get('tags', {}))
+
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany("INSERT OR REPLACE INTO app (key, data) VALUES (?, ?)", self._app_rows(data))
+                self._replace_table('tags', tags)
+                self._replace_table('watches', watches)
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def save_watches(self, data, uuids, deleted_uuids):
+        watching = data.get('watching', {})
+        rows = []
+        for uuid in uuids:
+            watch = watching.get(uuid)
+            if watch is not None:
+                rows.append((uuid, _dumps(watch)))
+
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                if rows:
+                    self.conn.executemany("INSERT OR REPLACE INTO watches (uuid, data) VALUES (?, ?)", rows)
+                if deleted_uuids:
+                    self.conn.executemany("DELETE FROM watches WHERE uuid = ?", ((uuid,) for uuid in deleted_uuids))
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+        logger.debug(f"Saved {len(rows)} watches, removed {len(deleted_uuids)} watches")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+available_backends = {
+    JSONFileBackend.name: JSONFileBackend,
+    SQLiteBackend.name: SQLiteBackend,
+}
+
+
+def get_backend(name, datastore_path):
+    name = (name or JSONFileBackend.name).strip().lower()
+    backend_class = available_backends.get(name)
+    if not backend_class:
+        logger.critical(f"Unknown DATASTORE_BACKEND '{name}', using '{JSONFileBackend.name}'")
+        backend_class = JSONFileBackend
+
+    return backend_class(datastore_path)
@@ -0,0 +1,68 @@
+"""
+Cache of the parsed config files in the datastore directory (proxies.json, headers.txt, per-watch and per-tag headers)
+
+These are looked at several times for every check, each file is only read and parsed again when its modification time
+or size changes, otherwise (and when there is no such file) it costs a stat() call.
+"""
+
+from threading import Lock
+import json
+import os
+
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+class ConfigFileCache:
+
+    def __init__(self):
+        # (path, parser) -> ((mtime_ns, size), parsed result)
+        self._items = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.reads = 0
+        self.missing = 0
+
+    def get(self, path, parser):
+        """
+        :param parser: Called with the path to read and parse it, exceptions are passed on and nothing is cached
+        :return: What parser returned, the same object every time until the file changes, None when there is no file
+        """
+        try:
+            st = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            with self._lock:
+                self._items.pop((path, parser), None)
+                self.missing += 1
+            return None
+
+        file_key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            item = self._items.get((path, parser))
+            if item is not None and item[0] == file_key:
+                self.hits += 1
+                return item[1]
+
+        parsed = parser(path)
+        with self._lock:
+            self._items[(path, parser)] = (file_key, parsed)
+            self.reads += 1
+        return parsed
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'files': len(self._items),
+                'hits': self.hits,
+                'reads': self.reads,
+                'missing': self.missing,
+            }
+
+
+config_file_cache = ConfigFileCache()
@@ -0,0 +1,122 @@
+from threading import RLock
+
+
+def normalize_url(url):
+    return (url or '').strip().lower()
+
+
+class WatchIndex:
+    """
+    Secondary indexes over `data['watching']` - tag, normalized URL and title, errored watches and processor.
+
+    Kept up to date by the datastore whenever it is told about a change (add_watch(), update_watch(),
+    mark_watch_dirty(), delete()) and rebuilt on every full save, which also catches anything that changed a watch
+    without telling the datastore. Lookups only return candidates, callers should still check the watch itself.
+
+    The "sets" are dicts so that results keep the same order the watches were added in.
+    """
+
+    def __init__(self):
+        self._lock = RLock()
+        self._indexed = None
+        self._entries = {}
+        self.by_tag = {}
+        self.by_url = {}
+        self.by_title = {}
+        self.by_processor = {}
+        self.errored = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = RLock()
+
+    @staticmethod
+    def _keys_for(watch):
+        tags = watch.get('tags') or []
+        if isinstance(tags, str):
+            tags = []
+        return (normalize_url(watch.get('url')),
+                (watch.get('title') or '').lower(),
+                tuple(tags),
+                bool(watch.get('last_error')),
+                watch.get('processor') or 'text_json_diff')
+
+    def _add(self, uuid, keys):
+        url, title, tags, errored, processor = keys
+        self.by_url.setdefault(url, {})[uuid] = None
+        if title:
+            self.by_title.setdefault(title, {})[uuid] = None
+        for tag_uuid in tags:
+            self.by_tag.setdefault(tag_uuid, {})[uuid] = None
+        if errored:
+            self.errored[uuid] = None
+        self.by_processor.setdefault(processor, {})[uuid] = None
+        self._entries[uuid] = keys
+
+    def _remove(self, uuid):
+        keys = self._entries.pop(uuid, None)
+        if not keys:
+            return
+        url, title, tags, errored, processor = keys
+        for index, key in [(self.by_url, url), (self.by_title, title), (self.by_processor, processor)] + [(self.by_tag, t) for t in tags]:
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.pop(uuid, None)
+                if not bucket:
+                    del index[key]
+        self.errored.pop(uuid, None)
+
+    def rebuild(self, watching):
+        with self._lock:
+            self._entries = {}
+            self.by_tag = {}
+            self.by_url = {}
+            self.by_title = {}
+            self.by_processor = {}
+            self.errored = {}
+            # dict.items() reads watches that were not hydrated yet as they are
+            for uuid, watch in list(dict.items(watching)):
+                self._add(uuid, self._keys_for(watch))
+            self._indexed = watching
+
+    def ensure(self, watching):
+        """The whole `watching` dict can be replaced (delete all, tests), start over when that happens"""
+        if self._indexed is not watching:
+            self.rebuild(watching)
+
+    def update(self, uuid, watch):
+        with self._lock:
+            keys = self._keys_for(watch)
+            if self._entries.get(uuid) == keys:
+                return
+            self._remove(uuid)
+            self._add(uuid, keys)
+
+    def remove(self, uuid):
+        with self._lock:
+            self._remove(uuid)
+
+    def uuids_with_tag(self, tag_uuid):
+        with self._lock:
+            return list(self.by_tag.get(tag_uuid, {}))
+
+    def uuids_with_url(self, url):
+        with self._lock:
+            return list(self.by_url.get(normalize_url(url), {}))
+
+    def uuids_with_title(self, title):
+        with self._lock:
+            return list(self.by_title.get((title or '').lower(), {}))
+
+    def uuids_with_processor(self, processor):
+        with self._lock:
+            return list(self.by_processor.get(processor, {}))
+
+    def errored_uuids(self):
+        with self._lock:
+            return list(self.errored)
@@ -0,0 +1,91 @@
+from copy import deepcopy
+from threading import Lock
+
+
+class LazyEntityDict(dict):
+    """
+    The `watching` dict, but the watches loaded from disk stay as plain dicts until they are first accessed,
+    then they are converted with `hydrate(uuid, raw_dict)` (ChangeDetectionStore.rehydrate_entity) and kept.
+
+    Startup only has to read the datastore, the cost of building every Watch.model is spread over the first
+    access of each watch instead.
+    Membership, len() and iterating the keys never hydrate anything.
+    """
+
+    def __init__(self, hydrate):
+        super().__init__()
+        self._hydrate = hydrate
+        self._pending = set()
+        self._hydrate_lock = Lock()
+
+    def load_raw(self, entities):
+        """Add entities exactly as they were stored, they are hydrated on first access"""
+        dict.update(self, entities)
+        self._pending.update(entities.keys())
+
+    @property
+    def pending_count(self):
+        return len(self._pending)
+
+    def _hydrated(self, uuid):
+        with self._hydrate_lock:
+            # Another thread could have done it while we waited
+            if uuid in self._pending:
+                dict.__setitem__(self, uuid, self._hydrate(uuid, dict.__getitem__(self, uuid)))
+                self._pending.discard(uuid)
+            return dict.__getitem__(self, uuid)
+
+    def __getitem__(self, uuid):
+        if uuid in self._pending:
+            return self._hydrated(uuid)
+        return dict.__getitem__(self, uuid)
+
+    def get(self, uuid, default=None):
+        if uuid in self:
+            return self[uuid]
+        return default
+
+    def __setitem__(self, uuid, value):
+        self._pending.discard(uuid)
+        dict.__setitem__(self, uuid, value)
+
+    def __delitem__(self, uuid):
+        self._pending.discard(uuid)
+        dict.__delitem__(self, uuid)
+
+    def pop(self, uuid, *args):
+        self._pending.discard(uuid)
+        return dict.pop(self, uuid, *args)
+
+    def clear(self):
+        self._pending.clear()
+        dict.clear(self)
+
+    def update(self, *args, **kwargs):
+        for uuid, value in dict(*args, **kwargs).items():
+            self[uuid] = value
+
+    def setdefault(self, uuid, default=None):
+        if uuid not in self:
+            self[uuid] = default
+        return self[uuid]
+
+    def __iter__(self):
+        # Overriding __iter__ also makes dict(this) go through keys()/__getitem__ instead of copying the raw values
+        return dict.__iter__(self)
+
+    def values(self):
+        return [self[uuid] for uuid in list(dict.keys(self))]
+
+    def items(self):
+        return [(uuid, self[uuid]) for uuid in list(dict.keys(self))]
+
+    def copy(self):
+        return dict(self.items())
+
+    def __deepcopy__(self, memo):
+        # Saving doesn't need Watch objects, the raw dicts are written exactly as they were loaded
+        return {uuid: deepcopy(value, memo) for uuid, value in list(dict.items(self))}
+
+    def __reduce__(self):
+        return (dict, (self.copy(),))
@@ -383,6 +383,14 @@ def test_api_watch_PUT_update(client, live_server, measure_memory_usage):
     # Message will come from `flask_expects_json`
     assert b'Additional properties are not allowed' in res.data
 
+    # Learnt by the scheduler, read only
+    res = client.put(
+        url_for("watch", uuid=watch_uuid),
+        headers={'x-api-key': api_key, 'content-type': 'application/json'},
+        data=json.dumps({"recheck_adaptive_seconds": 5}),
+    )
+    assert res.status_code == 400, "Should get error 400 when writing a read only field"
+
     # Cleanup everything
     delete_all_watches(client)
 
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_adaptive_recheck
+
+import unittest
+
+from changedetectionio import adaptive_recheck
+
+HOUR = 3600
+DAY = 86400
+
+
+class TestAdaptiveRecheck(unittest.TestCase):
+
+    def estimate(self, timestamps, ratio, current, now):
+        return adaptive_recheck.estimate_interval(change_timestamps=timestamps,
+                                                  change_ratio=ratio,
+                                                  current_seconds=current,
+                                                  minimum_seconds=5 * 60,
+                                                  maximum_seconds=7 * DAY,
+                                                  now=now)
+
+    def test_change_ratio(self):
+        self.assertEqual(adaptive_recheck.update_change_ratio(None, True), 1.0)
+        self.assertEqual(adaptive_recheck.update_change_ratio(None, False), 0.0)
+        self.assertAlmostEqual(adaptive_recheck.update_change_ratio(0.5, False), 0.4)
+        self.assertAlmostEqual(adaptive_recheck.update_change_ratio(0.5, True), 0.6)
+
+    def test_quiet_page_stretches(self):
+        # Changed a few times a year ago, nothing since
+        timestamps = [0, 30 * DAY, 60 * DAY]
+        now = 400 * DAY
+        interval = self.estimate(timestamps, ratio=0.0, current=3 * HOUR, now=now)
+        # Grows, but only doubles at a time
+        self.assertEqual(interval, 6 * HOUR)
+        for i in range(20):
+            interval = self.estimate(timestamps, ratio=0.0, current=interval, now=now)
+        self.assertEqual(interval, 7 * DAY)
+
+    def test_busy_page_shrinks(self):
+        # Changes every hour and every check finds a change
+        timestamps = [i * HOUR for i in range(20)]
+        interval = self.estimate(timestamps, ratio=1.0, current=3 * HOUR, now=19 * HOUR + 60)
+        self.assertLessEqual(interval, 30 * 60)
+
+        # Can't go below the minimum
+        timestamps = [i * 60 for i in range(20)]
+        self.assertEqual(self.estimate(timestamps, ratio=1.0, current=600, now=19 * 60), 5 * 60)
+
+    def test_not_enough_to_learn_from(self):
+        self.assertEqual(self.estimate([], ratio=None, current=3 * HOUR, now=0), 3 * HOUR)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_conditional_requests
+
+import asyncio
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from changedetectionio import conditional_requests
+from changedetectionio.processors import processing_config_revision
+from changedetectionio.processors.text_json_diff.processor import perform_site_check
+from changedetectionio.store import ChangeDetectionStore
+
+
+class ETagHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    seen_if_none_match = []
+
+    def do_GET(self):
+        self.seen_if_none_match.append(self.headers.get('If-None-Match'))
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.send_header('ETag', '"v1"')
+            self.end_headers()
+            return
+        body = b'<html><head><title>Hello</title></head><body>hello</body></html>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', '"v1"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestConditionalRequests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), ETagHandler)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/page"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        ETagHandler.seen_if_none_match.clear()
+        self.test_datastore_path = tempfile.mkdtemp()
+        self.store = ChangeDetectionStore(datastore_path=self.test_datastore_path, include_default_watches=False)
+        self.store.data['settings']['application']['fetch_backend'] = 'html_requests'
+        self.uuid = self.store.add_watch(url=self.url)
+
+    def tearDown(self):
+        self.store.stop_thread = True
+        time.sleep(0.5)
+        shutil.rmtree(self.test_datastore_path)
+
+    def check(self):
+        handler = perform_site_check(datastore=self.store, watch_uuid=self.uuid)
+        asyncio.run(handler.call_browser())
+        return handler
+
+    def test_not_modified_skips_processing(self):
+        watch = self.store.data['watching'][self.uuid]
+
+        handler = self.check()
+        self.assertFalse(handler.fetcher.not_modified)
+        changed_detected, update_obj, contents = handler.run_changedetection(watch=watch)
+        update_obj.update(conditional_requests.update_for_check(watch, self.store, handler.fetcher))
+        self.assertEqual(update_obj['http_etag'], '"v1"')
+        self.store.update_watch(uuid=self.uuid, update_obj=update_obj)
+        watch.save_history_text(contents=contents, timestamp=int(time.time()), snapshot_id=update_obj['previous_md5'])
+
+        handler = self.check()
+        self.assertEqual(ETagHandler.seen_if_none_match, [None, '"v1"'])
+        self.assertTrue(handler.fetcher.not_modified)
+        self.assertEqual(handler.fetcher.status_code, 304)
+        self.assertIsNone(handler.fetcher.content)
+        self.assertEqual(conditional_requests.update_for_check(watch, self.store, handler.fetcher), {'conditional_hits': 1})
+
+        # Different filters, the old reply says nothing about the new result
+        self.store.update_watch(uuid=self.uuid, update_obj={'include_filters': ['body']})
+        handler = self.check()
+        self.assertEqual(ETagHandler.seen_if_none_match[-1], None)
+        self.assertFalse(handler.fetcher.not_modified)
+
+    def test_config_revision_ignores_state(self):
+        watch = self.store.data['watching'][self.uuid]
+        revision = processing_config_revision(watch, self.store)
+        self.store.update_watch(uuid=self.uuid, update_obj={'last_checked': 123, 'check_count': 5, 'previous_md5': 'abc'})
+        self.assertEqual(processing_config_revision(watch, self.store), revision)
+        self.store.update_watch(uuid=self.uuid, update_obj={'ignore_text': ['price']})
+        self.assertNotEqual(processing_config_revision(watch, self.store), revision)
+
+
+if __name__ == '__main__':
+    unittest.main()
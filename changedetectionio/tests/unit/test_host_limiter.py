@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_host_limiter
+
+import unittest
+
+from changedetectionio.host_limiter import HostLimiter, host_for_url, limits_for_watch
+
+
+class FakeDatastore:
+    def __init__(self, requests, tags):
+        self.data = {'settings': {'requests': requests, 'application': {'tags': tags}}}
+
+
+class TestHostLimiter(unittest.TestCase):
+
+    def test_in_flight(self):
+        limiter = HostLimiter()
+        self.assertEqual(limiter.try_acquire('shop.com', max_in_flight=2), 0)
+        self.assertEqual(limiter.try_acquire('shop.com', max_in_flight=2), 0)
+        self.assertGreater(limiter.try_acquire('shop.com', max_in_flight=2), 0)
+        # Other hosts carry on
+        self.assertEqual(limiter.try_acquire('other.com', max_in_flight=2), 0)
+
+        limiter.release('shop.com')
+        self.assertEqual(limiter.try_acquire('shop.com', max_in_flight=2), 0)
+        self.assertEqual(limiter.stats()['in_flight'], {'shop.com': 2, 'other.com': 1})
+        self.assertEqual(limiter.stats()['most_deferred_hosts'], {'shop.com': 1})
+
+    def test_token_bucket(self):
+        limiter = HostLimiter()
+        # 6 per minute, one every 10 seconds
+        self.assertEqual(limiter.try_acquire('shop.com', per_minute=6, now=1000), 0)
+        limiter.release('shop.com')
+        wait = limiter.try_acquire('shop.com', per_minute=6, now=1001)
+        self.assertAlmostEqual(wait, 9.0, places=3)
+        self.assertEqual(limiter.try_acquire('shop.com', per_minute=6, now=1010), 0)
+
+        # No limits, nothing to release
+        self.assertEqual(limiter.try_acquire('shop.com'), 0)
+        self.assertEqual(limiter.try_acquire('', per_minute=1), 0)
+
+    def test_waiting_watches_are_staggered(self):
+        limiter = HostLimiter()
+        self.assertEqual(limiter.try_acquire('shop.com', per_minute=6, now=1000, uuid='a'), 0)
+        limiter.release('shop.com')
+
+        # Each gets its own slot, 10 seconds apart
+        waits = [limiter.try_acquire('shop.com', per_minute=6, now=1001, uuid=uuid) for uuid in ('b', 'c', 'd')]
+        for wait, expected in zip(waits, (9.0, 19.0, 29.0)):
+            self.assertAlmostEqual(wait, expected, places=3)
+        self.assertEqual(limiter.stats()['reserved'], 3)
+
+        # Back too early, still waiting for its slot
+        self.assertAlmostEqual(limiter.try_acquire('shop.com', per_minute=6, now=1015, uuid='c'), 5.0, places=3)
+        # On time it goes ahead without taking another slot
+        self.assertEqual(limiter.try_acquire('shop.com', per_minute=6, now=1010, uuid='b'), 0)
+        self.assertEqual(limiter.try_acquire('shop.com', per_minute=6, now=1020, uuid='c'), 0)
+        self.assertEqual(limiter.try_acquire('shop.com', per_minute=6, now=1030, uuid='d'), 0)
+        self.assertEqual(limiter.stats()['reserved'], 0)
+        # A new one waits behind them
+        self.assertAlmostEqual(limiter.try_acquire('shop.com', per_minute=6, now=1031, uuid='e'), 9.0, places=3)
+
+    def test_unused_token_goes_back(self):
+        limiter = HostLimiter()
+        self.assertEqual(limiter.try_acquire('shop.com', per_minute=6, now=1000, uuid='a'), 0)
+        # No proxy was free after all
+        limiter.release('shop.com', unused=True)
+        self.assertEqual(limiter.try_acquire('shop.com', per_minute=6, now=1001, uuid='b'), 0)
+
+    def test_in_flight_retries_are_spread(self):
+        limiter = HostLimiter()
+        self.assertEqual(limiter.try_acquire('shop.com', max_in_flight=1, now=1000), 0)
+        waits = [limiter.try_acquire('shop.com', max_in_flight=1, now=1000) for i in range(3)]
+        self.assertEqual(waits, [1.0, 2.0, 3.0])
+
+    def test_limits_from_settings_and_tags(self):
+        datastore = FakeDatastore(requests={'host_requests_per_minute': 60, 'host_max_in_flight': 0},
+                                  tags={'t1': {'host_requests_per_minute': 10, 'host_max_in_flight': None},
+                                        't2': {'host_requests_per_minute': 5, 'host_max_in_flight': 2}})
+        self.assertEqual(limits_for_watch(datastore, {'tags': []}), (60, 0))
+        self.assertEqual(limits_for_watch(datastore, {'tags': ['t1']}), (10, 0))
+        # Strictest of the tags
+        self.assertEqual(limits_for_watch(datastore, {'tags': ['t1', 't2', 'gone']}), (5, 2))
+
+        self.assertEqual(host_for_url('https://Shop.com:8080/product/1'), 'shop.com')
+        self.assertEqual(host_for_url('not a url'), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_playwright_pool
+
+import asyncio
+import unittest
+
+from changedetectionio.content_fetchers.exceptions import Non200ErrorCodeReceived
+from changedetectionio.content_fetchers.playwright_pool import PlaywrightPool
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+
+    def is_connected(self):
+        return self.connected
+
+    async def close(self):
+        self.closed = True
+
+
+class FakePool(PlaywrightPool):
+    """Hands out fake browsers, no Playwright needed"""
+
+    def __init__(self):
+        super().__init__()
+        self.enabled = True
+        self.browsers = []
+
+    async def _connect(self, browser_type, connection_url):
+        await asyncio.sleep(0)
+        self.browsers.append(FakeBrowser())
+        return self.browsers[-1]
+
+
+class TestPlaywrightPool(unittest.TestCase):
+
+    def test_connections_are_reused_and_recycled(self):
+        pool = FakePool()
+        pool.max_uses = 3
+
+        async def check(url='ws://browser:3000', proxy=None):
+            async with pool.browser('chromium', url, proxy=proxy) as browser:
+                return browser
+
+        async def run():
+            first = [await check() for i in range(3)]
+            self.assertIs(first[0], first[2])
+            # Used up, closed and replaced
+            self.assertTrue(first[0].closed)
+            self.assertIsNot(await check(), first[0])
+
+            # Another proxy, another connection
+            self.assertIsNot(await check(proxy={'server': 'http://proxy:3128'}), pool.browsers[1])
+
+            # Errors from the browser replace it, a non 200 reply doesn't
+            with self.assertRaises(Non200ErrorCodeReceived):
+                async with pool.browser('chromium', 'ws://browser:3000') as browser:
+                    raise Non200ErrorCodeReceived(url='https://example.com', status_code=500)
+            self.assertFalse(browser.closed)
+            with self.assertRaises(RuntimeError):
+                async with pool.browser('chromium', 'ws://browser:3000') as browser:
+                    raise RuntimeError("Target page, context or browser has been closed")
+            self.assertTrue(browser.closed)
+
+            # Disconnected on its own
+            browser = await check()
+            browser.connected = False
+            self.assertIsNot(await check(), browser)
+
+        asyncio.run(run())
+        stats = pool.stats()
+        self.assertEqual(stats['connects'], len(pool.browsers))
+        self.assertEqual(stats['errors'], 1)
+        self.assertEqual(stats['pages_in_use'], 0)
+
+    def test_max_pages(self):
+        pool = FakePool()
+        pool.max_pages = 2
+        open_pages = []
+        most_open = []
+
+        async def check():
+            async with pool.browser('chromium', 'ws://browser:3000'):
+                open_pages.append(1)
+                most_open.append(len(open_pages))
+                await asyncio.sleep(0.05)
+                open_pages.pop()
+
+        async def run():
+            await asyncio.gather(*[check() for i in range(6)])
+
+        asyncio.run(run())
+        self.assertEqual(max(most_open), 2)
+        # All on the one connection
+        self.assertEqual(len(pool.browsers), 1)
+
+    def test_no_page_limit_by_default(self):
+        pool = FakePool()
+        self.assertEqual(pool.max_pages, 0)
+        open_pages = []
+        most_open = []
+
+        async def check():
+            async with pool.browser('chromium', 'ws://browser:3000'):
+                open_pages.append(1)
+                most_open.append(len(open_pages))
+                await asyncio.sleep(0.05)
+                open_pages.pop()
+
+        async def run():
+            await asyncio.gather(*[check() for i in range(12)])
+
+        asyncio.run(run())
+        self.assertEqual(max(most_open), 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_processing_pool
+
+import pickle
+import unittest
+from unittest import mock
+
+from changedetectionio.content_fetchers.base import Fetcher
+from changedetectionio.content_fetchers.exceptions import ReplyWithContentButNoText
+from changedetectionio.processing_pool import DatastoreSnapshot, ProcessingPool, pack_exception, unpack_exception
+from changedetectionio.processors.text_json_diff.processor import FilterNotFoundInResponse
+
+
+class FakeDatastore:
+    datastore_path = '/tmp'
+
+    def __init__(self):
+        self.data = {'settings': {'application': {'tags': {'t1': {'title': 'one', 'include_filters': ['#a']},
+                                                           't2': {'title': 'two', 'include_filters': ['#b']}}}},
+                     'watching': {'w1': {'uuid': 'w1', 'tags': ['t2', 'gone']},
+                                  'w2': {'uuid': 'w2', 'tags': []}}}
+
+
+class RecordingExecutor:
+    created = []
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.shutdown_with = None
+        RecordingExecutor.created.append(self)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shutdown_with = {'wait': wait, 'cancel_futures': cancel_futures}
+
+
+class TestProcessingPool(unittest.TestCase):
+
+    def _pool(self, native):
+        RecordingExecutor.created = []
+        pool = ProcessingPool()
+        pool.workers = 2
+        pool.max_tasks = 3
+        patches = [mock.patch('changedetectionio.processing_pool.ProcessPoolExecutor', RecordingExecutor),
+                   mock.patch('changedetectionio.processing_pool.NATIVE_MAX_TASKS_PER_CHILD', native)]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        return pool
+
+    def test_max_tasks_per_child_when_the_python_has_it(self):
+        pool = self._pool(native=True)
+        executors = {id(pool._get_executor()) for i in range(10)}
+        self.assertEqual(len(executors), 1)
+        self.assertEqual(RecordingExecutor.created[0].kwargs['max_tasks_per_child'], 3)
+
+    def test_replaced_by_hand_on_older_python(self):
+        pool = self._pool(native=False)
+        first = [pool._get_executor() for i in range(3)]
+        self.assertTrue(all(e is first[0] for e in first))
+        self.assertNotIn('max_tasks_per_child', first[0].kwargs)
+
+        second = pool._get_executor()
+        self.assertIsNot(second, first[0])
+        # What was still running in the old one gets to finish
+        self.assertEqual(first[0].shutdown_with, {'wait': False, 'cancel_futures': False})
+        self.assertIsNone(second.shutdown_with)
+        self.assertEqual(len(RecordingExecutor.created), 2)
+
+        # No limit, never replaced
+        pool = self._pool(native=False)
+        pool.max_tasks = 0
+        self.assertEqual(len({id(pool._get_executor()) for i in range(10)}), 1)
+
+    def test_snapshot_has_only_the_watch(self):
+        snapshot = pickle.loads(pickle.dumps(DatastoreSnapshot(FakeDatastore(), 'w1')))
+        self.assertEqual(list(snapshot.data['watching'].keys()), ['w1'])
+        self.assertEqual(snapshot.get_tag_overrides_for_watch(uuid='w1', attr='include_filters'), ['#b'])
+        self.assertEqual(snapshot.get_all_tags_for_watch(uuid='nope'), {})
+
+    def test_exceptions_come_back_with_the_screenshot(self):
+        fetcher = Fetcher()
+        fetcher.screenshot = b'screenshot'
+        fetcher.xpath_data = {'size_pos': []}
+
+        e = pickle.loads(pickle.dumps(pack_exception(FilterNotFoundInResponse(msg=['#nope']))))
+        e = unpack_exception(e, fetcher)
+        self.assertIsInstance(e, FilterNotFoundInResponse)
+        self.assertEqual(str(e), "['#nope']")
+        self.assertEqual(e.screenshot, b'screenshot')
+        self.assertEqual(e.xpath_data, {'size_pos': []})
+
+        e = unpack_exception(pack_exception(ReplyWithContentButNoText(status_code=200, url='http://x', has_filters=True)), fetcher)
+        self.assertIsInstance(e, ReplyWithContentButNoText)
+        self.assertEqual(e.status_code, 200)
+        self.assertTrue(e.has_filters)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_proxy_pool
+
+import unittest
+
+from changedetectionio.proxy_pool import ProxyPool, candidates_for_proxy, is_proxy_failure, pools_from_proxy_list
+from changedetectionio.content_fetchers import exceptions
+
+PROXY_LIST = {
+    'res-1': {'label': 'Residential 1', 'url': 'http://one:3128', 'pool': 'residential', 'max_concurrent': 1},
+    'res-2': {'label': 'Residential 2', 'url': 'http://two:3128', 'pool': 'residential', 'weight': 2},
+    'slow': {'label': 'Slow', 'url': 'http://slow:3128', 'reuse_time_minimum': 10},
+    'pool-residential': {'label': 'Pool: residential', 'url': 'http://one:3128', 'members': ['res-1', 'res-2']},
+}
+
+
+class TestProxyPool(unittest.TestCase):
+
+    def test_pools_and_candidates(self):
+        self.assertEqual(pools_from_proxy_list(PROXY_LIST), {'residential': ['res-1', 'res-2']})
+        self.assertEqual(candidates_for_proxy(PROXY_LIST, 'pool-residential'), ['res-1', 'res-2'])
+        self.assertEqual(candidates_for_proxy(PROXY_LIST, 'slow'), ['slow'])
+        self.assertEqual(candidates_for_proxy(PROXY_LIST, 'gone'), [])
+        self.assertEqual(candidates_for_proxy(None, 'slow'), [])
+
+    def test_least_loaded_and_caps(self):
+        pool = ProxyPool()
+        candidates = ['res-1', 'res-2']
+        first, _ = pool.acquire(PROXY_LIST, candidates, now=100)
+        second, _ = pool.acquire(PROXY_LIST, candidates, now=100)
+        self.assertEqual({first, second}, {'res-1', 'res-2'})
+
+        # res-1 is at its max_concurrent, res-2 has no limit and the most weight
+        self.assertEqual(pool.acquire(PROXY_LIST, candidates, now=100), ('res-2', 0))
+        pool.release('res-1', ok=True, latency=0.5)
+        self.assertEqual(pool.acquire(PROXY_LIST, candidates, now=100), ('res-1', 0))
+        self.assertEqual(pool.stats()['res-2']['in_flight'], 2)
+
+    def test_reuse_time_waits_instead_of_skipping(self):
+        pool = ProxyPool()
+        self.assertEqual(pool.acquire(PROXY_LIST, ['slow'], now=100), ('slow', 0))
+        pool.release('slow', ok=True, latency=1)
+        self.assertEqual(pool.acquire(PROXY_LIST, ['slow'], now=104), (None, 6))
+        self.assertEqual(pool.wait_time(PROXY_LIST, ['slow'], now=110), 0)
+
+    def test_failing_member_is_ejected(self):
+        pool = ProxyPool()
+        pool.eject_failures = 2
+        pool.eject_seconds = 60
+        for i in range(2):
+            pool.acquire(PROXY_LIST, ['res-1'], now=100)
+            pool.release('res-1', ok=False, now=100)
+        self.assertEqual(pool.stats()['res-1']['ejections'], 1)
+
+        # Only the healthy one is used now
+        for i in range(3):
+            proxy_id, _ = pool.acquire(PROXY_LIST, ['res-1', 'res-2'], now=110)
+            self.assertEqual(proxy_id, 'res-2')
+
+        # Used anyway when it's the only choice, fails again straight away and is ejected for longer
+        self.assertEqual(pool.acquire(PROXY_LIST, ['res-1'], now=161), ('res-1', 0))
+        pool.release('res-1', ok=False, now=161)
+        self.assertEqual(pool._proxies['res-1']['eject_seconds'], 120)
+
+        # Working again, back to normal
+        pool.acquire(PROXY_LIST, ['res-1'], now=300)
+        pool.release('res-1', ok=True, latency=0.2, now=300)
+        self.assertEqual(pool._proxies['res-1']['consecutive_failures'], 0)
+
+    def test_is_proxy_failure(self):
+        self.assertTrue(is_proxy_failure(Exception("Proxy connection failed")))
+        self.assertTrue(is_proxy_failure(exceptions.Non200ErrorCodeReceived(status_code=407, url='')))
+        self.assertFalse(is_proxy_failure(exceptions.Non200ErrorCodeReceived(status_code=404, url='')))
+        self.assertFalse(is_proxy_failure(exceptions.checksumFromPreviousCheckWasTheSame()))
+
+
+if __name__ == '__main__':
+    unittest.main()
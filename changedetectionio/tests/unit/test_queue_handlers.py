@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_queue_handlers
+
+import random
+import unittest
+
+from changedetectionio.queue_handlers import RecheckPriorityQueue, _PriorityRanks
+from changedetectionio.queuedWatchMetaData import PrioritizedItem
+
+
+def item(priority, uuid):
+    return PrioritizedItem(priority=priority, item={'uuid': uuid})
+
+
+class TestRecheckPriorityQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.q = RecheckPriorityQueue()
+
+    def tearDown(self):
+        self.q.close()
+
+    def test_dedupe_and_move_up(self):
+        self.assertTrue(self.q.put(item(100, 'a')))
+        self.assertTrue(self.q.put(item(200, 'b')))
+        # Same watch again with a worse priority changes nothing
+        self.assertTrue(self.q.put(item(300, 'a')))
+        self.assertEqual(self.q.qsize(), 2)
+        self.assertTrue(self.q.contains('a'))
+        self.assertFalse(self.q.contains('c'))
+
+        # Recheck now, moves 'b' to the front
+        self.q.put(item(1, 'b'))
+        self.assertEqual(self.q.qsize(), 2)
+        self.assertEqual(self.q.get_uuid_position('b')['position'], 0)
+        self.assertEqual(self.q.get_uuid_position('a')['position'], 1)
+        self.assertEqual(len(self.q.queue), 2)
+
+        self.assertEqual(self.q.get(timeout=1).item['uuid'], 'b')
+        self.assertEqual(self.q.get(timeout=1).item['uuid'], 'a')
+        self.assertEqual(self.q.qsize(), 0)
+        self.assertFalse(self.q.contains('b'))
+
+        # Can be queued again once it was taken
+        self.q.put(item(1, 'b'))
+        self.assertTrue(self.q.contains('b'))
+
+    def test_put_many_and_pagination(self):
+        added = self.q.put_many([item(1000 + i, f"uuid-{i}") for i in range(50)] + [item(5, 'uuid-0')])
+        self.assertEqual(added, 50)
+        self.assertEqual(self.q.qsize(), 50)
+        self.assertEqual(self.q.get_queued_uuids(), {f"uuid-{i}" for i in range(50)})
+
+        page = self.q.get_all_queued_uuids(limit=10, offset=0)
+        self.assertEqual([i['uuid'] for i in page['items']][:2], ['uuid-0', 'uuid-1'])
+        self.assertTrue(page['has_more'])
+        page = self.q.get_all_queued_uuids(limit=10, offset=45)
+        self.assertEqual(page['returned_items'], 5)
+        self.assertFalse(page['has_more'])
+
+        summary = self.q.get_queue_summary()
+        self.assertEqual(summary['total_items'], 50)
+        self.assertEqual(summary['clone_items'], 1)
+        self.assertEqual(summary['scheduled_items'], 49)
+        self.assertEqual(summary['min_priority'], 5)
+
+        self.assertEqual(self.q.get_uuid_position('uuid-10')['position'], 10)
+        self.assertFalse(self.q.get_uuid_position('nope')['found'])
+
+    def test_take_matching(self):
+        self.q.put_many([item(10, 'a'), item(20, 'skip'), item(30, 'b'), item(40, 'c')])
+        taken = self.q.take_matching(2, accept=lambda i: i.item['uuid'] != 'skip')
+        self.assertEqual([i.item['uuid'] for i in taken], ['a', 'b'])
+        self.assertEqual(self.q.qsize(), 2)
+        self.assertFalse(self.q.contains('a'))
+
+        # The rest are still there for the workers
+        self.assertEqual(self.q.take_matching(5, accept=lambda i: False), [])
+        self.assertEqual(self.q.get(timeout=1).item['uuid'], 'skip')
+        self.assertEqual(self.q.get(timeout=1).item['uuid'], 'c')
+        self.assertEqual(self.q.take_matching(5), [])
+        self.assertTrue(self.q.empty())
+
+    def test_weighted_fair_classes(self):
+        # 'big' imported first with older priorities, 'small' has three times the weight
+        weights = {'big': 1, 'small': 3}
+        self.q.set_classifier(lambda i: (i.item['uuid'].split('-')[0], weights[i.item['uuid'].split('-')[0]]))
+        self.q.put_many([item(100 + i, f"big-{i}") for i in range(20)])
+        self.q.put_many([item(1000 + i, f"small-{i}") for i in range(6)])
+
+        served = [self.q.get(timeout=1).item['uuid'] for i in range(8)]
+        self.assertEqual(sum(1 for uuid in served if uuid.startswith('small')), 6)
+        # Still in priority order inside the class
+        self.assertEqual([uuid for uuid in served if uuid.startswith('big')], ['big-0', 'big-1'])
+
+        # Moving up works inside the class, and the rest comes out when the other class is empty
+        self.q.put(item(1, 'big-10'))
+        self.assertEqual(self.q.get(timeout=1).item['uuid'], 'big-10')
+        rest = [self.q.get(timeout=1).item['uuid'] for i in range(17)]
+        self.assertEqual(rest[0], 'big-2')
+        self.assertTrue(self.q.empty())
+
+        stats = self.q.get_class_stats()
+        self.assertEqual((stats['big']['served'], stats['big']['queued']), (20, 0))
+        self.assertEqual((stats['small']['served'], stats['small']['weight']), (6, 3))
+
+    def test_urgent_items_skip_the_fair_queueing(self):
+        weights = {'big': 1, 'small': 5}
+        self.q.set_classifier(lambda i: (i.item['uuid'].split('-')[0], weights[i.item['uuid'].split('-')[0]]))
+        self.q.put_many([item(1000 + i, f"small-{i}") for i in range(10)])
+        self.q.put_many([item(100 + i, f"big-{i}") for i in range(10)])
+        # A manual recheck and a runner result in the low weight class, a new watch in the other
+        self.q.put(item(1, 'big-5'))
+        self.q.put(item(0, 'big-7'))
+        self.q.put(item(5, 'small-9'))
+
+        served = [self.q.get(timeout=1).item['uuid'] for i in range(3)]
+        self.assertEqual(served, ['big-7', 'big-5', 'small-9'])
+        # Then back to the turns, the urgent ones weren't charged to 'big'
+        self.assertEqual(self.q.get(timeout=1).item['uuid'], 'big-0')
+        self.assertEqual(self.q.qsize(), 16)
+        self.assertEqual(self.q.get_class_stats()['big']['served'], 3)
+
+        served = [self.q.get(timeout=1).item['uuid'] for i in range(16)]
+        self.assertEqual(sorted(served), sorted([f"big-{i}" for i in (1, 2, 3, 4, 6, 8, 9)] + [f"small-{i}" for i in range(9)]))
+        self.assertTrue(self.q.empty())
+
+    def test_duplicate_payloads_are_merged(self):
+        self.q.put(PrioritizedItem(priority=1, item={'uuid': 'a'}))
+        # A remote runner result for the same watch goes in front, the recheck isn't forgotten
+        self.q.put(PrioritizedItem(priority=0, item={'uuid': 'a', 'remote_result': {'n': 1}}))
+        # A newer result with the same priority replaces the older one
+        self.q.put(PrioritizedItem(priority=0, item={'uuid': 'a', 'remote_result': {'n': 2}}))
+        # Worse priority, still nothing lost
+        self.q.put(PrioritizedItem(priority=200, item={'uuid': 'a', 'extra': True}))
+        self.assertEqual(self.q.qsize(), 1)
+
+        got = self.q.get(timeout=1)
+        self.assertEqual(got.priority, 0)
+        self.assertEqual(got.item, {'uuid': 'a', 'remote_result': {'n': 2}, 'recheck': True, 'extra': True})
+
+    def test_priority_ranks(self):
+        ranks = _PriorityRanks()
+        live = []
+        rng = random.Random(1)
+        # Mostly later epoch seconds, some manual rechecks and older priorities coming back
+        for n in range(5000):
+            if live and rng.random() < 0.45:
+                priority = live.pop(rng.randrange(len(live)))
+                ranks.add(priority, -1)
+            else:
+                priority = rng.choice([1, 5, 1700000000 + n, 1700000000 + rng.randrange(n + 1)])
+                live.append(priority)
+                ranks.add(priority, 1)
+
+            if n % 50 == 0:
+                probe = rng.choice(live) if live else 1
+                self.assertEqual(ranks.before(probe), sum(1 for p in live if p < probe))
+
+        self.assertEqual(ranks.first(), min(live))
+        self.assertEqual(ranks.last(), max(live))
+        self.assertEqual(sum(ranks.counts.values()), len(live))
+
+if __name__ == '__main__':
+    unittest.main()
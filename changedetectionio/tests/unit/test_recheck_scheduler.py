@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_recheck_scheduler
+
+import unittest
+
+from blinker import signal
+
+from changedetectionio.scheduler import RecheckScheduler
+
+
+class TestRecheckScheduler(unittest.TestCase):
+
+    def test_only_due_watches_most_overdue_first(self):
+        s = RecheckScheduler()
+        s.schedule('a', 100)
+        s.schedule('b', 50)
+        s.schedule('c', 500)
+
+        self.assertEqual(s.pop_due(99), [('b', 50)])
+        self.assertEqual(s.pop_due(200), [('a', 100)])
+        self.assertEqual(s.pop_due(200), [])
+        self.assertEqual(s.stats()['scheduled'], 1)
+
+    def test_reschedule_and_remove(self):
+        s = RecheckScheduler()
+        s.schedule('a', 100)
+        # Moved later, the old heap entry must not fire
+        s.schedule('a', 300)
+        self.assertEqual(s.pop_due(200), [])
+        self.assertEqual(s.due_time('a'), 300)
+
+        s.remove('a')
+        self.assertEqual(s.pop_due(1000), [])
+
+        # Lots of stale entries get compacted away
+        for i in range(5000):
+            s.schedule('b', i)
+        self.assertLess(len(s._heap), 2000)
+        self.assertEqual(s.pop_due(10000), [('b', 4999)])
+
+    def test_changed_by_signal_and_resync(self):
+        s = RecheckScheduler()
+        s.connect_signals()
+        signal('watch_changed').send(watch_uuid='x')
+        signal('watch_check_update').send(watch_uuid='y')
+        self.assertEqual(s.take_changed(), {'x', 'y'})
+        self.assertEqual(s.take_changed(), set())
+
+        # First time always, then only when the global settings change
+        self.assertTrue(s.needs_resync(1000, ('settings', 1)))
+        self.assertFalse(s.needs_resync(1001, ('settings', 1)))
+        self.assertTrue(s.needs_resync(1002, ('settings', 2)))
+        self.assertFalse(s.needs_resync(1002 + s.resync_seconds, ('settings', 2)))
+
+    def test_index_check_finds_unsignalled_watches(self):
+        s = RecheckScheduler()
+        s.needs_resync(1000, ('settings', 1))
+        s.schedule('a', 100)
+        s.schedule('b', 200)
+        s.remove('paused')
+        s.schedule('gone', 300)
+        # Popped and queued, scheduled again when its check finishes
+        self.assertEqual(s.pop_due(150), [('a', 100)])
+
+        self.assertFalse(s.index_check_due(1001))
+        self.assertTrue(s.index_check_due(1000 + s.resync_seconds))
+        self.assertEqual(s.check_index(['a', 'b', 'paused', 'new']), 1)
+        self.assertEqual(s.take_changed(), {'new'})
+        self.assertIsNone(s.due_time('gone'))
+        self.assertEqual(s.stats()['missed_changes'], 1)
+
+    def test_lag_metric(self):
+        s = RecheckScheduler()
+        s.record_tick(lags=[0.5, 2.0], tick_seconds=0.01, due_count=3)
+        stats = s.stats()
+        self.assertEqual(stats['lag_seconds'], 2.0)
+        self.assertEqual(stats['queued_last_tick'], 2)
+        self.assertEqual(stats['due_last_tick'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_remote_runners
+
+import asyncio
+import json
+import shutil
+import tempfile
+import time
+import unittest
+
+from changedetectionio.content_fetchers.exceptions import Non200ErrorCodeReceived
+from changedetectionio.processing_pool import pack_exception
+from changedetectionio.queue_handlers import RecheckPriorityQueue
+from changedetectionio.queuedWatchMetaData import PrioritizedItem
+from changedetectionio.remote_runners import LeaseManager, RemoteResult
+from changedetectionio.runner import JobDatastore
+from changedetectionio.store import ChangeDetectionStore
+
+
+class TestRemoteRunners(unittest.TestCase):
+
+    def setUp(self):
+        self.test_datastore_path = tempfile.mkdtemp()
+        self.store = ChangeDetectionStore(datastore_path=self.test_datastore_path, include_default_watches=False)
+        self.remote_uuid = self.store.add_watch(url='https://example.com',
+                                                extras={'notification_urls': ['tgram://bottoken/ChatID']})
+        self.local_uuid = self.store.add_watch(url='https://example.com/unique', extras={'check_unique_lines': True})
+        self.q = RecheckPriorityQueue()
+        self.leases = LeaseManager()
+
+    def tearDown(self):
+        self.q.close()
+        self.store.stop_thread = True
+        time.sleep(0.5)
+        shutil.rmtree(self.test_datastore_path)
+
+    def queue_both(self):
+        self.q.put(PrioritizedItem(priority=100, item={'uuid': self.remote_uuid}))
+        self.q.put(PrioritizedItem(priority=50, item={'uuid': self.local_uuid}))
+
+    def test_lease_complete_and_expire(self):
+        self.queue_both()
+        jobs = self.leases.lease(self.q, self.store, runner='one', limit=5)
+
+        # Unique lines needs the history, stays here
+        self.assertEqual([job['uuid'] for job in jobs], [self.remote_uuid])
+        self.assertTrue(self.q.contains(self.local_uuid))
+        self.assertNotIn('api_access_token', jobs[0]['settings']['application'])
+        self.assertNotIn('password', jobs[0]['settings']['application'])
+        # Not needed to fetch the page, and full of tokens
+        self.assertNotIn('notification_urls', jobs[0]['watch'])
+        self.assertNotIn('bottoken', json.dumps(jobs))
+        json.dumps(jobs)
+
+        lease_id = jobs[0]['lease_id']
+        self.assertEqual(self.leases.leased_uuid(lease_id), self.remote_uuid)
+        self.assertFalse(self.leases.complete(self.q, lease_id, {'uuid': self.local_uuid}))
+        self.assertTrue(self.leases.complete(self.q, lease_id, {'uuid': self.remote_uuid, 'contents': 'hello'}))
+        self.assertFalse(self.leases.complete(self.q, lease_id, {'uuid': self.remote_uuid}))
+
+        # The result is saved first
+        first = self.q.get(timeout=1)
+        self.assertEqual(first.priority, 0)
+        self.assertEqual(first.item['remote_result']['contents'], 'hello')
+
+        # Not finished in time, goes back in the queue and the late result is refused
+        self.q.put(PrioritizedItem(priority=100, item={'uuid': self.remote_uuid}))
+        lease_id = self.leases.lease(self.q, self.store, runner='one', limit=5)[0]['lease_id']
+        self.assertFalse(self.q.contains(self.remote_uuid))
+        later = time.time() + self.leases.lease_seconds + 1
+        self.assertEqual(self.leases.requeue_expired(self.q, now=later), 1)
+        self.assertTrue(self.q.contains(self.remote_uuid))
+        self.assertFalse(self.leases.complete(self.q, lease_id, {'uuid': self.remote_uuid}, now=later))
+
+        stats = self.leases.stats()
+        self.assertEqual((stats['leased'], stats['completed'], stats['expired'], stats['refused']), (2, 1, 1, 3))
+        self.assertEqual(stats['active_leases'], 0)
+
+    def test_job_runs_and_replays(self):
+        self.queue_both()
+        job = json.loads(json.dumps(self.leases.lease(self.q, self.store, runner='one', limit=1)[0]))
+
+        # What the runner makes of it
+        datastore = JobDatastore(job, self.test_datastore_path)
+        watch = datastore.data['watching'][self.remote_uuid]
+        self.assertEqual(watch.link, 'https://example.com')
+        self.assertIsNone(datastore.get_preferred_proxy_for_watch(uuid=self.remote_uuid))
+
+        result = {'uuid': self.remote_uuid,
+                  'fetcher': {'content': '<p>hi</p>', 'headers': {'Server': 'x'}, 'status_code': 200},
+                  'changed_detected': True,
+                  'update_obj': {'previous_md5': 'abc'},
+                  'contents': 'hi'}
+        handler = RemoteResult(datastore=self.store, watch_uuid=self.remote_uuid, result=result)
+        asyncio.run(handler.call_browser())
+        self.assertEqual(handler.fetcher.get_all_headers(), {'server': 'x'})
+        self.assertEqual(handler.run_changedetection(watch=watch), (True, {'previous_md5': 'abc'}, 'hi'))
+
+        result = {'uuid': self.remote_uuid, 'stage': 'fetch', 'fetcher': {'screenshot': 'c2NyZWVu'},
+                  'exception': json.loads(json.dumps(pack_exception(Non200ErrorCodeReceived(url='https://example.com', status_code=403)), default=str))}
+        handler = RemoteResult(datastore=self.store, watch_uuid=self.remote_uuid, result=result)
+        with self.assertRaises(Non200ErrorCodeReceived) as e:
+            asyncio.run(handler.call_browser())
+        self.assertEqual(e.exception.status_code, 403)
+        self.assertEqual(e.exception.screenshot, b'screen')
+
+
+if __name__ == '__main__':
+    unittest.main()
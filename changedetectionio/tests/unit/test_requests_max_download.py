@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_requests_max_download
+
+import asyncio
+import hashlib
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from changedetectionio.content_fetchers.exceptions import ReplyTooLarge
+from changedetectionio.content_fetchers.requests import fetcher as requests_fetcher
+
+# Bigger than what fits in the socket buffers
+BODY = b'<html><body>' + b'0123456789' * 2000000 + b'</body></html>'
+
+
+class BodyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    bytes_sent = 0
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        if self.path == '/with-length':
+            self.send_header('Content-Length', str(len(BODY)))
+            self.end_headers()
+            try:
+                self.wfile.write(BODY)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            return
+
+        # No Content-Length, only known while reading
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for i in range(0, len(BODY), 65536):
+                chunk = BODY[i:i + 65536]
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                BodyHandler.bytes_sent += len(chunk)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class TestRequestsMaxDownload(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), BodyHandler)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def fetch(self, path, max_download_bytes=0, is_binary=False):
+        f = requests_fetcher()
+        f.max_download_bytes = max_download_bytes
+        asyncio.run(f.run(url=self.url + path, timeout=10, request_headers={}, request_body=None,
+                          request_method='GET', is_binary=is_binary))
+        return f
+
+    def test_under_the_limit(self):
+        for path in ('/with-length', '/chunked'):
+            f = self.fetch(path, max_download_bytes=len(BODY))
+            self.assertEqual(f.content, BODY.decode('utf-8'))
+            self.assertEqual(f.raw_content, BODY)
+
+        # Binary is only the checksum
+        f = self.fetch('/chunked', is_binary=True)
+        self.assertEqual(f.content, hashlib.md5(BODY).hexdigest())
+
+    def test_over_the_limit(self):
+        # Known from the Content-Length, nothing read
+        with self.assertRaises(ReplyTooLarge) as e:
+            self.fetch('/with-length', max_download_bytes=100000)
+        self.assertEqual(e.exception.max_bytes, 100000)
+        self.assertEqual(e.exception.status_code, 200)
+
+        # Stops reading once it's over
+        BodyHandler.bytes_sent = 0
+        with self.assertRaises(ReplyTooLarge):
+            self.fetch('/chunked', max_download_bytes=100000, is_binary=True)
+        self.assertLess(BodyHandler.bytes_sent, len(BODY))
+
+
+if __name__ == '__main__':
+    unittest.main()
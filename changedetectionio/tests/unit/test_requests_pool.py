@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_requests_pool
+
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from changedetectionio.content_fetchers.requests import fetcher
+from changedetectionio.content_fetchers.requests_pool import RequestsPool, requests_pool
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'<html><body>hello</body></html>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if self.path == '/cookie':
+            self.send_header('Set-Cookie', 'session=secret')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestRequestsPool(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def test_connections_are_reused_between_checks(self):
+        requests_pool.close()
+        before = requests_pool.stats()
+        for i in range(5):
+            f = fetcher()
+            f._run_sync(url=f"{self.url}/page{i}", timeout=5, request_headers={}, request_body=None, request_method='GET')
+            self.assertEqual(f.status_code, 200)
+            self.assertIn('hello', f.content)
+
+        stats = requests_pool.stats()
+        self.assertEqual(stats['requests'] - before['requests'], 5)
+        self.assertEqual(stats['new_connections'] - before['new_connections'], 1)
+
+    def test_cookies_stay_with_the_session(self):
+        pool = RequestsPool()
+        first = requests.Session()
+        key = pool.acquire(first)
+        first.get(f"{self.url}/cookie")
+        pool.release(key)
+        self.assertEqual(first.cookies.get('session'), 'secret')
+
+        second = requests.Session()
+        self.assertEqual(pool.acquire(second), key)
+        self.assertIs(second.get_adapter(self.url), first.get_adapter(self.url))
+        self.assertEqual(len(second.cookies), 0)
+        pool.release(key)
+
+        # Different proxy, different pool
+        self.assertNotEqual(pool.acquire(requests.Session(), proxies={'http': 'http://proxy:3128'}), key)
+
+    def test_idle_adapters_are_closed(self):
+        pool = RequestsPool()
+        key = pool.acquire(requests.Session(), now=1000)
+        busy_key = pool.acquire(requests.Session(), proxies={'http': 'http://proxy:3128'}, now=1000)
+        pool.release(key, now=1000)
+
+        pool.acquire(requests.Session(), proxies={'http': 'http://other:3128'}, now=1000 + pool.idle_seconds + 60)
+        self.assertEqual(pool.stats()['evicted'], 1)
+        self.assertEqual(pool.stats()['adapters'], 2)
+        pool.release(busy_key)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_resource_blocking
+
+import shutil
+import tempfile
+import time
+import unittest
+
+from changedetectionio.content_fetchers.resource_blocking import ResourceBlocker, profile_for_check
+from changedetectionio.store import ChangeDetectionStore
+
+
+class TestResourceBlocking(unittest.TestCase):
+
+    def test_profiles(self):
+        blocker = ResourceBlocker()
+        self.assertTrue(blocker.check('media', 'image', 'https://example.com/a.png'))
+        self.assertTrue(blocker.check('media', 'font', 'https://example.com/a.woff2'))
+        self.assertFalse(blocker.check('media', 'script', 'https://www.googletagmanager.com/gtm.js'))
+        self.assertTrue(blocker.check('trackers', 'script', 'https://www.googletagmanager.com/gtm.js'))
+        self.assertFalse(blocker.check('trackers', 'script', 'https://notdoubleclick.net/app.js'))
+        self.assertFalse(blocker.check('trackers', 'image', 'https://example.com/a.png'))
+        self.assertTrue(blocker.check('media_trackers', 'xhr', 'https://stats.g.doubleclick.net/collect'))
+
+        # The page itself, always
+        self.assertFalse(blocker.check('media_trackers', 'document', 'https://doubleclick.net/'))
+        self.assertFalse(blocker.check('none', 'image', 'https://example.com/a.png'))
+
+        stats = blocker.stats()
+        self.assertEqual(stats['blocked'], 4)
+        self.assertEqual(stats['blocked_by_type'], {'image': 1, 'font': 1, 'tracker': 2})
+        self.assertEqual(stats['allowed'], 5)
+
+    def test_everything_is_loaded_for_the_screenshot(self):
+        datastore_path = tempfile.mkdtemp()
+        store = ChangeDetectionStore(datastore_path=datastore_path, include_default_watches=False)
+        try:
+            uuid = store.add_watch(url='https://example.com')
+            watch = store.data['watching'][uuid]
+            store.data['settings']['requests']['block_resources'] = 'media'
+
+            # Nothing saved yet
+            self.assertIsNone(profile_for_check(watch, store))
+
+            watch.save_history_text(contents='hello', timestamp=int(time.time()), snapshot_id='abc')
+            watch.save_screenshot(screenshot=b'not really a png')
+            self.assertIsNone(profile_for_check(watch, store))
+            watch.save_xpath_data(data={'size_pos': []})
+            self.assertEqual(profile_for_check(watch, store), 'media')
+
+            # The watch decides
+            watch['block_resources'] = 'none'
+            self.assertIsNone(profile_for_check(watch, store))
+            watch['block_resources'] = 'trackers'
+            self.assertEqual(profile_for_check(watch, store), 'trackers')
+
+            watch['notification_screenshot'] = True
+            self.assertIsNone(profile_for_check(watch, store))
+        finally:
+            store.stop_thread = True
+            time.sleep(0.5)
+            shutil.rmtree(datastore_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
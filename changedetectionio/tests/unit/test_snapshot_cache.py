@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_snapshot_cache
+
+import unittest
+
+from changedetectionio.model.snapshot_cache import SnapshotCache
+
+
+class TestSnapshotCache(unittest.TestCase):
+
+    def test_hits_and_misses(self):
+        cache = SnapshotCache(max_bytes=1000)
+        self.assertIsNone(cache.get('w1', 100, '/a'))
+        cache.set('w1', 100, '/a', 'hello')
+        self.assertEqual(cache.get('w1', '100', '/a'), 'hello')
+        # Same timestamp but a different file (history was cleared and written again)
+        self.assertIsNone(cache.get('w1', 100, '/b'))
+
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['bytes'], 5)
+
+    def test_byte_bound_and_lru(self):
+        cache = SnapshotCache(max_bytes=10)
+        cache.set('w1', 1, '/1', 'aaaa')
+        cache.set('w1', 2, '/2', 'bbbb')
+        # Touch 1 so that 2 is the least recently used
+        cache.get('w1', 1, '/1')
+        cache.set('w1', 3, '/3', 'cccc')
+
+        self.assertIsNone(cache.get('w1', 2, '/2'))
+        self.assertEqual(cache.get('w1', 1, '/1'), 'aaaa')
+        self.assertEqual(cache.get('w1', 3, '/3'), 'cccc')
+        self.assertLessEqual(cache.stats()['bytes'], 10)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+        # Too big to ever fit
+        cache.set('w1', 4, '/4', 'x' * 11)
+        self.assertIsNone(cache.get('w1', 4, '/4'))
+
+        # Bytes not characters
+        cache.set('w1', 5, '/5', 'é' * 6)
+        self.assertIsNone(cache.get('w1', 5, '/5'))
+        cache.set('w1', 6, '/6', 'é' * 5)
+        self.assertEqual(cache.get('w1', 6, '/6'), 'é' * 5)
+        self.assertEqual(cache.stats()['bytes'], 10)
+
+    def test_invalidate(self):
+        cache = SnapshotCache(max_bytes=1000)
+        cache.set('w1', 1, '/1', 'one')
+        cache.set('w2', 1, '/1', 'two')
+        cache.invalidate_watch('w1')
+        self.assertIsNone(cache.get('w1', 1, '/1'))
+        self.assertEqual(cache.get('w2', 1, '/1'), 'two')
+
+        cache.clear()
+        self.assertEqual(cache.stats()['entries'], 0)
+        self.assertEqual(cache.stats()['bytes'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_store_backends
+
+import json
+import os
+import tempfile
+import unittest
+
+from changedetectionio.store.backends import SQLiteBackend, JSONFileBackend, get_backend, write_json_atomic
+
+
+def _example_data():
+    return {
+        'build_sha': 'abc',
+        'version_tag': '0.0.1',
+        'settings': {
+            'headers': {},
+            'requests': {'time_between_check': {'minutes': 5}},
+            'application': {
+                'schema_version': 20,
+                'tags': {
+                    'tag-1': {'title': 'cats', 'uuid': 'tag-1'},
+                },
+            },
+        },
+        'watching': {
+            'watch-1': {'url': 'https://example.com/1', 'uuid': 'watch-1', 'tags': ['tag-1']},
+            'watch-2': {'url': 'https://example.com/2', 'uuid': 'watch-2', 'tags': []},
+        },
+    }
+
+
+class TestSQLiteBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.datastore_path = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        backend = SQLiteBackend(self.datastore_path)
+        data = _example_data()
+        backend.save_all(data)
+        backend.close()
+
+        loaded = SQLiteBackend(self.datastore_path).load()
+        self.assertEqual(loaded, data)
+
+    def test_only_changed_rows_are_written(self):
+        backend = SQLiteBackend(self.datastore_path)
+        data = _example_data()
+        backend.save_all(data)
+
+        data['watching']['watch-1']['url'] = 'https://example.com/changed'
+        # watch-2 changes in memory but is not marked dirty, so it should not be written
+        data['watching']['watch-2']['url'] = 'https://example.com/not-saved'
+        del data['watching']['watch-1']['tags']
+        backend.save_watches(data, uuids={'watch-1'}, deleted_uuids=set())
+
+        loaded = backend.load()
+        self.assertEqual(loaded['watching']['watch-1']['url'], 'https://example.com/changed')
+        self.assertEqual(loaded['watching']['watch-2']['url'], 'https://example.com/2')
+
+        backend.save_watches(data, uuids=set(), deleted_uuids={'watch-2'})
+        self.assertNotIn('watch-2', backend.load()['watching'])
+
+    def test_imports_existing_json(self):
+        data = _example_data()
+        with open(os.path.join(self.datastore_path, 'url-watches.json'), 'w') as f:
+            json.dump(data, f)
+
+        backend = SQLiteBackend(self.datastore_path)
+        self.assertFalse(backend.exists)
+        self.assertEqual(backend.load(), data)
+        self.assertTrue(backend.exists)
+
+        export_path = os.path.join(self.datastore_path, 'export.json')
+        backend.export_json(data, export_path)
+        self.assertEqual(JSONFileBackend(self.datastore_path).load(), data)
+        with open(export_path) as f:
+            self.assertEqual(json.load(f), data)
+
+    def test_get_backend(self):
+        self.assertIsInstance(get_backend('sqlite', self.datastore_path), SQLiteBackend)
+        self.assertIsInstance(get_backend(None, self.datastore_path), JSONFileBackend)
+        self.assertIsInstance(get_backend('nonsense', self.datastore_path), JSONFileBackend)
+
+
+class TestJSONJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.datastore_path = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_journal_replay(self):
+        backend = JSONFileBackend(self.datastore_path)
+        data = _example_data()
+        backend.save_all(data)
+
+        data['watching']['watch-1']['url'] = 'https://example.com/changed'
+        del data['watching']['watch-2']
+        backend.save_watches(data, uuids={'watch-1'}, deleted_uuids={'watch-2'})
+
+        # Only the journal was written, the snapshot still has the old data
+        self.assertTrue(os.path.isfile(backend.journal_path))
+        with open(backend.json_store_path) as f:
+            self.assertEqual(json.load(f)['watching']['watch-1']['url'], 'https://example.com/1')
+
+        # Simulate a crash while appending
+        with open(backend.journal_path, 'a') as f:
+            f.write('{"op": "put", "uuid": "watch-3", "da')
+
+        self.assertEqual(JSONFileBackend(self.datastore_path).load(), data)
+
+        # Compacting folds the journal into the snapshot
+        backend.save_all(data)
+        self.assertFalse(os.path.isfile(backend.journal_path))
+        with open(backend.json_store_path) as f:
+            self.assertEqual(json.load(f), data)
+
+    def test_stale_journal_is_ignored(self):
+        backend = JSONFileBackend(self.datastore_path)
+        data = _example_data()
+        backend.save_all(data)
+        data['watching']['watch-1']['url'] = 'https://example.com/changed'
+        backend.save_watches(data, uuids={'watch-1'}, deleted_uuids=set())
+
+        # A different snapshot appears (restored backup etc), the journal doesn't belong to it
+        write_json_atomic(_example_data(), backend.json_store_path)
+        self.assertEqual(JSONFileBackend(self.datastore_path).load(), _example_data())
+        self.assertFalse(os.path.isfile(backend.journal_path))
+
+    def test_snapshot_before_update_has_the_journal_changes(self):
+        backend = JSONFileBackend(self.datastore_path)
+        data = _example_data()
+        backend.save_all(data)
+        data['watching']['watch-1']['url'] = 'https://example.com/changed'
+        backend.save_watches(data, uuids={'watch-1'}, deleted_uuids=set())
+
+        path = os.path.join(self.datastore_path, 'url-watches-before-21.json')
+        backend.snapshot_before_update(data, path)
+        with open(path) as f:
+            self.assertEqual(json.load(f), data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_store_config_files
+
+import json
+import os
+import tempfile
+import unittest
+
+from changedetectionio.model.App import parse_headers_from_text_file
+from changedetectionio.store.config_files import ConfigFileCache, load_json
+
+
+class TestConfigFileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ConfigFileCache()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_only_read_again_when_changed(self):
+        path = os.path.join(self.tmp.name, 'proxies.json')
+        self.assertIsNone(self.cache.get(path, load_json))
+
+        with open(path, 'w') as f:
+            json.dump({'one': {'label': 'One', 'url': 'http://one:3128'}}, f)
+
+        first = self.cache.get(path, load_json)
+        for i in range(5):
+            self.assertIs(self.cache.get(path, load_json), first)
+        self.assertEqual(self.cache.stats(), {'files': 1, 'hits': 5, 'reads': 1, 'missing': 1})
+
+        # Different size, read again even when the mtime didn't move on
+        st = os.stat(path)
+        with open(path, 'w') as f:
+            json.dump({'two': {'label': 'Two', 'url': 'http://two.example:3128'}}, f)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        self.assertEqual(list(self.cache.get(path, load_json).keys()), ['two'])
+
+        os.unlink(path)
+        self.assertIsNone(self.cache.get(path, load_json))
+        self.assertEqual(self.cache.stats()['files'], 0)
+
+    def test_parse_errors_are_not_cached(self):
+        path = os.path.join(self.tmp.name, 'proxies.json')
+        with open(path, 'w') as f:
+            f.write('{not json')
+        with self.assertRaises(ValueError):
+            self.cache.get(path, load_json)
+        self.assertEqual(self.cache.stats()['files'], 0)
+
+    def test_headers(self):
+        path = os.path.join(self.tmp.name, 'headers.txt')
+        with open(path, 'w') as f:
+            f.write("# comment\nX-Custom: 1:2\n")
+        self.assertEqual(self.cache.get(path, parse_headers_from_text_file), {'X-Custom': '1:2'})
+        self.assertEqual(self.cache.get(path, parse_headers_from_text_file), {'X-Custom': '1:2'})
+        self.assertEqual(self.cache.stats()['reads'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
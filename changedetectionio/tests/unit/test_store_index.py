@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_store_index
+
+import unittest
+
+from changedetectionio.store.index import WatchIndex
+
+
+class TestWatchIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.watching = {
+            'a': {'url': 'https://Example.com/a ', 'title': 'Cats', 'tags': ['t1'], 'last_error': False, 'processor': 'text_json_diff'},
+            'b': {'url': 'https://example.com/b', 'tags': ['t1', 't2'], 'last_error': 'Timeout', 'processor': 'restock_diff'},
+        }
+        self.index = WatchIndex()
+        self.index.ensure(self.watching)
+
+    def test_lookups(self):
+        self.assertEqual(self.index.uuids_with_tag('t1'), ['a', 'b'])
+        self.assertEqual(self.index.uuids_with_tag('t2'), ['b'])
+        self.assertEqual(self.index.uuids_with_url('https://example.com/A'), ['a'])
+        self.assertEqual(self.index.uuids_with_title('cats'), ['a'])
+        self.assertEqual(self.index.uuids_with_processor('restock_diff'), ['b'])
+        self.assertEqual(self.index.errored_uuids(), ['b'])
+        self.assertEqual(self.index.uuids_with_tag('nope'), [])
+
+    def test_update_and_remove(self):
+        self.watching['b'].update({'tags': ['t2'], 'last_error': False, 'url': 'https://example.com/new'})
+        self.index.update('b', self.watching['b'])
+        self.assertEqual(self.index.uuids_with_tag('t1'), ['a'])
+        self.assertEqual(self.index.errored_uuids(), [])
+        self.assertEqual(self.index.uuids_with_url('https://example.com/b'), [])
+        self.assertEqual(self.index.uuids_with_url('https://example.com/new'), ['b'])
+
+        self.index.remove('a')
+        self.assertEqual(self.index.uuids_with_tag('t1'), [])
+        self.assertEqual(self.index.uuids_with_title('cats'), [])
+        self.assertNotIn('https://example.com/a', self.index.by_url)
+
+    def test_rebuilds_when_replaced(self):
+        self.watching = {'c': {'url': 'https://example.com/c', 'tags': ['t1']}}
+        self.index.ensure(self.watching)
+        self.assertEqual(self.index.uuids_with_tag('t1'), ['c'])
+        self.assertEqual(self.index.uuids_with_processor('text_json_diff'), ['c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
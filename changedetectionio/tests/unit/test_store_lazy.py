@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_store_lazy
+
+import unittest
+from copy import deepcopy
+
+from changedetectionio.store.lazy import LazyEntityDict
+
+
+class Hydrated(dict):
+    pass
+
+
+class TestLazyEntityDict(unittest.TestCase):
+
+    def setUp(self):
+        self.hydrated = []
+
+        def hydrate(uuid, raw):
+            self.hydrated.append(uuid)
+            return Hydrated(raw)
+
+        self.watching = LazyEntityDict(hydrate=hydrate)
+        self.watching.load_raw({
+            'a': {'url': 'https://example.com/a'},
+            'b': {'url': 'https://example.com/b'},
+        })
+
+    def test_hydrates_on_first_access_only(self):
+        self.assertEqual(self.watching.pending_count, 2)
+        self.assertIn('a', self.watching)
+        self.assertEqual(len(self.watching), 2)
+        self.assertEqual(sorted(self.watching), ['a', 'b'])
+        self.assertEqual(self.hydrated, [])
+
+        self.assertIsInstance(self.watching['a'], Hydrated)
+        self.assertIs(self.watching.get('a'), self.watching['a'])
+        self.assertEqual(self.hydrated, ['a'])
+        self.assertIsNone(self.watching.get('nope'))
+
+        self.assertTrue(all(isinstance(w, Hydrated) for w in self.watching.values()))
+        self.assertEqual(sorted(self.hydrated), ['a', 'b'])
+        self.assertEqual(self.watching.pending_count, 0)
+
+    def test_copies(self):
+        # Saving does not need to hydrate anything
+        self.assertEqual(deepcopy(self.watching), {'a': {'url': 'https://example.com/a'}, 'b': {'url': 'https://example.com/b'}})
+        self.assertEqual(self.hydrated, [])
+
+        # Copying into a normal dict gives the hydrated objects
+        self.assertTrue(all(isinstance(w, Hydrated) for w in dict(self.watching).values()))
+
+    def test_replace_and_delete(self):
+        self.watching['a'] = {'url': 'https://example.com/new'}
+        del self.watching['b']
+        self.assertEqual(self.watching['a'], {'url': 'https://example.com/new'})
+        self.assertNotIn('b', self.watching)
+        self.assertEqual(self.hydrated, [])
+        self.assertEqual(self.watching.pending_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
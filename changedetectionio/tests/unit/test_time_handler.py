@@ -406,6 +406,47 @@ class TestIsWithinSchedule(unittest.TestCase):
         self.assertTrue(result, "Should handle timezone with whitespace")
 
 
+class TestNextScheduleStart(unittest.TestCase):
+    """Tests for the next_schedule_start function."""
+
+    def schedule(self, **days):
+        limit = {'enabled': True, 'timezone': 'Europe/Berlin'}
+        for day in ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'):
+            limit[day] = {'enabled': day in days, 'start_time': days.get(day, '09:00'),
+                          'duration': {'hours': 8, 'minutes': 0}}
+        return limit
+
+    def test_later_today(self):
+        """Test that a window starting later today is next."""
+        # A Wednesday
+        now = arrow.get('2025-01-15 07:30', tzinfo='Europe/Berlin')
+        result = time_handler.next_schedule_start(self.schedule(wednesday='09:00', thursday='09:00'), now=now)
+        self.assertEqual(result, arrow.get('2025-01-15 09:00', tzinfo='Europe/Berlin').timestamp())
+
+    def test_next_enabled_day(self):
+        """Test that after today's window (or without one) the next enabled day is next."""
+        now = arrow.get('2025-01-15 18:00', tzinfo='Europe/Berlin')
+        result = time_handler.next_schedule_start(self.schedule(monday='08:15', wednesday='09:00'), now=now)
+        self.assertEqual(result, arrow.get('2025-01-20 08:15', tzinfo='Europe/Berlin').timestamp())
+
+        # Only today, so next week
+        result = time_handler.next_schedule_start(self.schedule(wednesday='09:00'), now=now)
+        self.assertEqual(result, arrow.get('2025-01-22 09:00', tzinfo='Europe/Berlin').timestamp())
+
+    def test_schedule_timezone(self):
+        """Test that the day is decided in the schedule timezone."""
+        # Still Wednesday in UTC but already Thursday in Berlin
+        now = arrow.get('2025-01-15 23:30', tzinfo='UTC')
+        result = time_handler.next_schedule_start(self.schedule(thursday='06:00'), now=now)
+        self.assertEqual(result, arrow.get('2025-01-16 06:00', tzinfo='Europe/Berlin').timestamp())
+
+    def test_nothing_enabled(self):
+        """Test that None is returned when nothing is enabled."""
+        self.assertIsNone(time_handler.next_schedule_start(self.schedule()))
+        self.assertIsNone(time_handler.next_schedule_start({'enabled': False}))
+        self.assertIsNone(time_handler.next_schedule_start(None))
+
+
 class TestWeekdayEnum(unittest.TestCase):
     """Tests for the Weekday enum."""
 
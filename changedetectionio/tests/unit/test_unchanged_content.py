@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_unchanged_content
+
+import shutil
+import tempfile
+import time
+import unittest
+
+from changedetectionio.processors import unchanged_content_counters
+from changedetectionio.processors.text_json_diff.processor import perform_site_check
+from changedetectionio.store import ChangeDetectionStore
+
+HTML = '<html><body><p>Price is 10</p><p>Updated today</p></body></html>'
+
+
+class TestUnchangedContent(unittest.TestCase):
+
+    def setUp(self):
+        self.test_datastore_path = tempfile.mkdtemp()
+        self.store = ChangeDetectionStore(datastore_path=self.test_datastore_path, include_default_watches=False)
+        self.uuid = self.store.add_watch(url='https://example.com')
+        self.watch = self.store.data['watching'][self.uuid]
+
+    def tearDown(self):
+        self.store.stop_thread = True
+        time.sleep(0.5)
+        shutil.rmtree(self.test_datastore_path)
+
+    def fetched(self, content):
+        handler = perform_site_check(datastore=self.store, watch_uuid=self.uuid)
+        handler.fetcher.content = content
+        handler.fetcher.headers = {'Content-Type': 'text/html'}
+        return handler
+
+    def test_same_content_and_settings_skip_processing(self):
+        handler = self.fetched(HTML)
+        # Never processed
+        self.assertFalse(handler.content_is_unchanged(self.watch))
+
+        changed_detected, update_obj, contents = handler.run_changedetection(watch=self.watch)
+        self.store.update_watch(uuid=self.uuid, update_obj=update_obj)
+        self.watch.save_history_text(contents=contents, timestamp=int(time.time()), snapshot_id=update_obj['previous_md5'])
+
+        before = dict(unchanged_content_counters)
+        self.assertTrue(self.fetched(HTML).content_is_unchanged(self.watch))
+        self.assertFalse(self.fetched(HTML.replace('10', '11')).content_is_unchanged(self.watch))
+        self.assertEqual(unchanged_content_counters['compared'] - before['compared'], 2)
+        self.assertEqual(unchanged_content_counters['skipped'] - before['skipped'], 1)
+
+        # Same page but now ignoring some text, has to be processed again
+        self.store.update_watch(uuid=self.uuid, update_obj={'ignore_text': ['Updated']})
+        self.assertFalse(self.fetched(HTML).content_is_unchanged(self.watch))
+
+        # Also for the global settings
+        self.store.update_watch(uuid=self.uuid, update_obj={'ignore_text': []})
+        self.assertTrue(self.fetched(HTML).content_is_unchanged(self.watch))
+        self.store.data['settings']['application']['global_ignore_text'] = ['Updated']
+        self.assertFalse(self.fetched(HTML).content_is_unchanged(self.watch))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -61,5 +61,142 @@ class TestDiffBuilder(unittest.TestCase):
         p = watch.get_from_version_based_on_last_viewed
         assert p == "100", "Correct with only one history snapshot"
 
+    def test_watch_history_index_cache(self):
+        import uuid as uuid_builder
+        watch = Watch.model(datastore_path='/tmp', default={})
+        watch.ensure_data_dir_exists()
+
+        for timestamp in [300, 100, 200]:
+            watch.save_history_text(contents=f"hello {timestamp}", timestamp=timestamp, snapshot_id=str(uuid_builder.uuid4()))
+
+        # Written through save_history_text(), history.txt order is kept, the sorted keys are ints
+        assert list(watch.history.keys()) == ['300', '100', '200']
+        assert watch.history_keys_sorted == [100, 200, 300]
+        assert watch.get_history_key_at_or_before(250) == '200'
+        assert watch.get_history_key_at_or_before(99) is None
+        assert watch.get_history_snapshot('200') == "hello 200"
+
+        # Changing what we get back doesn't change the cached index
+        h = watch.history
+        h.clear()
+        assert len(watch.history) == 3
+
+        # Someone else changed history.txt, it should be read again
+        with open(os.path.join(watch.watch_data_dir, "history.txt"), 'a') as f:
+            f.write("400,some-snapshot.txt\n")
+        assert watch.history_keys_sorted == [100, 200, 300, 400]
+        assert watch.newest_history_key == '400'
+
+    def test_watch_history_segment_storage(self):
+        import uuid as uuid_builder
+        from changedetectionio.model import snapshot_segments
+
+        watch = Watch.model(datastore_path='/tmp', default={})
+        watch.ensure_data_dir_exists()
+
+        # Start with the normal one-file-per-snapshot layout
+        watch.save_history_text(contents="small one", timestamp=100, snapshot_id=str(uuid_builder.uuid4()))
+        watch.save_history_text(contents="big one " * 500, timestamp=101, snapshot_id=str(uuid_builder.uuid4()))
+
+        os.environ['SNAPSHOT_STORAGE_FORMAT'] = 'segment'
+        try:
+            watch.save_history_text(contents="packed one", timestamp=102, snapshot_id=str(uuid_builder.uuid4()))
+        finally:
+            del os.environ['SNAPSHOT_STORAGE_FORMAT']
+
+        # Both formats can be read from the same history
+        assert watch.get_history_snapshot('100') == "small one"
+        assert watch.get_history_snapshot('101') == "big one " * 500
+        assert watch.get_history_snapshot('102') == "packed one"
+        assert snapshot_segments.parse_ref(watch.history['102'])
+
+        # Migrate the rest
+        assert snapshot_segments.pack_watch_history(watch.watch_data_dir) == 2
+        assert all(snapshot_segments.parse_ref(v) for v in watch.history.values())
+        assert watch.get_history_snapshot('100') == "small one"
+        assert watch.get_history_snapshot('101') == "big one " * 500
+        assert sorted(os.listdir(watch.watch_data_dir)) == ['history.txt', snapshot_segments.SEGMENT_FILENAME]
+        assert snapshot_segments.pack_watch_history(watch.watch_data_dir) == 0
+
+    def test_watch_history_delta_storage(self):
+        import hashlib
+        from changedetectionio.model import snapshot_delta
+
+        watch = Watch.model(datastore_path='/tmp', default={})
+        watch.ensure_data_dir_exists()
+
+        pages = []
+        lines = [f"line {i}\n" for i in range(200)]
+        os.environ['SNAPSHOT_STORAGE_FORMAT'] = 'delta'
+        os.environ['SNAPSHOT_DELTA_KEYFRAME_INTERVAL'] = '4'
+        try:
+            for i in range(9):
+                lines[i * 10] = f"changed in version {i}\n"
+                contents = ''.join(lines)
+                pages.append(contents)
+                watch.save_history_text(contents=contents, timestamp=100 + i, snapshot_id=hashlib.md5(contents.encode('utf-8')).hexdigest())
+        finally:
+            del os.environ['SNAPSHOT_STORAGE_FORMAT']
+            del os.environ['SNAPSHOT_DELTA_KEYFRAME_INTERVAL']
+
+        # Keyframe every 4
+        kinds = ['delta' if snapshot_delta.is_delta(v) else 'full' for v in watch.history.values()]
+        assert kinds == ['full', 'delta', 'delta', 'delta', 'full', 'delta', 'delta', 'delta', 'full']
+
+        for i, contents in enumerate(pages):
+            assert watch.get_history_snapshot(str(100 + i)) == contents
+
+    def test_watch_unique_lines_index(self):
+        import uuid as uuid_builder
+        from changedetectionio.model import line_hash_index
+
+        watch = Watch.model(datastore_path='/tmp', default={})
+        watch.ensure_data_dir_exists()
+        watch.save_history_text(contents="Some text\nAnother line", timestamp=100, snapshot_id=str(uuid_builder.uuid4()))
+
+        def unique(lines, ignore_whitespace=False):
+            result = watch.lines_contain_something_unique_compared_to_history(lines=lines, ignore_whitespace=ignore_whitespace)
+            # Always the same answer as comparing against every snapshot
+            os.environ['LINE_HASH_INDEX'] = 'false'
+            try:
+                assert watch.lines_contain_something_unique_compared_to_history(lines=lines, ignore_whitespace=ignore_whitespace) == result
+            finally:
+                del os.environ['LINE_HASH_INDEX']
+            return result
+
+        # First check builds the index
+        assert not unique(["  some TEXT "])
+        assert os.path.isfile(os.path.join(watch.watch_data_dir, line_hash_index.META_FILENAME))
+        assert unique(["something new"])
+        assert unique(["Some    text"])
+        assert not unique(["Some    text"], ignore_whitespace=True)
+
+        # Added to without reading the history again
+        watch.save_history_text(contents="something new", timestamp=101, snapshot_id=str(uuid_builder.uuid4()))
+        index = line_hash_index.LineHashIndex(watch.watch_data_dir)
+        assert index.is_current()
+        assert not unique(["something new", "another LINE"])
+
+        # Bloom filter in front gives the same answers
+        os.environ['LINE_HASH_INDEX_BLOOM'] = 'true'
+        try:
+            assert unique(["not seen before"])
+            assert not unique(["something new"])
+            watch.save_history_text(contents="not seen before", timestamp=102, snapshot_id=str(uuid_builder.uuid4()))
+            assert not unique(["not seen before"])
+        finally:
+            del os.environ['LINE_HASH_INDEX_BLOOM']
+
+        # Index removed, or history.txt changed behind its back, is rebuilt
+        os.unlink(os.path.join(watch.watch_data_dir, "line-hashes-strip.bin"))
+        assert not unique(["some text"])
+        with open(os.path.join(watch.watch_data_dir, "added-elsewhere.txt"), 'w') as f:
+            f.write("one more")
+        with open(os.path.join(watch.watch_data_dir, "history.txt"), 'a') as f:
+            f.write("103,added-elsewhere.txt\n")
+        assert not index.is_current()
+        assert not unique(["one more"])
+        assert index.is_current()
+
 if __name__ == '__main__':
     unittest.main()
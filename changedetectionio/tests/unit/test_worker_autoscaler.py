@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+# run from dir above changedetectionio/ dir
+# python3 -m unittest changedetectionio.tests.unit.test_worker_autoscaler
+
+import unittest
+
+from changedetectionio import worker_handler
+from changedetectionio.worker_autoscaler import WorkerAutoscaler
+
+
+class TestWorkerAutoscaler(unittest.TestCase):
+
+    def setUp(self):
+        self.autoscaler = WorkerAutoscaler()
+        self.autoscaler.min_workers = 2
+        self.autoscaler.max_workers = 10
+        self.autoscaler.idle_rounds = 3
+
+    def test_grows_with_a_backlog_of_busy_workers(self):
+        target, reason = self.autoscaler.decide(current=4, queue_depth=500, oldest_wait=600, utilisation=1.0, lag=0.01)
+        self.assertEqual(target, 5)
+        self.assertIn('Backlog', reason)
+        self.assertEqual(self.autoscaler.decide(current=10, queue_depth=500, oldest_wait=600, utilisation=1.0, lag=0.01)[0], 10)
+
+        # Idle workers with a backlog are waiting on something else
+        self.assertEqual(self.autoscaler.decide(current=4, queue_depth=500, oldest_wait=600, utilisation=0.2, lag=0.01)[0], 4)
+
+        # Short of CPU, fewer not more
+        self.assertEqual(self.autoscaler.decide(current=4, queue_depth=500, oldest_wait=600, utilisation=1.0, lag=2)[0], 3)
+
+    def test_shrinks_only_after_quiet_rounds(self):
+        quiet = dict(current=5, queue_depth=0, oldest_wait=0, utilisation=0.1, lag=0.01)
+        self.assertEqual(self.autoscaler.decide(**quiet)[0], 5)
+        self.assertEqual(self.autoscaler.decide(**quiet)[0], 5)
+        # A busy moment starts the count again
+        self.assertEqual(self.autoscaler.decide(current=5, queue_depth=3, oldest_wait=5, utilisation=0.6, lag=0.01)[0], 5)
+        self.assertEqual(self.autoscaler.decide(**quiet)[0], 5)
+        self.assertEqual(self.autoscaler.decide(**quiet)[0], 5)
+        self.assertEqual(self.autoscaler.decide(**quiet)[0], 4)
+
+        self.assertEqual(self.autoscaler.decide(current=1, queue_depth=0, oldest_wait=0, utilisation=0, lag=0)[0], 2)
+
+    def test_retire_requests(self):
+        worker_handler.retire_workers(2)
+        self.assertEqual(worker_handler.cancel_retire_requests(1), 1)
+        self.assertTrue(worker_handler.take_retire_request())
+        self.assertFalse(worker_handler.take_retire_request())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -113,3 +113,35 @@ def is_within_schedule(time_schedule_limit, default_tz="UTC"):
         return is_valid
 
     return False
+
+
+def next_schedule_start(time_schedule_limit, default_tz="UTC", now=None):
+    """
+    When is_within_schedule() will next be True, the start of the next enabled day's time window.
+
+    Parameters:
+        time_schedule_limit (dict): Schedule configuration with timezone, day settings, etc.
+        default_tz (str): Default timezone to use if not specified. Default is 'UTC'.
+        now (arrow.Arrow, optional): The time to look from, default is the current time.
+
+    Returns:
+        float: Epoch seconds of the next window start, or None if no day is enabled.
+    """
+    if not time_schedule_limit or not time_schedule_limit.get('enabled'):
+        return None
+
+    tz_name = (time_schedule_limit.get('timezone') or default_tz).strip()
+    now_tz = (now or arrow.now()).to(tz_name)
+
+    # Today (if it starts later) and the next 7 days
+    for days in range(8):
+        day = now_tz.shift(days=days)
+        day_schedule = time_schedule_limit.get(day.format('dddd').lower())
+        if not day_schedule or not day_schedule.get('enabled'):
+            continue
+        hour, minute = map(int, day_schedule['start_time'].split(':'))
+        start = day.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if start > now_tz:
+            return start.timestamp()
+
+    return None
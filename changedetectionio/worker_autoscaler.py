@@ -0,0 +1,175 @@
+"""
+Grows and shrinks the number of async workers with the load, so a morning backlog is cleared without keeping lots of
+idle workers (and browser connections) around all night.
+
+Enabled with WORKER_AUTOSCALE=true, between WORKER_AUTOSCALE_MIN (default 1) and WORKER_AUTOSCALE_MAX (default 20)
+workers, starting from the configured number of workers. Every tick the ticker thread samples the queue depth and how
+many workers are busy, every WORKER_AUTOSCALE_INTERVAL seconds (default 30) it decides:
+
+- a backlog (the oldest queued check waited more than WORKER_AUTOSCALE_MAX_WAIT seconds, default 60, or more than
+  two checks queued per worker) while the workers are busy adds 25% more workers
+- a backlog while the workers are mostly idle changes nothing, they're waiting on hosts or proxies, more won't help
+- the event loop lagging more than WORKER_AUTOSCALE_MAX_LAG seconds (default 0.5) means it's short of CPU, one
+  worker less
+- nothing queued and the workers mostly idle for WORKER_AUTOSCALE_IDLE_ROUNDS decisions in a row (default 4), one
+  worker less
+
+Workers are never stopped in the middle of a check, they're asked to retire when they're next idle.
+The target and the reason for it are in /queue-status and worker_handler.get_worker_status().
+"""
+
+from changedetectionio.strtobool import strtobool
+from loguru import logger
+import asyncio
+import math
+import os
+import time
+
+# How often the event loop lag is measured
+LAG_PROBE_SECONDS = 0.5
+
+# Queued checks per worker that count as a backlog
+BACKLOG_PER_WORKER = 2
+
+# Average share of busy workers above which more workers would help, and below which there are too many
+BUSY_UTILISATION = 0.75
+IDLE_UTILISATION = 0.25
+
+
+class WorkerAutoscaler:
+
+    def __init__(self):
+        self.enabled = strtobool(os.getenv('WORKER_AUTOSCALE', 'False'))
+        self.min_workers = max(1, int(os.getenv('WORKER_AUTOSCALE_MIN', 1)))
+        self.max_workers = max(self.min_workers, int(os.getenv('WORKER_AUTOSCALE_MAX', 20)))
+        self.interval = int(os.getenv('WORKER_AUTOSCALE_INTERVAL', 30))
+        self.max_wait = int(os.getenv('WORKER_AUTOSCALE_MAX_WAIT', 60))
+        self.max_lag = float(os.getenv('WORKER_AUTOSCALE_MAX_LAG', 0.5))
+        self.idle_rounds = int(os.getenv('WORKER_AUTOSCALE_IDLE_ROUNDS', 4))
+
+        self.target = None
+        self.reason = 'Not started yet'
+        self.scaled_up = 0
+        self.scaled_down = 0
+        self.last_change = None
+
+        # Since the last decision
+        self._samples = []
+        self._max_lag = 0.0
+        self._last_decision = 0
+        self._quiet_rounds = 0
+        self._lag_loop = None
+
+        # Last seen, for the status
+        self.loop_lag = 0.0
+        self.oldest_wait = 0.0
+        self.utilisation = 0.0
+
+    def _clamp(self, n):
+        return max(self.min_workers, min(self.max_workers, n))
+
+    def decide(self, current, queue_depth, oldest_wait, utilisation, lag):
+        """(target number of workers, reason), `utilisation` is the average share of busy workers 0-1"""
+        if current < self.min_workers:
+            return self.min_workers, f"Below the minimum of {self.min_workers}"
+        if current > self.max_workers:
+            return self.max_workers, f"Above the maximum of {self.max_workers}"
+
+        if lag > self.max_lag:
+            self._quiet_rounds = 0
+            if current > self.min_workers:
+                return current - 1, f"Event loop lagging {lag:.2f}s, short of CPU"
+            return current, f"Event loop lagging {lag:.2f}s but already at the minimum"
+
+        backlog = oldest_wait > self.max_wait or queue_depth > current * BACKLOG_PER_WORKER
+        if backlog:
+            self._quiet_rounds = 0
+            about = f"{queue_depth} queued, oldest waiting {oldest_wait:.0f}s, workers {utilisation:.0%} busy"
+            if utilisation < BUSY_UTILISATION:
+                return current, f"Backlog but the workers aren't busy (waiting on hosts or proxies?), {about}"
+            if current >= self.max_workers:
+                return current, f"Backlog but already at the maximum, {about}"
+            return self._clamp(current + max(1, math.ceil(current * 0.25))), f"Backlog, {about}"
+
+        if queue_depth == 0 and utilisation < IDLE_UTILISATION:
+            self._quiet_rounds += 1
+            if self._quiet_rounds >= self.idle_rounds and current > self.min_workers:
+                self._quiet_rounds = 0
+                return current - 1, f"Quiet for {self.idle_rounds} rounds, workers {utilisation:.0%} busy"
+            return current, f"Quiet, workers {utilisation:.0%} busy"
+
+        self._quiet_rounds = 0
+        return current, f"Keeping up, {queue_depth} queued, workers {utilisation:.0%} busy"
+
+    async def _measure_lag(self):
+        """Runs on the workers' event loop, how late a short sleep wakes up is how long the loop was blocked"""
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(LAG_PROBE_SECONDS)
+            self.loop_lag = max(0.0, time.monotonic() - start - LAG_PROBE_SECONDS)
+            self._max_lag = max(self._max_lag, self.loop_lag)
+
+    def tick(self, update_q, notification_q, app, datastore, now=None):
+        """Called every tick of the ticker thread"""
+        from changedetectionio import worker_handler
+        if not self.enabled:
+            return
+        now = time.time() if now is None else now
+
+        loop = worker_handler.async_loop
+        if loop is not None and loop is not self._lag_loop:
+            asyncio.run_coroutine_threadsafe(self._measure_lag(), loop)
+            self._lag_loop = loop
+
+        workers = worker_handler.prune_finished_workers() - worker_handler.retire_requests
+        if self.target is None:
+            self.target = self._clamp(workers)
+            self._last_decision = now
+        self._samples.append(min(1.0, worker_handler.busy_worker_count / workers) if workers > 0 else 1.0)
+
+        if now - self._last_decision < self.interval:
+            return
+        self._last_decision = now
+
+        self.utilisation = sum(self._samples) / len(self._samples)
+        self.oldest_wait = update_q.oldest_waiting_seconds()
+        lag, self._max_lag = self._max_lag, 0.0
+        self._samples = []
+
+        self.target, self.reason = self.decide(current=workers, queue_depth=update_q.qsize(), oldest_wait=self.oldest_wait,
+                                               utilisation=self.utilisation, lag=lag)
+        if self.target == workers:
+            return
+
+        logger.info(f"Worker autoscaler {workers} -> {self.target} workers - {self.reason}")
+        self.last_change = now
+        if self.target > workers:
+            self.scaled_up += 1
+            # Workers on their way out can just stay
+            to_add = self.target - workers - worker_handler.cancel_retire_requests(self.target - workers)
+            if to_add > 0:
+                worker_handler.adjust_async_worker_count(worker_handler.get_worker_count() + to_add,
+                                                         update_q=update_q, notification_q=notification_q, app=app, datastore=datastore)
+        else:
+            self.scaled_down += 1
+            worker_handler.retire_workers(workers - self.target)
+
+    def status(self):
+        from changedetectionio import worker_handler
+        return {
+            'enabled': self.enabled,
+            'target': self.target,
+            'reason': self.reason,
+            'min_workers': self.min_workers,
+            'max_workers': self.max_workers,
+            'busy_workers': worker_handler.busy_worker_count,
+            'utilisation': round(self.utilisation, 2),
+            'oldest_waiting_seconds': round(self.oldest_wait, 1),
+            'loop_lag_seconds': round(self.loop_lag, 3),
+            'scaled_up': self.scaled_up,
+            'scaled_down': self.scaled_down,
+            'seconds_since_change': round(time.time() - self.last_change) if self.last_change else None,
+        }
+
+
+worker_autoscaler = WorkerAutoscaler()
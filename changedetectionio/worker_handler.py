@@ -19,6 +19,11 @@ async_loop_thread = None
 # Track currently processing UUIDs for async workers
 currently_processing_uuids = set()
 
+# Workers in the middle of a check, and how many workers were asked to stop when they're next idle
+busy_worker_count = 0
+retire_requests = 0
+_retire_lock = threading.Lock()
+
 # Configuration - async workers only
 USE_ASYNC_WORKERS = True
 
@@ -166,6 +171,44 @@ def get_worker_count():
     return len(running_async_tasks)
 
 
+def set_worker_busy(busy=True):
+    """Called by the workers around each check, for the utilisation"""
+    global busy_worker_count
+    busy_worker_count = max(0, busy_worker_count + (1 if busy else -1))
+
+
+def retire_workers(n):
+    """Ask n workers to stop when they're next idle, instead of cancelling them in the middle of a check"""
+    global retire_requests
+    with _retire_lock:
+        retire_requests += n
+
+
+def cancel_retire_requests(n):
+    """Take back up to n retire requests that no worker picked up yet, returns how many"""
+    global retire_requests
+    with _retire_lock:
+        cancelled = min(n, retire_requests)
+        retire_requests -= cancelled
+        return cancelled
+
+
+def take_retire_request():
+    """Called by idle workers, True when this worker should stop"""
+    global retire_requests
+    with _retire_lock:
+        if retire_requests > 0:
+            retire_requests -= 1
+            return True
+        return False
+
+
+def prune_finished_workers():
+    """Forget workers that stopped (retired), returns how many are left"""
+    running_async_tasks[:] = [task_future for task_future in running_async_tasks if not task_future.done()]
+    return len(running_async_tasks)
+
+
 def get_running_uuids():
     """Get list of UUIDs currently being processed by async workers"""
     return list(currently_processing_uuids)
@@ -264,6 +307,10 @@ def shutdown_workers():
         
     running_async_tasks.clear()
     async_loop = None
+
+    global busy_worker_count, retire_requests
+    busy_worker_count = 0
+    retire_requests = 0
         
     # Give async thread minimal time to finish, then continue
     if async_loop_thread and async_loop_thread.is_alive():
@@ -272,6 +319,10 @@ def shutdown_workers():
             logger.info("Async thread still running after timeout - continuing with shutdown")
         async_loop_thread = None
     
+    # Processes for the change detection stage, see processing_pool.py
+    from changedetectionio.processing_pool import processing_pool
+    processing_pool.shutdown()
+
     if not in_pytest:
         logger.info("Async workers fast shutdown complete")
 
@@ -354,11 +405,14 @@ def adjust_async_worker_count(new_count, update_q=None, notification_q=None, app
 
 def get_worker_status():
     """Get status information about async workers"""
+    from changedetectionio.worker_autoscaler import worker_autoscaler
     return {
         'worker_type': 'async',
         'worker_count': get_worker_count(),
         'running_uuids': get_running_uuids(),
         'async_loop_running': async_loop is not None,
+        'busy_workers': busy_worker_count,
+        'autoscaler': worker_autoscaler.status(),
     }
 
 